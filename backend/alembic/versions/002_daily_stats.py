@@ -0,0 +1,68 @@
+"""Daily rollup table for reports
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '002'
+down_revision = '001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('daily_stats',
+        sa.Column('kind', sa.String(length=20), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('key', sa.String(length=20), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('urgent_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('repair_days', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('repair_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('amount', sa.Numeric(precision=12, scale=2), nullable=False, server_default='0'),
+        sa.Column('quantity', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('kind', 'day', 'key')
+    )
+
+    # Backfill from existing history (same aggregation as services.daily_stats)
+    op.execute("""
+        INSERT INTO daily_stats (kind, day, key, count, urgent_count, repair_days, repair_count)
+        SELECT 'order_status',
+               CAST((created_at AT TIME ZONE 'UTC') AS DATE),
+               status::text,
+               COUNT(*),
+               COUNT(*) FILTER (WHERE priority = 'urgent'),
+               COALESCE(SUM(EXTRACT(EPOCH FROM (actual_delivery_date - created_at)) / 86400.0)
+                   FILTER (WHERE status = 'delivered' AND actual_delivery_date IS NOT NULL), 0),
+               COUNT(*) FILTER (WHERE status = 'delivered' AND actual_delivery_date IS NOT NULL)
+        FROM orders
+        GROUP BY 2, 3
+    """)
+    op.execute("""
+        INSERT INTO daily_stats (kind, day, key, count, amount)
+        SELECT 'payment_method',
+               CAST((created_at AT TIME ZONE 'UTC') AS DATE),
+               method::text,
+               COUNT(*),
+               SUM(amount)
+        FROM payments
+        GROUP BY 2, 3
+    """)
+    op.execute("""
+        INSERT INTO daily_stats (kind, day, key, count, quantity)
+        SELECT 'movement_type',
+               CAST((created_at AT TIME ZONE 'UTC') AS DATE),
+               type::text,
+               COUNT(*),
+               SUM(quantity)
+        FROM inventory_movements
+        GROUP BY 2, 3
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('daily_stats')
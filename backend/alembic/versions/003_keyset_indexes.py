@@ -0,0 +1,37 @@
+"""Composite indexes for keyset (cursor) pagination
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+# The list endpoints order by (column, id) and page with
+# WHERE (column, id) < (:value, :id), which these indexes serve directly
+KEYSET_INDEXES = [
+    ('ix_clients_created_at_id', 'clients', ['created_at', 'id']),
+    ('ix_orders_created_at_id', 'orders', ['created_at', 'id']),
+    ('ix_payments_created_at_id', 'payments', ['created_at', 'id']),
+    ('ix_inventory_items_name_id', 'inventory_items', ['name', 'id']),
+    ('ix_inventory_movements_created_at_id', 'inventory_movements', ['created_at', 'id']),
+]
+
+
+def upgrade() -> None:
+    # CONCURRENTLY keeps the tables writable while the indexes build,
+    # and it cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns in KEYSET_INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(KEYSET_INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
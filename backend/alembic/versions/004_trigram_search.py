@@ -0,0 +1,48 @@
+"""pg_trgm GIN indexes for list search
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from alembic import op
+
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+# (index, table, column) searched with ILIKE '%term%' / similarity()
+TRIGRAM_INDEXES = [
+    ('ix_clients_name_trgm', 'clients', 'name'),
+    ('ix_clients_phone_trgm', 'clients', 'phone'),
+    ('ix_clients_email_trgm', 'clients', 'email'),
+    ('ix_orders_folio_trgm', 'orders', 'folio'),
+    ('ix_inventory_items_sku_trgm', 'inventory_items', 'sku'),
+    ('ix_inventory_items_name_trgm', 'inventory_items', 'name'),
+    ('ix_inventory_items_description_trgm', 'inventory_items', 'description'),
+]
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # CONCURRENTLY keeps the tables writable while the indexes build,
+    # and it cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, table, column in TRIGRAM_INDEXES:
+            op.create_index(
+                name,
+                table,
+                [column],
+                postgresql_using='gin',
+                postgresql_ops={column: 'gin_trgm_ops'},
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(TRIGRAM_INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+    # The extension is left installed: other objects may depend on it
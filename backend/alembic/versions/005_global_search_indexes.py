@@ -0,0 +1,52 @@
+"""pg_trgm GIN indexes for the global search
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from alembic import op
+
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+# Partial IMEI lookups from GET /search
+TRIGRAM_INDEXES = [
+    ('ix_devices_imei_trgm', 'devices', 'imei'),
+]
+
+# Phone lookups compare digits only; the expression must match
+# utils.search.digits_column for the planner to use these indexes
+DIGITS_INDEXES = [
+    ('ix_clients_phone_digits_trgm', 'clients', 'phone'),
+    ('ix_clients_alternate_phone_digits_trgm', 'clients', 'alternate_phone'),
+]
+
+
+def upgrade() -> None:
+    # CONCURRENTLY keeps the tables writable while the indexes build,
+    # and it cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, table, column in TRIGRAM_INDEXES:
+            op.create_index(
+                name,
+                table,
+                [column],
+                postgresql_using='gin',
+                postgresql_ops={column: 'gin_trgm_ops'},
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+        for name, table, column in DIGITS_INDEXES:
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} "
+                f"USING gin ((regexp_replace({column}, '\\D', '', 'g')) gin_trgm_ops)"
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(DIGITS_INDEXES + TRIGRAM_INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -10,6 +10,7 @@ from config import settings
 from models import User
 from schemas import TokenData
 from database import get_db
+from services.session_tracker import session_tracker
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
@@ -82,6 +83,7 @@ async def get_current_user(
     if user is None or not user.is_active:
         raise credentials_exception
     
+    session_tracker.touch(user.id)
     return user
 
 
@@ -11,7 +11,7 @@ celery_app.conf.update(
     task_serializer="json",
     accept_content=["json"],
     result_serializer="json",
-    timezone="America/Mexico_City",
+    timezone=settings.TIMEZONE,
     enable_utc=True,
 )
 
@@ -158,6 +158,35 @@ def generate_daily_report():
         return {"status": "error", "message": str(e)}
 
 
+@celery_app.task(name="rebuild_daily_stats")
+def rebuild_daily_stats(days: int = 7):
+    """Rebuild daily_stats rollups for the last `days` days (0 = full backfill)"""
+    print(f"📈 Rebuilding daily_stats ({days or 'all'} days)...")
+    import asyncio
+    from datetime import datetime, timedelta
+    from database import AsyncSessionLocal, engine
+    from services.daily_stats import rebuild_daily_stats as rebuild
+
+    async def run():
+        start_day = (datetime.utcnow() - timedelta(days=days)).date() if days else None
+        try:
+            async with AsyncSessionLocal() as db:
+                rows = await rebuild(db, start_day)
+                await db.commit()
+            return rows
+        finally:
+            # Each task runs its own event loop; pooled connections can't be reused
+            await engine.dispose()
+
+    try:
+        rows = asyncio.run(run())
+        return {"status": "completed", "rows": rows}
+
+    except Exception as e:
+        print(f"Error rebuilding daily_stats: {e}")
+        return {"status": "error", "message": str(e)}
+
+
 # Celery Beat schedule
 from celery.schedules import crontab
 
@@ -178,4 +207,9 @@ celery_app.conf.beat_schedule = {
         "task": "generate_daily_report",
         "schedule": crontab(hour=23, minute=0),  # 11 PM daily
     },
+    "repair-daily-stats": {
+        "task": "rebuild_daily_stats",
+        "schedule": crontab(hour=3, minute=0),  # 3 AM daily
+        "args": (7,),
+    },
 }
@@ -7,6 +7,7 @@ class Settings(BaseSettings):
     APP_NAME: str = "SalvaCell API"
     APP_VERSION: str = "1.0.0"
     DEBUG: bool = True
+    TIMEZONE: str = "America/Mexico_City"  # Local business timezone for reports
     
     # Database
     DATABASE_URL: str
@@ -20,6 +21,24 @@ class Settings(BaseSettings):
     # Redis
     REDIS_URL: str = "redis://localhost:6379/0"
     
+    # Report cache ("memory" or "redis"; TTL 0 disables it)
+    REPORT_CACHE_BACKEND: str = "memory"
+    REPORT_CACHE_TTL: int = 30
+    REPORT_CACHE_MAX_ENTRIES: int = 256
+    
+    # Request metrics across workers ("local" or "redis")
+    METRICS_AGGREGATION: str = "local"
+    METRICS_FLUSH_INTERVAL: int = 10
+    SQL_QUERY_BUDGET: int = 20  # Warn when a request issues more queries (0 disables)
+    SLOW_QUERY_MS: int = 200  # Log statements slower than this (0 disables)
+    SLOW_QUERY_LOG_SIZE: int = 100
+    SLOW_QUERY_EXPLAIN: bool = True
+    LOOP_STALL_THRESHOLD_MS: int = 100  # Sample the stack when the event loop is blocked longer (0 disables)
+    ACTIVE_SESSION_WINDOW: int = 900  # Seconds since last request for a session to count as active
+    UPTIME_HEARTBEAT_INTERVAL: int = 30
+    UPTIME_WINDOW_DAYS: int = 30
+    UPTIME_STATE_FILE: str = "./uptime_state.json"  # Used when METRICS_AGGREGATION=local ("" = memory only)
+    
     # Celery
     CELERY_BROKER_URL: str = "redis://localhost:6379/1"
     CELERY_RESULT_BACKEND: str = "redis://localhost:6379/2"
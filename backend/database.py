@@ -1,6 +1,21 @@
+import time
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from config import settings
+from services.request_metrics import metrics_registry
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Connection pool that records how long each checkout waits"""
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            metrics_registry.record_db_checkout((time.perf_counter() - start) * 1000)
+
 
 # Create async engine
 engine = create_async_engine(
@@ -10,6 +25,7 @@ engine = create_async_engine(
     pool_pre_ping=True,
     pool_size=10,
     max_overflow=20,
+    poolclass=InstrumentedQueuePool,
 )
 
 # Create session factory
@@ -69,3 +85,9 @@ async def get_db() -> AsyncSession:
             raise
         finally:
             await session.close()
+
+
+def get_session_factory() -> async_sessionmaker:
+    """Dependency: session factory for handlers that run queries concurrently
+    (one session, and therefore one pooled connection, per task)"""
+    return AsyncSessionLocal
@@ -7,6 +7,10 @@ import os
 from config import settings
 from database import engine, Base
 from middleware import PerformanceMiddleware
+from services.loop_monitor import loop_monitor
+from services.metrics_aggregator import metrics_aggregator
+from services.session_tracker import session_tracker
+from services.uptime import uptime_recorder
 from routers import (
     clients,
     orders,
@@ -17,6 +21,8 @@ from routers import (
     payments,
     photos,
     export,
+    metrics,
+    search,
     websocket as ws_router,
 )
 
@@ -30,6 +36,16 @@ async def lifespan(app: FastAPI):
     # Create upload directory if it doesn't exist
     os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
 
+    # Sample event-loop lag for /metrics
+    loop_monitor.start()
+
+    # Publish this worker's request metrics for fleet-wide aggregation
+    metrics_aggregator.start()
+    session_tracker.start()
+
+    # Heartbeats for /metrics/system-performance uptime
+    uptime_recorder.start()
+
     # Create tables (in production, use Alembic migrations)
     # async with engine.begin() as conn:
     #     await conn.run_sync(Base.metadata.create_all)
@@ -38,6 +54,10 @@ async def lifespan(app: FastAPI):
 
     # Shutdown
     print("👋 Shutting down SalvaCell API...")
+    await loop_monitor.stop()
+    await metrics_aggregator.stop()
+    await session_tracker.stop()
+    await uptime_recorder.stop()
     await engine.dispose()
 
 
@@ -55,6 +75,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Performance tracking middleware
@@ -74,6 +95,8 @@ app.include_router(reports.router)
 app.include_router(payments.router)
 app.include_router(photos.router)
 app.include_router(export.router)
+app.include_router(metrics.router)
+app.include_router(search.router)
 app.include_router(ws_router.router, prefix="/ws", tags=["websocket"])
 
 
@@ -1,59 +1,80 @@
+import logging
 import time
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
-from typing import Callable
-
-
-class PerformanceMiddleware(BaseHTTPMiddleware):
-    """Middleware to track request performance metrics"""
-    
-    def __init__(self, app):
-        super().__init__(app)
-        self.request_count = 0
-        self.total_response_time = 0.0
-        self.error_count = 0
-    
-    async def dispatch(self, request: Request, call_next: Callable):
-        start_time = time.time()
-        
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config import settings
+from services.loop_monitor import loop_monitor
+from services.request_metrics import MetricsRegistry, metrics_registry, route_template
+from services.sql_instrumentation import QueryStats, current_query_stats
+
+logger = logging.getLogger(__name__)
+
+
+class PerformanceMiddleware:
+    """Pure ASGI middleware to track request performance metrics
+
+    Measures time to first byte (when the response headers are sent) and
+    total time (when the last body chunk is sent) without wrapping or
+    buffering the response, so StreamingResponse bodies pass through as-is.
+    Adds X-Response-Time and Server-Timing "db" (queries so far) and "app"
+    (time to first byte) entries, appended to any Server-Timing the endpoint
+    already set. Requests issuing more than SQL_QUERY_BUDGET queries are
+    logged as warnings. The running task is registered with the loop monitor
+    so event-loop stalls can be attributed to the route.
+    """
+
+    def __init__(self, app: ASGIApp, registry: MetricsRegistry = metrics_registry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status_code = 500
+        ttfb_ms = None
+        queries = QueryStats(scope)
+        token = current_query_stats.set(queries)
+        task = loop_monitor.track_request(scope)
+
+        async def send_with_timing(message: Message):
+            nonlocal status_code, ttfb_ms
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                ttfb_ms = (time.perf_counter() - start_time) * 1000
+
+                headers = MutableHeaders(scope=message)
+                headers["X-Response-Time"] = f"{ttfb_ms:.2f}ms"
+                timing = (
+                    f'db;dur={queries.db_ms:.1f};desc="{queries.count} queries", '
+                    f"app;dur={ttfb_ms:.1f}"
+                )
+                existing = headers.get("Server-Timing")
+                headers["Server-Timing"] = f"{existing}, {timing}" if existing else timing
+            await send(message)
+
         try:
-            response = await call_next(request)
-            
-            # Track response time
-            response_time = (time.time() - start_time) * 1000  # Convert to ms
-            self.request_count += 1
-            self.total_response_time += response_time
-            
-            # Track errors (4xx and 5xx status codes)
-            if response.status_code >= 400:
-                self.error_count += 1
-            
-            # Add performance headers
-            response.headers["X-Response-Time"] = f"{response_time:.2f}ms"
-            
-            return response
-            
-        except Exception as e:
-            # Track exception as error
-            self.error_count += 1
-            raise e
-    
-    def get_metrics(self):
-        """Get current performance metrics"""
-        avg_response_time = (
-            self.total_response_time / self.request_count 
-            if self.request_count > 0 
-            else 0.0
-        )
-        error_rate = (
-            (self.error_count / self.request_count * 100) 
-            if self.request_count > 0 
-            else 0.0
-        )
-        
-        return {
-            "request_count": self.request_count,
-            "avg_response_time_ms": round(avg_response_time, 2),
-            "error_count": self.error_count,
-            "error_rate_percent": round(error_rate, 2),
-        }
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            # Unhandled exceptions are recorded as 500 before propagating
+            total_ms = (time.perf_counter() - start_time) * 1000
+            current_query_stats.reset(token)
+            loop_monitor.untrack_request(task)
+            route = route_template(scope)
+
+            budget = settings.SQL_QUERY_BUDGET
+            over_budget = bool(budget) and queries.count > budget
+            if over_budget:
+                statement, times = queries.most_repeated()
+                logger.warning(
+                    f"{scope['method']} {route} issued {queries.count} queries "
+                    f"(budget {budget}); most repeated ({times}x): {statement[:200]}"
+                )
+
+            self.registry.record(
+                scope["method"], route, status_code, total_ms, ttfb_ms,
+                queries.count, queries.db_ms, over_budget,
+            )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, Text, ForeignKey, Integer, Numeric, Enum as SQLEnum
+from sqlalchemy import Column, String, DateTime, Date, Float, Text, ForeignKey, Integer, Numeric, Index, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -13,6 +13,10 @@ def generate_uuid():
 
 class Client(Base):
     __tablename__ = "clients"
+    __table_args__ = (
+        # Paginación por cursor: ORDER BY (created_at, id)
+        Index("ix_clients_created_at_id", "created_at", "id"),
+    )
     
     id = Column(String(50), primary_key=True, default=generate_uuid)
     name = Column(String(200), nullable=False, index=True)
@@ -71,6 +75,10 @@ class OrderPriority(str, enum.Enum):
 
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        # Paginación por cursor: ORDER BY (created_at, id)
+        Index("ix_orders_created_at_id", "created_at", "id"),
+    )
     
     id = Column(String(50), primary_key=True, default=generate_uuid)
     folio = Column(String(20), unique=True, nullable=False, index=True)
@@ -167,6 +175,10 @@ class PaymentStatus(str, enum.Enum):
 
 class Payment(Base):
     __tablename__ = "payments"
+    __table_args__ = (
+        # Paginación por cursor: ORDER BY (created_at, id)
+        Index("ix_payments_created_at_id", "created_at", "id"),
+    )
     
     id = Column(String(50), primary_key=True, default=generate_uuid)
     order_id = Column(String(50), ForeignKey("orders.id", ondelete="CASCADE"), nullable=False, index=True)
@@ -191,6 +203,10 @@ class Payment(Base):
 
 class InventoryItem(Base):
     __tablename__ = "inventory_items"
+    __table_args__ = (
+        # Paginación por cursor: ORDER BY (name, id)
+        Index("ix_inventory_items_name_id", "name", "id"),
+    )
     
     id = Column(String(50), primary_key=True, default=generate_uuid)
     sku = Column(String(100), unique=True, nullable=False, index=True)
@@ -230,6 +246,10 @@ class MovementType(str, enum.Enum):
 
 class InventoryMovement(Base):
     __tablename__ = "inventory_movements"
+    __table_args__ = (
+        # Paginación por cursor: ORDER BY (created_at, id)
+        Index("ix_inventory_movements_created_at_id", "created_at", "id"),
+    )
     
     id = Column(String(50), primary_key=True, default=generate_uuid)
     item_id = Column(String(50), ForeignKey("inventory_items.id", ondelete="CASCADE"), nullable=False, index=True)
@@ -319,3 +339,29 @@ class User(Base):
     
     def __repr__(self):
         return f"<User {self.username} - {self.role}>"
+
+
+class RollupKind(str, enum.Enum):
+    ORDER_STATUS = "order_status"
+    PAYMENT_METHOD = "payment_method"
+    MOVEMENT_TYPE = "movement_type"
+
+
+class DailyStat(Base):
+    """Rollup diario de órdenes, pagos y movimientos para reportes"""
+    __tablename__ = "daily_stats"
+    
+    # kind + day + key: p. ej. ("order_status", 2026-03-01, "delivered")
+    kind = Column(String(20), primary_key=True)
+    day = Column(Date, primary_key=True)
+    key = Column(String(20), primary_key=True)
+    
+    count = Column(Integer, default=0, nullable=False)
+    urgent_count = Column(Integer, default=0, nullable=False)
+    repair_days = Column(Float, default=0, nullable=False)
+    repair_count = Column(Integer, default=0, nullable=False)
+    amount = Column(Numeric(12, 2), default=0, nullable=False)
+    quantity = Column(Integer, default=0, nullable=False)
+    
+    def __repr__(self):
+        return f"<DailyStat {self.kind}/{self.key} {self.day}: {self.count}>"
@@ -3,6 +3,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from datetime import datetime
 from database import get_db
+from services.session_tracker import session_tracker
 from models import User, UserRole
 from schemas import (
     UserCreate, UserUpdate, UserResponse,
@@ -75,6 +76,7 @@ async def login(
     # Update last login
     user.last_login = datetime.utcnow()
     await db.commit()
+    session_tracker.touch(user.id)
     
     # Create tokens
     token_data = {
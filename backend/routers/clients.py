@@ -1,16 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, or_
+from sqlalchemy import select, func
 from typing import List, Optional
 from database import get_db
 from models import Client, Order, Device
 from schemas import (
     ClientCreate, ClientUpdate, ClientResponse, ClientWithStats
 )
+from services.cache import report_cache, CLIENTS, ORDERS, PAYMENTS
+from utils.pagination import Keyset, paginate, finish_page
+from utils.search import SearchFields, search_clause
 import uuid
 
 router = APIRouter(prefix="/clients", tags=["clients"])
 
+# Orden estable de los listados (paginación por cursor)
+CLIENTS_KEYSET = Keyset(Client.created_at, Client.id)
+
+# Columnas con índice trigram (migración 004)
+CLIENTS_SEARCH = SearchFields([Client.name, Client.phone, Client.email], fuzzy=[Client.name])
+
 
 @router.post("/", response_model=ClientResponse, status_code=status.HTTP_201_CREATED)
 async def create_client(
@@ -24,34 +33,31 @@ async def create_client(
     )
     db.add(new_client)
     await db.commit()
+    await report_cache.invalidate(CLIENTS)
     await db.refresh(new_client)
     return new_client
 
 
 @router.get("/", response_model=List[ClientResponse])
 async def get_clients(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="Cursor de X-Next-Cursor (reemplaza a skip)"),
     search: Optional[str] = None,
     db: AsyncSession = Depends(get_db)
 ):
     """Obtener lista de clientes con búsqueda opcional"""
     query = select(Client)
     
+    rank = None
     if search:
-        search_pattern = f"%{search}%"
-        query = query.where(
-            or_(
-                Client.name.ilike(search_pattern),
-                Client.phone.ilike(search_pattern),
-                Client.email.ilike(search_pattern)
-            )
-        )
+        condition, rank = search_clause(db, search, CLIENTS_SEARCH)
+        query = query.where(condition)
     
-    query = query.offset(skip).limit(limit).order_by(Client.created_at.desc())
+    query = paginate(query, CLIENTS_KEYSET, skip, limit, cursor, rank)
     result = await db.execute(query)
-    clients = result.scalars().all()
-    return clients
+    return finish_page(response, CLIENTS_KEYSET, result.scalars().all(), limit, ranked=rank is not None)
 
 
 @router.get("/{client_id}", response_model=ClientWithStats)
@@ -106,6 +112,7 @@ async def update_client(
         setattr(client, field, value)
     
     await db.commit()
+    await report_cache.invalidate(CLIENTS)
     await db.refresh(client)
     return client
 
@@ -124,4 +131,5 @@ async def delete_client(
     
     await db.delete(client)
     await db.commit()
+    await report_cache.invalidate(CLIENTS, ORDERS, PAYMENTS)
     return None
@@ -1,6 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, or_
+from sqlalchemy import select
 from typing import List, Optional
 from database import get_db
 from models import InventoryItem, InventoryMovement, MovementType
@@ -8,10 +8,22 @@ from schemas import (
     InventoryItemCreate, InventoryItemUpdate, InventoryItemResponse,
     InventoryMovementCreate, InventoryMovementResponse
 )
+from services.cache import report_cache, INVENTORY
+from utils.pagination import Keyset, paginate, finish_page
+from utils.search import SearchFields, search_clause
 import uuid
 
 router = APIRouter(prefix="/inventory", tags=["inventory"])
 
+# Orden estable de los listados (paginación por cursor)
+ITEMS_KEYSET = Keyset(InventoryItem.name, InventoryItem.id, descending=False)
+MOVEMENTS_KEYSET = Keyset(InventoryMovement.created_at, InventoryMovement.id)
+
+# Columnas con índice trigram (migración 004)
+ITEMS_SEARCH = SearchFields(
+    [InventoryItem.sku, InventoryItem.name, InventoryItem.description], fuzzy=[InventoryItem.name]
+)
+
 
 @router.post("/items", response_model=InventoryItemResponse, status_code=status.HTTP_201_CREATED)
 async def create_inventory_item(
@@ -31,14 +43,17 @@ async def create_inventory_item(
     
     db.add(new_item)
     await db.commit()
+    await report_cache.invalidate(INVENTORY)
     await db.refresh(new_item)
     return new_item
 
 
 @router.get("/items", response_model=List[InventoryItemResponse])
 async def get_inventory_items(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="Cursor de X-Next-Cursor (reemplaza a skip)"),
     category: Optional[str] = None,
     low_stock: Optional[bool] = None,
     search: Optional[str] = None,
@@ -53,20 +68,14 @@ async def get_inventory_items(
     if low_stock:
         query = query.where(InventoryItem.stock <= InventoryItem.min_stock)
     
+    rank = None
     if search:
-        search_pattern = f"%{search}%"
-        query = query.where(
-            or_(
-                InventoryItem.sku.ilike(search_pattern),
-                InventoryItem.name.ilike(search_pattern),
-                InventoryItem.description.ilike(search_pattern)
-            )
-        )
+        condition, rank = search_clause(db, search, ITEMS_SEARCH)
+        query = query.where(condition)
     
-    query = query.offset(skip).limit(limit).order_by(InventoryItem.name)
+    query = paginate(query, ITEMS_KEYSET, skip, limit, cursor, rank)
     result = await db.execute(query)
-    items = result.scalars().all()
-    return items
+    return finish_page(response, ITEMS_KEYSET, result.scalars().all(), limit, ranked=rank is not None)
 
 
 @router.get("/items/{item_id}", response_model=InventoryItemResponse)
@@ -114,6 +123,7 @@ async def update_inventory_item(
         setattr(item, field, value)
     
     await db.commit()
+    await report_cache.invalidate(INVENTORY)
     await db.refresh(item)
     return item
 
@@ -132,6 +142,7 @@ async def delete_inventory_item(
     
     await db.delete(item)
     await db.commit()
+    await report_cache.invalidate(INVENTORY)
     return None
 
 
@@ -169,14 +180,17 @@ async def create_inventory_movement(
     
     db.add(new_movement)
     await db.commit()
+    await report_cache.invalidate(INVENTORY)
     await db.refresh(new_movement)
     return new_movement
 
 
 @router.get("/movements", response_model=List[InventoryMovementResponse])
 async def get_inventory_movements(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="Cursor de X-Next-Cursor (reemplaza a skip)"),
     item_id: Optional[str] = None,
     movement_type: Optional[MovementType] = None,
     db: AsyncSession = Depends(get_db)
@@ -190,7 +204,6 @@ async def get_inventory_movements(
     if movement_type:
         query = query.where(InventoryMovement.type == movement_type)
     
-    query = query.offset(skip).limit(limit).order_by(InventoryMovement.created_at.desc())
+    query = paginate(query, MOVEMENTS_KEYSET, skip, limit, cursor)
     result = await db.execute(query)
-    movements = result.scalars().all()
-    return movements
+    return finish_page(response, MOVEMENTS_KEYSET, result.scalars().all(), limit)
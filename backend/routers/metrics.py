@@ -1,12 +1,26 @@
-from fastapi import APIRouter, Depends, Query, Request
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_, distinct
-from typing import Optional, Dict, Any
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import PlainTextResponse, Response
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy import select, func
+from typing import Optional, Dict, Any, List
 from datetime import datetime, timedelta
-from database import get_db
-from models import Order, User, Client, Payment, InventoryItem
+from config import settings
+from database import engine, get_db, get_session_factory
+from models import Order, OrderStatus, User, UserRole, DailyStat, RollupKind
+from auth import require_role
+from services.cache import report_cache, ORDERS, PAYMENTS
+from services.metrics_aggregator import metrics_aggregator
+from services.loop_monitor import loop_monitor
+from services.profiler import ProfilerBusy, memory_tracer, profile_cpu, profile_route, profile_seconds
+from services.session_tracker import session_tracker
+from services.sql_instrumentation import slow_query_log
+from services.uptime import uptime_recorder
+from services.prometheus import render_metrics, CONTENT_TYPE as PROMETHEUS_CONTENT_TYPE
+from websockets.manager import ws_manager
 from pydantic import BaseModel
 from decimal import Decimal
+import asyncio
+import os
 import time
 
 router = APIRouter(prefix="/metrics", tags=["metrics"])
@@ -24,12 +38,37 @@ class UserEngagementMetrics(BaseModel):
 
 class SystemPerformanceMetrics(BaseModel):
     avg_response_time_ms: float
+    p50_response_time_ms: float
+    p95_response_time_ms: float
+    p99_response_time_ms: float
     system_uptime_percent: float
     total_requests: int
     error_rate_percent: float
     active_sessions: int
 
 
+class RouteMetrics(BaseModel):
+    method: str
+    route: str
+    request_count: int
+    error_count: int
+    server_error_count: int
+    error_rate_percent: float
+    avg_ms: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    max_ms: float
+    ttfb_p50_ms: float
+    ttfb_p95_ms: float
+    ttfb_p99_ms: float
+    avg_queries: float
+    max_queries: int
+    over_budget_count: int
+    db_avg_ms: float
+    db_p95_ms: float
+
+
 class OperationalMetrics(BaseModel):
     total_orders_today: int
     orders_in_progress: int
@@ -45,184 +84,254 @@ class DashboardMetrics(BaseModel):
     operational: OperationalMetrics
 
 
-# ============= In-Memory Storage for Performance Tracking =============
-# In production, this should be stored in Redis or similar
-performance_metrics = {
-    "request_count": 0,
-    "total_response_time": 0.0,
-    "error_count": 0,
-    "start_time": datetime.utcnow(),
-}
-
-
 # ============= Helper Functions =============
-def calculate_uptime() -> float:
-    """Calculate system uptime percentage"""
-    start_time = performance_metrics.get("start_time", datetime.utcnow())
-    uptime_seconds = (datetime.utcnow() - start_time).total_seconds()
-    # Assuming 24/7 operation, uptime is always 100% while running
-    # In production, this should track actual downtime
-    return 99.9  # Placeholder for production implementation
-
-
-def get_active_sessions() -> int:
-    """Get count of active user sessions"""
-    # Placeholder - should integrate with actual session management
-    return 0
-
-
-async def get_daily_active_users(db: AsyncSession) -> int:
-    """Get count of users who logged in today"""
-    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-    result = await db.execute(
-        select(func.count(distinct(User.id)))
-        .where(User.last_login >= today)
-        .where(User.is_active == 1)
-    )
-    return result.scalar() or 0
-
-
-async def get_monthly_active_users(db: AsyncSession) -> int:
-    """Get count of users who logged in this month"""
-    month_start = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    result = await db.execute(
-        select(func.count(distinct(User.id)))
-        .where(User.last_login >= month_start)
-        .where(User.is_active == 1)
-    )
-    return result.scalar() or 0
-
-
-async def calculate_user_retention_rate(db: AsyncSession) -> float:
+def calculate_user_retention_rate(prev_month_users: int, retained_users: int) -> float:
     """Calculate user retention rate (users who returned after first month)"""
-    month_start = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    prev_month = month_start - timedelta(days=30)
-    
-    # Users active in previous month
-    prev_month_result = await db.execute(
-        select(func.count(distinct(User.id)))
-        .where(User.last_login >= prev_month)
-        .where(User.last_login < month_start)
-        .where(User.is_active == 1)
-    )
-    prev_month_users = prev_month_result.scalar() or 0
-    
     if prev_month_users == 0:
         return 0.0
-    
-    # Users from previous month who are still active this month
-    retained_result = await db.execute(
-        select(func.count(distinct(User.id)))
-        .where(User.last_login >= month_start)
-        .where(User.created_at < month_start)
-        .where(User.is_active == 1)
-    )
-    retained_users = retained_result.scalar() or 0
-    
     return round((retained_users / prev_month_users) * 100, 2)
 
 
 # ============= Endpoints =============
+@router.get("", response_class=PlainTextResponse)
+async def get_prometheus_metrics():
+    """Prometheus text exposition: route histograms, DB pool, WebSockets, event loop
+
+    Always this worker's own registry, never the fleet merge: Prometheus sums
+    the scraped workers itself, and merged counters would be counted once per
+    worker and drop whenever another worker's snapshot expires.
+    """
+    content = render_metrics(metrics_aggregator.registry, engine.pool, ws_manager.get_stats(), loop_monitor)
+    return PlainTextResponse(content, media_type=PROMETHEUS_CONTENT_TYPE)
+
+
 @router.get("/user-engagement", response_model=UserEngagementMetrics)
+@report_cache.cached("metrics/user-engagement", tags=[], params=())
 async def get_user_engagement_metrics(db: AsyncSession = Depends(get_db)):
-    """Get user engagement metrics (DAU, MAU, retention rate)"""
+    """Get user engagement metrics (DAU, MAU, retention rate)
+
+    Every figure is a conditional aggregate over the users table, so the
+    section costs a single query.
+    """
     today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
     month_start = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    
-    # Total registered users
-    total_users_result = await db.execute(
-        select(func.count(User.id))
-        .where(User.is_active == 1)
-    )
-    total_users = total_users_result.scalar() or 0
-    
-    # New users this month
-    new_users_result = await db.execute(
-        select(func.count(User.id))
-        .where(User.created_at >= month_start)
+    prev_month = month_start - timedelta(days=30)
+    active = User.is_active == 1
+
+    result = await db.execute(
+        select(
+            func.count(User.id).filter(active).label("total_users"),
+            func.count(User.id).filter(User.created_at >= month_start).label("new_users"),
+            func.count(User.id).filter(active, User.last_login >= today).label("dau"),
+            func.count(User.id).filter(active, User.last_login >= month_start).label("mau"),
+            # Users active in previous month
+            func.count(User.id).filter(
+                active, User.last_login >= prev_month, User.last_login < month_start
+            ).label("prev_month_users"),
+            # Users from previous month who are still active this month
+            func.count(User.id).filter(
+                active, User.last_login >= month_start, User.created_at < month_start
+            ).label("retained_users"),
+        )
     )
-    new_users = new_users_result.scalar() or 0
-    
-    # Get DAU and MAU
-    dau = await get_daily_active_users(db)
-    mau = await get_monthly_active_users(db)
-    
-    # Calculate retention rate
-    retention_rate = await calculate_user_retention_rate(db)
-    
+    users = result.one()
+    dau = users.dau
+
     return UserEngagementMetrics(
         daily_active_users=dau,
-        monthly_active_users=mau,
-        user_retention_rate=retention_rate,
-        total_registered_users=total_users,
+        monthly_active_users=users.mau,
+        user_retention_rate=calculate_user_retention_rate(users.prev_month_users, users.retained_users),
+        total_registered_users=users.total_users,
         active_users_today=dau,
-        new_users_this_month=new_users
+        new_users_this_month=users.new_users
+    )
+
+
+async def system_performance() -> SystemPerformanceMetrics:
+    """System performance section, shared by its endpoint and the dashboard
+
+    With METRICS_AGGREGATION=redis the figures cover every worker. Uptime
+    comes from heartbeats and active sessions from authenticated requests,
+    neither scans the database.
+    """
+    registry = await metrics_aggregator.fleet_registry()
+    summary = registry.total.summary()
+
+    return SystemPerformanceMetrics(
+        avg_response_time_ms=summary["avg_ms"],
+        p50_response_time_ms=summary["p50_ms"],
+        p95_response_time_ms=summary["p95_ms"],
+        p99_response_time_ms=summary["p99_ms"],
+        system_uptime_percent=await uptime_recorder.uptime_percent(),
+        total_requests=summary["request_count"],
+        error_rate_percent=summary["error_rate_percent"],
+        active_sessions=await session_tracker.active_count()
     )
 
 
 @router.get("/system-performance", response_model=SystemPerformanceMetrics)
-async def get_system_performance_metrics():
+async def get_system_performance_metrics(current_user: User = Depends(require_role(UserRole.ADMIN))):
     """Get system performance metrics (response time, uptime, error rates)"""
-    total_requests = performance_metrics.get("request_count", 0)
-    total_response_time = performance_metrics.get("total_response_time", 0.0)
-    error_count = performance_metrics.get("error_count", 0)
-    
-    # Calculate averages
-    avg_response_time = (
-        (total_response_time / total_requests) if total_requests > 0 else 0.0
-    )
-    error_rate = (
-        (error_count / total_requests * 100) if total_requests > 0 else 0.0
-    )
-    
-    return SystemPerformanceMetrics(
-        avg_response_time_ms=round(avg_response_time, 2),
-        system_uptime_percent=calculate_uptime(),
-        total_requests=total_requests,
-        error_rate_percent=round(error_rate, 2),
-        active_sessions=get_active_sessions()
+    return await system_performance()
+
+
+@router.get("/routes", response_model=List[RouteMetrics])
+async def get_route_metrics(
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    current_user: User = Depends(require_role(UserRole.ADMIN))
+):
+    """Get per-route request counts, error rates and latency percentiles"""
+    registry = await metrics_aggregator.fleet_registry()
+    return registry.route_summaries(limit)
+
+
+@router.get("/report-cache")
+async def get_report_cache_metrics(current_user: User = Depends(require_role(UserRole.ADMIN))):
+    """Get report cache hit rate and single-flight coalescing stats (per worker)"""
+    return report_cache.get_stats()
+
+
+@router.get("/slow-queries")
+async def get_slow_queries(
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    current_user: User = Depends(require_role(UserRole.ADMIN))
+):
+    """Get the most recent slow SQL statements with their plans (per worker)"""
+    return {
+        "threshold_ms": settings.SLOW_QUERY_MS,
+        "entries": slow_query_log.get_entries(limit),
+    }
+
+
+@router.delete("/slow-queries")
+async def clear_slow_queries(current_user: User = Depends(require_role(UserRole.ADMIN))):
+    """Clear the slow-query log and its cached plans"""
+    slow_query_log.clear()
+    return {"status": "cleared"}
+
+
+@router.get("/event-loop")
+async def get_event_loop_metrics(
+    limit: int = Query(20, ge=1, le=200),
+    current_user: User = Depends(require_role(UserRole.ADMIN))
+):
+    """Get event-loop lag and the call sites that blocked it longest (per worker)"""
+    lag = loop_monitor.lag
+    return {
+        "interval_ms": loop_monitor.interval * 1000,
+        "stall_threshold_ms": loop_monitor.stall_threshold_ms,
+        "last_lag_ms": round(loop_monitor.last_lag_ms, 2),
+        "p50_lag_ms": round(lag.percentile(0.5), 2),
+        "p99_lag_ms": round(lag.percentile(0.99), 2),
+        "max_lag_ms": round(lag.max_ms, 2),
+        "stalls": loop_monitor.stalls,
+        "blockers": loop_monitor.top_blockers(limit),
+    }
+
+
+@router.post("/profile")
+async def profile_worker(
+    seconds: float = Query(10, gt=0, le=300),
+    route: Optional[str] = Query(None, description='Only sample this route, e.g. "GET /orders/{order_id}"'),
+    requests: int = Query(20, ge=1, le=10000),
+    format: str = Query("collapsed", pattern="^(collapsed|pstats)$"),
+    current_user: User = Depends(require_role(UserRole.ADMIN))
+):
+    """Profile the worker that receives this request
+
+    Without `route`, samples the event loop for `seconds`. With `route`,
+    samples only while that route is being served and stops after
+    `requests` of them finish (or `seconds` elapse). `collapsed` returns
+    folded stacks for flamegraph.pl/speedscope; `pstats` returns a cProfile
+    dump (time-based only).
+    """
+    try:
+        if format == "pstats":
+            if route:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="pstats is only available for time-based profiling"
+                )
+            content = await profile_cpu(seconds)
+            return Response(
+                content,
+                media_type="application/octet-stream",
+                headers={"Content-Disposition": f'attachment; filename="worker-{os.getpid()}.prof"'},
+            )
+
+        if route:
+            method, _, path = route.partition(" ")
+            profiler = await profile_route(
+                metrics_aggregator.registry, method.upper(), path, requests, timeout=seconds
+            )
+        else:
+            profiler = await profile_seconds(seconds)
+    except ProfilerBusy:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A profiling session is already running in this worker"
+        )
+
+    return PlainTextResponse(
+        profiler.collapsed(),
+        headers={"X-Profile-Samples": str(profiler.samples), "X-Worker-Pid": str(os.getpid())},
     )
 
 
+@router.post("/profile/memory")
+async def memory_snapshot(
+    limit: int = Query(20, ge=1, le=200),
+    key_type: str = Query("lineno", pattern="^(lineno|filename|traceback)$"),
+    current_user: User = Depends(require_role(UserRole.ADMIN))
+):
+    """Start tracemalloc, or snapshot and diff against the previous call"""
+    if not memory_tracer.tracing:
+        await asyncio.to_thread(memory_tracer.start)
+        return {"status": "tracing", "pid": os.getpid()}
+    result = await asyncio.to_thread(memory_tracer.snapshot, key_type, limit)
+    return {"status": "tracing", "pid": os.getpid(), **result}
+
+
+@router.delete("/profile/memory")
+async def stop_memory_tracing(current_user: User = Depends(require_role(UserRole.ADMIN))):
+    """Stop tracemalloc and drop the baseline snapshot"""
+    memory_tracer.stop()
+    return {"status": "stopped"}
+
+
 @router.get("/operational", response_model=OperationalMetrics)
+@report_cache.cached("metrics/operational", tags=[ORDERS, PAYMENTS], params=())
 async def get_operational_metrics(db: AsyncSession = Depends(get_db)):
-    """Get operational metrics for today"""
+    """Get operational metrics for today
+
+    Today's and per-status totals come from the daily rollup with conditional
+    aggregates, and deliveries from a scalar subquery, in a single query.
+    """
     today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-    
-    # Orders today
-    orders_today_result = await db.execute(
-        select(func.count(Order.id))
-        .where(Order.created_at >= today)
-    )
-    orders_today = orders_today_result.scalar() or 0
-    
-    # Orders in progress
-    in_progress_result = await db.execute(
-        select(func.count(Order.id))
-        .where(Order.status.in_(['received', 'diagnosing', 'waiting_parts', 'in_repair', 'repaired']))
-    )
-    in_progress = in_progress_result.scalar() or 0
-    
-    # Orders completed today
-    completed_today_result = await db.execute(
-        select(func.count(Order.id))
-        .where(Order.actual_delivery_date >= today)
-    )
-    completed_today = completed_today_result.scalar() or 0
-    
-    # Pending orders (not delivered or cancelled)
-    pending_result = await db.execute(
-        select(func.count(Order.id))
-        .where(Order.status.notin_(['delivered', 'cancelled']))
-    )
-    pending = pending_result.scalar() or 0
-    
-    # Revenue today
-    revenue_result = await db.execute(
-        select(func.sum(Payment.amount))
-        .where(Payment.created_at >= today)
+    order_rows = DailyStat.kind == RollupKind.ORDER_STATUS.value
+    payment_rows = DailyStat.kind == RollupKind.PAYMENT_METHOD.value
+    closed = [OrderStatus.DELIVERED.value, OrderStatus.CANCELLED.value]
+
+    result = await db.execute(
+        select(
+            # Orders created today
+            func.sum(DailyStat.count).filter(order_rows, DailyStat.day >= today.date()).label("orders_today"),
+            # Orders not delivered or cancelled
+            func.sum(DailyStat.count).filter(order_rows, DailyStat.key.notin_(closed)).label("in_progress"),
+            func.sum(DailyStat.amount).filter(payment_rows, DailyStat.day >= today.date()).label("revenue_today"),
+            select(func.count(Order.id))
+            .where(Order.actual_delivery_date >= today)
+            .scalar_subquery()
+            .label("completed_today"),
+        )
+        .where(DailyStat.kind.in_([RollupKind.ORDER_STATUS.value, RollupKind.PAYMENT_METHOD.value]))
     )
-    revenue_today = float(revenue_result.scalar() or 0)
+    totals = result.one()
+    orders_today = int(totals.orders_today or 0)
+    in_progress = int(totals.in_progress or 0)
+    completed_today = totals.completed_today or 0
+    pending = in_progress
+    revenue_today = float(totals.revenue_today or 0)
     
     # Customer satisfaction score (placeholder - should be based on actual survey data)
     # For now, calculate based on delivery rate
@@ -243,39 +352,31 @@ async def get_operational_metrics(db: AsyncSession = Depends(get_db)):
 
 
 @router.get("/dashboard", response_model=DashboardMetrics)
-async def get_dashboard_metrics(db: AsyncSession = Depends(get_db)):
-    """Get all dashboard metrics in one call"""
-    user_engagement = await get_user_engagement_metrics(db)
-    system_performance = await get_system_performance_metrics()
-    operational = await get_operational_metrics(db)
+async def get_dashboard_metrics(
+    session_factory: async_sessionmaker = Depends(get_session_factory),
+    current_user: User = Depends(require_role(UserRole.ADMIN)),
+):
+    """Get all dashboard metrics in one call (admin only, like system-performance)
+
+    The engagement and operational sections run concurrently, each on its
+    own pooled connection and served from its own report cache entry. The
+    system performance section is live and never cached.
+    """
+    user_engagement, operational = await asyncio.gather(
+        get_user_engagement_metrics(cache_sessions=session_factory),
+        get_operational_metrics(cache_sessions=session_factory),
+    )
     
     return DashboardMetrics(
         user_engagement=user_engagement,
-        system_performance=system_performance,
+        system_performance=await system_performance(),
         operational=operational
     )
 
 
-@router.post("/track-request")
-async def track_request(response_time_ms: float):
-    """Track a request for performance metrics (internal use)"""
-    performance_metrics["request_count"] += 1
-    performance_metrics["total_response_time"] += response_time_ms
-    return {"status": "tracked"}
-
-
-@router.post("/track-error")
-async def track_error():
-    """Track an error for performance metrics (internal use)"""
-    performance_metrics["error_count"] += 1
-    return {"status": "tracked"}
-
-
 @router.post("/reset-metrics")
-async def reset_metrics():
+async def reset_metrics(current_user: User = Depends(require_role(UserRole.ADMIN))):
     """Reset performance metrics (admin use)"""
-    performance_metrics["request_count"] = 0
-    performance_metrics["total_response_time"] = 0.0
-    performance_metrics["error_count"] = 0
-    performance_metrics["start_time"] = datetime.utcnow()
+    await metrics_aggregator.reset()
+    loop_monitor.reset()
     return {"status": "reset"}
@@ -1,21 +1,79 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, or_
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, selectinload
 from typing import List, Optional
 from database import get_db
-from models import Order, OrderStatus, Client, Device, OrderHistory
+from models import Order, OrderStatus, Client, Device, OrderHistory, User
 from schemas import (
     OrderCreate,
     OrderUpdate,
     OrderResponse,
+    OrderExpandedResponse,
+    ClientResponse,
+    DeviceResponse,
+    PaymentResponse,
+    OrderPhotoResponse,
     OrderHistoryCreate,
     OrderHistoryResponse,
 )
+from services.cache import report_cache, ORDERS, PAYMENTS
+from utils.pagination import Keyset, paginate, finish_page
+from utils.search import SearchFields, search_clause
 import uuid
 import secrets
 
 router = APIRouter(prefix="/orders", tags=["orders"])
 
+# Orden estable de los listados (paginación por cursor)
+ORDERS_KEYSET = Keyset(Order.created_at, Order.id)
+
+# Columnas con índice trigram (migración 004)
+ORDERS_SEARCH = SearchFields([Order.folio, Client.name, Client.phone], fuzzy=[Client.name])
+
+# Relaciones que se pueden pedir con ?expand=. Las de uno (cliente, equipo) van
+# en el mismo JOIN; las colecciones con una consulta IN por relación, así que el
+# número de consultas no depende del tamaño de la página.
+ORDER_EXPANSIONS = {
+    "client": (joinedload(Order.client), ClientResponse, False),
+    "device": (joinedload(Order.device), DeviceResponse, False),
+    "history": (selectinload(Order.history), OrderHistoryResponse, True),
+    "payments": (selectinload(Order.payments), PaymentResponse, True),
+    "photos": (selectinload(Order.photos), OrderPhotoResponse, True),
+}
+
+
+def parse_expand(expand: Optional[str]) -> List[str]:
+    """Nombres de `expand=client,history,...` validados"""
+    if not expand:
+        return []
+    names = list(dict.fromkeys(name.strip() for name in expand.split(",") if name.strip()))
+    unknown = [name for name in names if name not in ORDER_EXPANSIONS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Expansión no válida: {', '.join(unknown)}. Opciones: {', '.join(ORDER_EXPANSIONS)}"
+        )
+    return names
+
+
+def with_expansions(query, names: List[str]):
+    return query.options(*(ORDER_EXPANSIONS[name][0] for name in names))
+
+
+def expanded(order: Order, names: List[str]) -> OrderExpandedResponse:
+    """Respuesta con solo las relaciones pedidas (ya cargadas por la consulta)"""
+    data = OrderResponse.model_validate(order).model_dump()
+    for name in names:
+        _, schema, many = ORDER_EXPANSIONS[name]
+        value = getattr(order, name)
+        if many:
+            data[name] = [schema.model_validate(item) for item in value]
+        else:
+            data[name] = schema.model_validate(value) if value is not None else None
+    return OrderExpandedResponse(**data)
+
 
 def generate_folio() -> str:
     """Generate unique order folio"""
@@ -67,34 +125,20 @@ async def create_order(
     db: AsyncSession = Depends(get_db),
     # current_user: User = Depends(get_current_user)  # TODO: Add auth
 ):
-    """Crear nueva orden de reparación"""
-    # Verify client exists
-    client_result = await db.execute(
-        select(Client).where(Client.id == order_data.client_id)
-    )
-    if not client_result.scalar_one_or_none():
-        raise HTTPException(status_code=404, detail="Cliente no encontrado")
-
-    # Verify device if provided
-    if order_data.device_id:
-        device_result = await db.execute(
-            select(Device).where(Device.id == order_data.device_id)
-        )
-        if not device_result.scalar_one_or_none():
-            raise HTTPException(status_code=404, detail="Dispositivo no encontrado")
+    """Crear nueva orden de reparación
 
+    Una sola transacción y un solo flush: la orden y su historial inicial se
+    insertan juntos (la orden con RETURNING para los valores por defecto del
+    servidor, sin refresh) y las llaves foráneas las valida la base de datos.
+    Solo si el INSERT falla se consulta qué referencia no existe.
+    """
     new_order = Order(
         id=str(uuid.uuid4()),
         folio=generate_folio(),
         qr_code=generate_qr_code(),
         **order_data.model_dump(),
     )
-
-    db.add(new_order)
-    await db.commit()
-    await db.refresh(new_order)
-
-    # Create initial history entry
+    # Initial history entry, inserted after the order in the same flush
     history_entry = OrderHistory(
         id=str(uuid.uuid4()),
         order_id=new_order.id,
@@ -102,53 +146,78 @@ async def create_order(
         notes="Orden creada",
         # user_id=current_user.id  # TODO: Add auth
     )
-    db.add(history_entry)
-    await db.commit()
+    db.add_all([new_order, history_entry])
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        await raise_missing_reference(db, order_data)
+        raise
+    await report_cache.invalidate(ORDERS)
 
     return new_order
 
 
-@router.get("/", response_model=List[OrderResponse])
+async def raise_missing_reference(db: AsyncSession, order_data: OrderCreate):
+    """404 para la llave foránea que hizo fallar la creación (si fue una)"""
+    if await db.get(Client, order_data.client_id) is None:
+        raise HTTPException(status_code=404, detail="Cliente no encontrado")
+    if order_data.device_id and await db.get(Device, order_data.device_id) is None:
+        raise HTTPException(status_code=404, detail="Dispositivo no encontrado")
+    if order_data.technician_id and await db.get(User, order_data.technician_id) is None:
+        raise HTTPException(status_code=404, detail="Técnico no encontrado")
+
+
+@router.get("/", response_model=List[OrderExpandedResponse], response_model_exclude_unset=True)
 async def get_orders(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="Cursor de X-Next-Cursor (reemplaza a skip)"),
     status: Optional[OrderStatus] = None,
     search: Optional[str] = None,
+    expand: Optional[str] = Query(None, description="Relaciones a incluir: client,device,history,payments,photos"),
     db: AsyncSession = Depends(get_db),
 ):
     """Obtener lista de órdenes con filtros"""
-    query = select(Order)
+    names = parse_expand(expand)
+    query = with_expansions(select(Order), names)
 
     if status:
         query = query.where(Order.status == status)
 
+    rank = None
     if search:
-        search_pattern = f"%{search}%"
         # Join with client to search by name/phone
-        query = query.join(Client).where(
-            or_(
-                Order.folio.ilike(search_pattern),
-                Client.name.ilike(search_pattern),
-                Client.phone.ilike(search_pattern),
-            )
-        )
+        condition, rank = search_clause(db, search, ORDERS_SEARCH)
+        query = query.join(Client).where(condition)
 
-    query = query.offset(skip).limit(limit).order_by(Order.created_at.desc())
+    query = paginate(query, ORDERS_KEYSET, skip, limit, cursor, rank)
     result = await db.execute(query)
-    orders = result.scalars().all()
-    return orders
+    orders = finish_page(response, ORDERS_KEYSET, result.unique().scalars().all(), limit, ranked=rank is not None)
+    return [expanded(order, names) for order in orders]
 
 
-@router.get("/{order_id}", response_model=OrderResponse)
-async def get_order(order_id: str, db: AsyncSession = Depends(get_db)):
-    """Obtener orden por ID"""
-    result = await db.execute(select(Order).where(Order.id == order_id))
-    order = result.scalar_one_or_none()
+@router.get("/{order_id}", response_model=OrderExpandedResponse, response_model_exclude_unset=True)
+async def get_order(
+    order_id: str,
+    expand: Optional[str] = Query(None, description="Relaciones a incluir: client,device,history,payments,photos"),
+    db: AsyncSession = Depends(get_db),
+):
+    """Obtener orden por ID
+
+    Con `expand=client,device,history,payments,photos` la orden incluye sus
+    relaciones, en vez de pedirlas a /clients, /payments, /photos e
+    /orders/{id}/history por separado.
+    """
+    names = parse_expand(expand)
+    result = await db.execute(with_expansions(select(Order), names).where(Order.id == order_id))
+    order = result.unique().scalar_one_or_none()
 
     if not order:
         raise HTTPException(status_code=404, detail="Orden no encontrada")
 
-    return order
+    return expanded(order, names)
 
 
 @router.get("/folio/{folio}", response_model=OrderResponse)
@@ -211,6 +280,7 @@ async def update_order(
         db.add(history_entry)
 
     await db.commit()
+    await report_cache.invalidate(ORDERS)
     await db.refresh(order)
     return order
 
@@ -226,6 +296,7 @@ async def delete_order(order_id: str, db: AsyncSession = Depends(get_db)):
 
     await db.delete(order)
     await db.commit()
+    await report_cache.invalidate(ORDERS, PAYMENTS)
     return None
 
 
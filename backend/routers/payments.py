@@ -1,14 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from typing import List, Optional
 from database import get_db
 from models import Payment, PaymentStatus, PaymentMethod, Order
 from schemas import PaymentCreate, PaymentUpdate, PaymentResponse
+from services.cache import report_cache, PAYMENTS
+from utils.pagination import Keyset, paginate, finish_page
 import uuid
 
 router = APIRouter(prefix="/payments", tags=["payments"])
 
+# Orden estable de los listados (paginación por cursor)
+PAYMENTS_KEYSET = Keyset(Payment.created_at, Payment.id)
+
 
 @router.post("/", response_model=PaymentResponse, status_code=status.HTTP_201_CREATED)
 async def create_payment(
@@ -36,6 +41,7 @@ async def create_payment(
 
     db.add(new_payment)
     await db.commit()
+    await report_cache.invalidate(PAYMENTS)
     await db.refresh(new_payment)
 
     return new_payment
@@ -43,8 +49,10 @@ async def create_payment(
 
 @router.get("/", response_model=List[PaymentResponse])
 async def get_payments(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="Cursor de X-Next-Cursor (reemplaza a skip)"),
     order_id: Optional[str] = None,
     method: Optional[PaymentMethod] = None,
     db: AsyncSession = Depends(get_db)
@@ -58,10 +66,9 @@ async def get_payments(
     if method:
         query = query.where(Payment.method == method)
 
-    query = query.offset(skip).limit(limit).order_by(Payment.created_at.desc())
+    query = paginate(query, PAYMENTS_KEYSET, skip, limit, cursor)
     result = await db.execute(query)
-    payments = result.scalars().all()
-    return payments
+    return finish_page(response, PAYMENTS_KEYSET, result.scalars().all(), limit)
 
 
 @router.get("/{payment_id}", response_model=PaymentResponse)
@@ -117,6 +124,7 @@ async def update_payment(
         setattr(payment, field, value)
 
     await db.commit()
+    await report_cache.invalidate(PAYMENTS)
     await db.refresh(payment)
     return payment
 
@@ -135,6 +143,7 @@ async def delete_payment(
 
     await db.delete(payment)
     await db.commit()
+    await report_cache.invalidate(PAYMENTS)
     return None
 
 
@@ -1,11 +1,15 @@
-from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi import APIRouter, Depends, Query, HTTPException, Response
 from fastapi.responses import StreamingResponse
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from sqlalchemy import select, func, and_, case
-from typing import Optional
-from datetime import datetime, timedelta
-from database import get_db
-from models import Order, OrderStatus, Client, Payment, PaymentMethod, InventoryItem, InventoryMovement, User, Device
+from typing import Dict, List, Optional
+import asyncio
+import time
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+from config import settings
+from database import get_db, get_session_factory
+from models import Order, OrderStatus, Client, Payment, PaymentMethod, InventoryItem, InventoryMovement, User, Device, RollupKind
 from pydantic import BaseModel
 from decimal import Decimal
 from auth import get_current_user, require_role
@@ -14,9 +18,15 @@ from utils.pdf_generator import (
     pdf_generate_invoice,
     pdf_generate_report
 )
+from services import daily_stats
+from utils.sql_functions import local_date_trunc
+from services.cache import report_cache, cache_status, ORDERS, PAYMENTS, INVENTORY, CLIENTS
 
 router = APIRouter(prefix="/reports", tags=["reports"])
 
+# Maximum number of points returned by /orders-trend without explicit granularity
+MAX_TREND_POINTS = 60
+
 
 # ============= Response Schemas =============
 class OperationalStats(BaseModel):
@@ -61,6 +71,11 @@ class StatusDistribution(BaseModel):
     value: int
 
 
+class PeriodStats(BaseModel):
+    operational: OperationalStats
+    financial: FinancialStats
+
+
 class DashboardSummary(BaseModel):
     operational: OperationalStats
     financial: FinancialStats
@@ -83,50 +98,124 @@ def get_date_filter(period: str) -> Optional[datetime]:
     return None  # 'all' returns None
 
 
-# ============= Endpoints =============
-@router.get("/operational", response_model=OperationalStats)
-async def get_operational_stats(
-    period: str = Query("30d", regex="^(7d|30d|90d|1y|all)$"),
-    db: AsyncSession = Depends(get_db)
-):
-    """Get operational statistics"""
-    start_date = get_date_filter(period)
+def to_local_date(value: datetime, tz: ZoneInfo) -> date:
+    """Calendar date of a timestamp (naive = UTC) in the given timezone"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(tz).date()
 
-    # Base query
-    query = select(Order)
+
+def bucket_start(day: date, granularity: str) -> date:
+    """First day of the day/week (Monday)/month bucket containing `day`"""
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(day: date, granularity: str) -> date:
+    if granularity == "week":
+        return day + timedelta(days=7)
+    if granularity == "month":
+        return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return day + timedelta(days=1)
+
+
+def iter_buckets(first_day: date, last_day: date, granularity: str):
+    """Every bucket start between two dates, inclusive"""
+    day = bucket_start(first_day, granularity)
+    while day <= last_day:
+        yield day
+        day = next_bucket(day, granularity)
+
+
+def pick_granularity(first_day: date, last_day: date) -> str:
+    """Finest granularity whose bucket count fits in MAX_TREND_POINTS"""
+    if (last_day - first_day).days + 1 <= MAX_TREND_POINTS:
+        return "day"
+    weeks = (bucket_start(last_day, "week") - bucket_start(first_day, "week")).days // 7 + 1
+    if weeks <= MAX_TREND_POINTS:
+        return "week"
+    return "month"
+
+
+def paid_per_order_subquery(start_date: Optional[datetime]):
+    """Subquery (order_id, paid) with the sum of payments per order in the period"""
+    query = select(
+        Payment.order_id, func.sum(Payment.amount).label("paid")
+    ).group_by(Payment.order_id)
     if start_date:
-        query = query.where(Order.created_at >= start_date)
+        query = query.where(Payment.created_at >= start_date)
+    return query.subquery()
 
-    result = await db.execute(query)
-    orders = result.scalars().all()
-
-    total = len(orders)
-    delivered = sum(1 for o in orders if o.status == OrderStatus.DELIVERED)
-    cancelled = sum(1 for o in orders if o.status == OrderStatus.CANCELLED)
-    in_progress = sum(1 for o in orders if o.status not in [OrderStatus.DELIVERED, OrderStatus.CANCELLED])
-    urgent = sum(1 for o in orders if o.priority.value == "urgent")
-
-    # Calculate average repair time
-    avg_days = 0.0
-    delivered_orders = [o for o in orders if o.status == OrderStatus.DELIVERED and o.actual_delivery_date]
-    if delivered_orders:
-        total_days = sum(
-            (o.actual_delivery_date - o.created_at).total_seconds() / 86400
-            for o in delivered_orders
-        )
-        avg_days = total_days / len(delivered_orders)
+
+def build_operational_stats(totals: dict) -> OperationalStats:
+    """Operational stats from per-status rollup totals"""
+    def status_count(status: OrderStatus) -> int:
+        return int(totals.get(status.value, {}).get("count") or 0)
+
+    total = sum(int(t["count"] or 0) for t in totals.values())
+    delivered = status_count(OrderStatus.DELIVERED)
+    cancelled = status_count(OrderStatus.CANCELLED)
+    urgent = sum(int(t["urgent_count"] or 0) for t in totals.values())
+
+    # Average repair time (delivered orders with a delivery date)
+    repair_days = sum(float(t["repair_days"] or 0) for t in totals.values())
+    repair_count = sum(int(t["repair_count"] or 0) for t in totals.values())
+    avg_days = repair_days / repair_count if repair_count > 0 else 0.0
 
     return OperationalStats(
         total_orders=total,
         delivered=delivered,
-        in_progress=in_progress,
+        in_progress=total - delivered - cancelled,
         cancelled=cancelled,
         urgent=urgent,
         avg_repair_days=round(avg_days, 1)
     )
 
 
+def build_financial_stats(
+    payment_totals: dict, order_totals: dict, total_pending: float
+) -> FinancialStats:
+    """Financial stats from per-method and per-status rollup totals"""
+    by_method = {
+        method.value: float(payment_totals.get(method.value, {}).get("amount") or 0)
+        for method in PaymentMethod
+    }
+    total_revenue = sum(by_method.values())
+    delivered_count = int(
+        order_totals.get(OrderStatus.DELIVERED.value, {}).get("count") or 0
+    )
+
+    # Average ticket
+    avg_ticket = total_revenue / delivered_count if delivered_count > 0 else 0.0
+
+    return FinancialStats(
+        total_revenue=round(total_revenue, 2),
+        total_pending=round(total_pending, 2),
+        avg_ticket=round(avg_ticket, 2),
+        by_method=by_method
+    )
+
+
+# ============= Endpoints =============
+@router.get("/operational", response_model=OperationalStats)
+@report_cache.cached("reports/operational", tags=[ORDERS])
+async def get_operational_stats(
+    period: str = Query("30d", regex="^(7d|30d|90d|1y|all)$"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get operational statistics"""
+    start_date = get_date_filter(period)
+
+    # Read per-status totals from the daily rollup
+    totals = await daily_stats.get_totals(db, RollupKind.ORDER_STATUS, start_date)
+    return build_operational_stats(totals)
+
+
 @router.get("/financial", response_model=FinancialStats)
+@report_cache.cached("reports/financial", tags=[ORDERS, PAYMENTS])
 async def get_financial_stats(
     period: str = Query("30d", regex="^(7d|30d|90d|1y|all)$"),
     db: AsyncSession = Depends(get_db)
@@ -134,89 +223,150 @@ async def get_financial_stats(
     """Get financial statistics"""
     start_date = get_date_filter(period)
 
-    # Get orders with payments
-    query = select(Order)
-    if start_date:
-        query = query.where(Order.created_at >= start_date)
+    # Revenue by payment method and delivered count from the daily rollup
+    payment_totals = await daily_stats.get_totals(db, RollupKind.PAYMENT_METHOD, start_date)
+    order_totals = await daily_stats.get_totals(db, RollupKind.ORDER_STATUS, start_date)
 
-    result = await db.execute(query)
-    orders = result.scalars().all()
+    # Pending = estimated cost - paid for non-delivered/cancelled orders.
+    # Only open orders are scanned; their payments are looked up by order_id.
+    paid_query = select(func.coalesce(func.sum(Payment.amount), 0)).where(
+        Payment.order_id == Order.id
+    )
+    if start_date:
+        paid_query = paid_query.where(Payment.created_at >= start_date)
+    balance = func.coalesce(Order.estimated_cost, 0) - paid_query.scalar_subquery()
 
-    # Get payments
-    payment_query = select(Payment)
+    pending_query = select(func.sum(case((balance > 0, balance), else_=0))).where(
+        Order.status.notin_([OrderStatus.DELIVERED, OrderStatus.CANCELLED])
+    )
     if start_date:
-        payment_query = payment_query.where(Payment.created_at >= start_date)
+        pending_query = pending_query.where(Order.created_at >= start_date)
+
+    pending_result = await db.execute(pending_query)
+    total_pending = float(pending_result.scalar() or 0)
+
+    return build_financial_stats(payment_totals, order_totals, total_pending)
+
+
+async def get_pending_by_period(db: AsyncSession, starts: List[Optional[datetime]]) -> List[float]:
+    """Pending balance of open orders for several period starts in one query"""
+    is_open = Order.status.notin_([OrderStatus.DELIVERED, OrderStatus.CANCELLED])
+
+    # Payments of open orders, summed per order once per period
+    paid_columns = []
+    for i, start in enumerate(starts):
+        paid = func.sum(Payment.amount)
+        if start:
+            paid = paid.filter(Payment.created_at >= start)
+        paid_columns.append(paid.label(f"p{i}"))
+    paid = (
+        select(Payment.order_id, *paid_columns)
+        .where(Payment.order_id.in_(select(Order.id).where(is_open)))
+        .group_by(Payment.order_id)
+        .subquery()
+    )
 
-    payment_result = await db.execute(payment_query)
-    payments = payment_result.scalars().all()
+    pending_columns = []
+    for i, start in enumerate(starts):
+        balance = func.coalesce(Order.estimated_cost, 0) - func.coalesce(paid.c[f"p{i}"], 0)
+        pending = func.sum(case((balance > 0, balance), else_=0))
+        if start:
+            pending = pending.filter(Order.created_at >= start)
+        pending_columns.append(pending)
 
-    # Calculate totals
-    total_revenue = float(sum(p.amount for p in payments))
+    result = await db.execute(
+        select(*pending_columns)
+        .select_from(Order)
+        .outerjoin(paid, paid.c.order_id == Order.id)
+        .where(is_open)
+    )
+    return [float(value or 0) for value in result.one()]
 
-    # Pending = estimated cost - paid for non-delivered/cancelled orders
-    total_pending = 0.0
-    for order in orders:
-        if order.status not in [OrderStatus.DELIVERED, OrderStatus.CANCELLED]:
-            estimated = float(order.estimated_cost or 0)
-            paid = float(sum(p.amount for p in payments if p.order_id == order.id))
-            total_pending += max(0, estimated - paid)
 
-    # By payment method
-    by_method = {
-        "cash": float(sum(p.amount for p in payments if p.method == PaymentMethod.CASH)),
-        "card": float(sum(p.amount for p in payments if p.method == PaymentMethod.CARD)),
-        "transfer": float(sum(p.amount for p in payments if p.method == PaymentMethod.TRANSFER))
-    }
+@router.get("/compare", response_model=Dict[str, PeriodStats])
+@report_cache.cached("reports/compare", tags=[ORDERS, PAYMENTS], params=("periods",))
+async def compare_periods(
+    periods: str = Query(
+        "7d,30d,90d", regex="^(7d|30d|90d|1y|all)(,(7d|30d|90d|1y|all))*$"
+    ),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get operational and financial stats for several periods at once
 
-    # Average ticket
-    delivered_count = sum(1 for o in orders if o.status == OrderStatus.DELIVERED)
-    avg_ticket = total_revenue / delivered_count if delivered_count > 0 else 0.0
+    Every period is computed in the same scan with conditional aggregates,
+    so comparing N periods costs four queries (rollup, partial first days
+    per dimension, pending) instead of 3*N.
+    """
+    labels = list(dict.fromkeys(periods.split(",")))
+    starts = {label: get_date_filter(label) for label in labels}
 
-    return FinancialStats(
-        total_revenue=round(total_revenue, 2),
-        total_pending=round(total_pending, 2),
-        avg_ticket=round(avg_ticket, 2),
-        by_method=by_method
+    totals = await daily_stats.get_period_totals(
+        db, [RollupKind.ORDER_STATUS, RollupKind.PAYMENT_METHOD], starts
     )
+    pending = await get_pending_by_period(db, list(starts.values()))
+
+    return {
+        label: PeriodStats(
+            operational=build_operational_stats(
+                totals[label][RollupKind.ORDER_STATUS.value]
+            ),
+            financial=build_financial_stats(
+                totals[label][RollupKind.PAYMENT_METHOD.value],
+                totals[label][RollupKind.ORDER_STATUS.value],
+                total_pending,
+            ),
+        )
+        for label, total_pending in zip(labels, pending)
+    }
 
 
 @router.get("/inventory", response_model=InventoryStats)
+@report_cache.cached("reports/inventory", tags=[INVENTORY], params=())
 async def get_inventory_stats(
     db: AsyncSession = Depends(get_db)
 ):
     """Get inventory statistics"""
-    result = await db.execute(select(InventoryItem))
-    items = result.scalars().all()
-
-    total_value = sum(float(i.purchase_price or 0) * i.stock for i in items)
-    sell_value = sum(float(i.sale_price or 0) * i.stock for i in items)
-    low_stock = sum(1 for i in items if i.stock <= i.min_stock and i.stock > 0)
-    out_of_stock = sum(1 for i in items if i.stock == 0)
-
-    # By category
-    category_map = {}
-    for item in items:
-        cat = item.category or "Sin categoría"
-        if cat not in category_map:
-            category_map[cat] = 0
-        category_map[cat] += float(item.purchase_price or 0) * item.stock
-
+    totals_result = await db.execute(
+        select(
+            func.coalesce(func.sum(InventoryItem.purchase_price * InventoryItem.stock), 0),
+            func.coalesce(func.sum(InventoryItem.sale_price * InventoryItem.stock), 0),
+            func.count(InventoryItem.id).filter(
+                and_(InventoryItem.stock <= InventoryItem.min_stock, InventoryItem.stock > 0)
+            ),
+            func.count(InventoryItem.id).filter(InventoryItem.stock == 0),
+            func.count(InventoryItem.id),
+        )
+    )
+    total_value, sell_value, low_stock, out_of_stock, total_items = totals_result.one()
+
+    # Top 5 categories by stock valuation
+    category = func.coalesce(InventoryItem.category, "Sin categoría").label("name")
+    category_value = func.coalesce(
+        func.sum(InventoryItem.purchase_price * InventoryItem.stock), 0
+    ).label("value")
+    category_result = await db.execute(
+        select(category, category_value)
+        .group_by(category)
+        .order_by(category_value.desc(), category)
+        .limit(5)
+    )
     by_category = [
-        {"name": k, "value": round(v, 2)}
-        for k, v in sorted(category_map.items(), key=lambda x: x[1], reverse=True)[:5]
+        {"name": row.name, "value": round(float(row.value), 2)}
+        for row in category_result.all()
     ]
 
     return InventoryStats(
-        total_value=round(total_value, 2),
-        sell_value=round(sell_value, 2),
+        total_value=round(float(total_value), 2),
+        sell_value=round(float(sell_value), 2),
         low_stock=low_stock,
         out_of_stock=out_of_stock,
-        total_items=len(items),
+        total_items=total_items,
         by_category=by_category
     )
 
 
 @router.get("/clients", response_model=ClientStats)
+@report_cache.cached("reports/clients", tags=[ORDERS, PAYMENTS, CLIENTS])
 async def get_client_stats(
     period: str = Query("30d", regex="^(7d|30d|90d|1y|all)$"),
     db: AsyncSession = Depends(get_db)
@@ -224,54 +374,48 @@ async def get_client_stats(
     """Get client statistics"""
     start_date = get_date_filter(period)
 
-    # Get orders with clients
-    query = select(Order)
-    if start_date:
-        query = query.where(Order.created_at >= start_date)
-
-    result = await db.execute(query)
-    orders = result.scalars().all()
-
-    # Get payments
-    payment_query = select(Payment)
+    # Orders and spend per client in one grouped query
+    paid = paid_per_order_subquery(start_date)
+    per_client_query = (
+        select(
+            Order.client_id,
+            func.count(Order.id).label("orders"),
+            func.coalesce(func.sum(paid.c.paid), 0).label("spent"),
+        )
+        .outerjoin(paid, paid.c.order_id == Order.id)
+        .group_by(Order.client_id)
+    )
     if start_date:
-        payment_query = payment_query.where(Payment.created_at >= start_date)
-    payment_result = await db.execute(payment_query)
-    payments = payment_result.scalars().all()
-
-    # Build client stats
-    client_map = {}
-    for order in orders:
-        cid = order.client_id
-        if cid not in client_map:
-            client_map[cid] = {"orders": 0, "spent": 0.0}
-        client_map[cid]["orders"] += 1
-        client_map[cid]["spent"] += float(sum(
-            p.amount for p in payments if p.order_id == order.id
-        ))
-
-    # Get client names
-    client_ids = list(client_map.keys())
-    if client_ids:
-        clients_result = await db.execute(
-            select(Client).where(Client.id.in_(client_ids))
+        per_client_query = per_client_query.where(Order.created_at >= start_date)
+    per_client = per_client_query.subquery()
+
+    # Top 5 by spend; window aggregates carry the totals over every client
+    query = (
+        select(
+            func.coalesce(Client.name, "Desconocido"),
+            per_client.c.orders,
+            per_client.c.spent,
+            func.count().over(),
+            func.sum(case((per_client.c.orders > 1, 1), else_=0)).over(),
+            func.sum(case((per_client.c.orders == 1, 1), else_=0)).over(),
         )
-        clients = {c.id: c.name for c in clients_result.scalars().all()}
-    else:
-        clients = {}
+        .outerjoin(Client, Client.id == per_client.c.client_id)
+        .order_by(per_client.c.spent.desc(), per_client.c.orders.desc())
+        .limit(5)
+    )
+    rows = (await db.execute(query)).all()
 
-    total_clients = len(client_map)
-    recurring = sum(1 for c in client_map.values() if c["orders"] > 1)
-    new_clients = sum(1 for c in client_map.values() if c["orders"] == 1)
+    total_clients, recurring, new_clients = (
+        (rows[0][3], int(rows[0][4]), int(rows[0][5])) if rows else (0, 0, 0)
+    )
 
-    # Top clients
     top_clients = [
         {
-            "name": clients.get(cid, "Desconocido"),
-            "orders": data["orders"],
-            "spent": round(data["spent"], 2)
+            "name": name,
+            "orders": orders,
+            "spent": round(float(spent), 2)
         }
-        for cid, data in sorted(client_map.items(), key=lambda x: x[1]["spent"], reverse=True)[:5]
+        for name, orders, spent, *_ in rows
     ]
 
     return ClientStats(
@@ -283,36 +427,47 @@ async def get_client_stats(
 
 
 @router.get("/orders-trend")
+@report_cache.cached("reports/orders-trend", tags=[ORDERS], params=("period", "granularity"))
 async def get_orders_trend(
     period: str = Query("30d", regex="^(7d|30d|90d|1y|all)$"),
+    granularity: Optional[str] = Query(None, regex="^(day|week|month)$"),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get orders trend by date"""
-    start_date = get_date_filter(period)
+    """
+    Get orders trend bucketed by day, week or month in the local timezone
 
-    query = select(Order)
-    if start_date:
+    Buckets without orders are returned with 0. Without an explicit
+    granularity the finest one that fits in MAX_TREND_POINTS is used.
+    """
+    tz = ZoneInfo(settings.TIMEZONE)
+    start_date = get_date_filter(period)
+    if start_date is None:
+        first_result = await db.execute(select(func.min(Order.created_at)))
+        start_date = first_result.scalar()
+        if start_date is None:
+            return []
+
+    first_day = to_local_date(start_date, tz)
+    last_day = datetime.now(tz).date()
+    if granularity is None:
+        granularity = pick_granularity(first_day, last_day)
+
+    bucket = local_date_trunc(granularity, Order.created_at, settings.TIMEZONE)
+    query = select(bucket, func.count(Order.id)).group_by(bucket)
+    if period != "all":
         query = query.where(Order.created_at >= start_date)
 
     result = await db.execute(query)
-    orders = result.scalars().all()
-
-    # Group by date
-    date_map = {}
-    for order in orders:
-        date_str = order.created_at.strftime("%Y-%m-%d")
-        date_map[date_str] = date_map.get(date_str, 0) + 1
+    counts = dict(result.all())
 
-    # Sort and return last 14 entries
-    trend = [
-        {"date": k, "orders": v}
-        for k, v in sorted(date_map.items())
-    ][-14:]
-
-    return trend
+    return [
+        {"date": day.isoformat(), "orders": counts.get(day, 0)}
+        for day in iter_buckets(first_day, last_day, granularity)
+    ]
 
 
 @router.get("/orders-by-status")
+@report_cache.cached("reports/orders-by-status", tags=[ORDERS])
 async def get_orders_by_status(
     period: str = Query("30d", regex="^(7d|30d|90d|1y|all)$"),
     db: AsyncSession = Depends(get_db)
@@ -320,48 +475,81 @@ async def get_orders_by_status(
     """Get orders distribution by status"""
     start_date = get_date_filter(period)
 
-    query = select(Order)
+    query = select(Order.status, func.count(Order.id)).group_by(Order.status)
     if start_date:
         query = query.where(Order.created_at >= start_date)
 
     result = await db.execute(query)
-    orders = result.scalars().all()
+    status_count = dict(result.all())
 
     status_labels = {
-        "received": "Recibido",
-        "diagnosing": "Diagnóstico",
-        "waiting_parts": "Esp. Repuestos",
-        "in_repair": "En Reparación",
-        "repaired": "Reparado",
-        "delivered": "Entregado",
-        "cancelled": "Cancelado"
+        OrderStatus.RECEIVED: "Recibido",
+        OrderStatus.DIAGNOSING: "Diagnóstico",
+        OrderStatus.WAITING_PARTS: "Esp. Repuestos",
+        OrderStatus.IN_REPAIR: "En Reparación",
+        OrderStatus.REPAIRED: "Reparado",
+        OrderStatus.DELIVERED: "Entregado",
+        OrderStatus.CANCELLED: "Cancelado"
     }
 
-    status_count = {}
-    for order in orders:
-        label = status_labels.get(order.status.value, order.status.value)
-        status_count[label] = status_count.get(label, 0) + 1
+    # Workflow order, only statuses present in the period
+    return [
+        {"name": status_labels.get(status, status.value), "value": status_count[status]}
+        for status in OrderStatus
+        if status in status_count
+    ]
+
+
+async def timed_section(session_factory: async_sessionmaker, section, *args):
+    """Run a cached report section and measure it (ms)
 
-    return [{"name": k, "value": v} for k, v in status_count.items()]
+    The section opens its own session from the factory, and only on a cache miss.
+    """
+    start = time.perf_counter()
+    result = await section(*args, cache_sessions=session_factory)
+    return result, (time.perf_counter() - start) * 1000
+
+
+@report_cache.cached("reports/dashboard", tags=[ORDERS, PAYMENTS, INVENTORY, CLIENTS])
+async def compute_dashboard_summary(period: str, session_factory: async_sessionmaker) -> dict:
+    """Dashboard sections and how long each took (ms), cached together"""
+    sections = {
+        "operational": (get_operational_stats, period),
+        "financial": (get_financial_stats, period),
+        "inventory": (get_inventory_stats,),
+        "clients": (get_client_stats, period),
+    }
+    results = await asyncio.gather(*(
+        timed_section(session_factory, fn, *args) for fn, *args in sections.values()
+    ))
+    return {
+        "summary": dict(zip(sections, (result for result, _ in results))),
+        "timings": {name: round(elapsed, 1) for name, (_, elapsed) in zip(sections, results)},
+    }
 
 
 @router.get("/dashboard", response_model=DashboardSummary)
 async def get_dashboard_summary(
+    response: Response,
     period: str = Query("30d", regex="^(7d|30d|90d|1y|all)$"),
-    db: AsyncSession = Depends(get_db)
+    session_factory: async_sessionmaker = Depends(get_session_factory)
 ):
-    """Get complete dashboard summary"""
-    operational = await get_operational_stats(period, db)
-    financial = await get_financial_stats(period, db)
-    inventory = await get_inventory_stats(db)
-    clients = await get_client_stats(period, db)
-
-    return DashboardSummary(
-        operational=operational,
-        financial=financial,
-        inventory=inventory,
-        clients=clients
-    )
+    """Get complete dashboard summary
+
+    The four sections run concurrently, each on its own pooled connection.
+    Every response (cache hits and coalesced requests included) carries a
+    Server-Timing header with the per-section durations of the computation
+    that produced the data and a `cache` entry for this request's lookup.
+    """
+    start = time.perf_counter()
+    dashboard = await compute_dashboard_summary(period, session_factory)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    timings = [f"{name};dur={duration:.1f}" for name, duration in dashboard["timings"].items()]
+    timings.append(f"cache;desc={cache_status.get()};dur={elapsed:.1f}")
+    response.headers["Server-Timing"] = ", ".join(timings)
+
+    return DashboardSummary(**dashboard["summary"])
 
 
 # ============= PDF Endpoints =============
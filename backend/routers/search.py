@@ -0,0 +1,174 @@
+import asyncio
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import select, or_
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from database import get_session_factory
+from models import Client, Device, Order, InventoryItem
+from schemas import SearchResponse
+from routers.clients import CLIENTS_SEARCH
+from routers.inventory import ITEMS_SEARCH
+from utils.search import (
+    FOLIO, IMEI, PHONE, SKU, TEXT,
+    detect_kinds, digits_column, digits_of, match_score, phone_digits, search_clause
+)
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+
+def result(type_: str, id_: str, title: str, subtitle, match: str, score: float) -> dict:
+    return {
+        "type": type_,
+        "id": id_,
+        "title": title,
+        "subtitle": subtitle,
+        "match": match,
+        "score": round(score, 3),
+    }
+
+
+async def search_folio(db: AsyncSession, term: str, limit: int) -> list:
+    """Órdenes por folio (índice único; el prefijo usa el índice trigram)"""
+    term = term.upper()
+    rows = await db.execute(
+        select(Order.id, Order.folio, Order.status, Client.name)
+        .join(Client)
+        .where(or_(Order.folio == term, Order.folio.ilike(f"{term}%")))
+        .order_by(Order.folio)
+        .limit(limit)
+    )
+    return [
+        result("order", id_, folio, f"{name} · {status.value}", FOLIO, match_score(folio, term))
+        for id_, folio, status, name in rows
+    ]
+
+
+async def search_imei(db: AsyncSession, term: str, limit: int) -> list:
+    """Equipos por IMEI (exacto por el índice de devices.imei, parcial por trigram)"""
+    digits = digits_of(term)
+    rows = await db.execute(
+        select(Device.id, Device.brand, Device.model, Device.imei, Client.name)
+        .join(Client)
+        .where(or_(Device.imei == digits, Device.imei.ilike(f"%{digits}%")))
+        .order_by(Device.imei)
+        .limit(limit)
+    )
+    return [
+        result("device", id_, f"{brand} {model}", f"{imei} · {name}", IMEI, match_score(imei, digits))
+        for id_, brand, model, imei, name in rows
+    ]
+
+
+async def search_phone(db: AsyncSession, term: str, limit: int) -> list:
+    """Clientes por teléfono principal o alterno, comparando solo dígitos
+
+    "55 1234-5678" guardado así se encuentra buscando "5512345678" y al revés.
+    Del término se usa el número nacional, sin lada internacional: "+52 55 1234
+    5678" encuentra el número guardado sin ella (y uno guardado con ella lo
+    contiene igual).
+    """
+    digits = phone_digits(term)
+    pattern = f"%{digits}%"
+    rows = await db.execute(
+        select(Client.id, Client.name, Client.phone, Client.alternate_phone)
+        .where(or_(
+            digits_column(db, Client.phone).like(pattern),
+            digits_column(db, Client.alternate_phone).like(pattern),
+        ))
+        .order_by(Client.name)
+        .limit(limit)
+    )
+    return [
+        result(
+            "client", id_, name, phone, PHONE,
+            max(
+                match_score(phone_digits(phone or ""), digits),
+                match_score(phone_digits(alternate or ""), digits),
+            ),
+        )
+        for id_, name, phone, alternate in rows
+    ]
+
+
+async def search_sku(db: AsyncSession, term: str, limit: int) -> list:
+    """Artículos de inventario por SKU (índice único; el prefijo usa trigram)"""
+    rows = await db.execute(
+        select(InventoryItem.id, InventoryItem.sku, InventoryItem.name)
+        .where(or_(InventoryItem.sku == term, InventoryItem.sku.ilike(f"{term}%")))
+        .order_by(InventoryItem.sku)
+        .limit(limit)
+    )
+    return [
+        result("inventory_item", id_, name, sku, SKU, match_score(sku, term))
+        for id_, sku, name in rows
+    ]
+
+
+async def search_text(db: AsyncSession, term: str, limit: int) -> list:
+    """Clientes por nombre/correo y artículos por nombre/descripción (por similitud en PostgreSQL)"""
+    results = []
+
+    condition, rank = search_clause(db, term, CLIENTS_SEARCH)
+    query = select(Client.id, Client.name, Client.phone, Client.email).where(condition)
+    rows = await db.execute(query.order_by(rank.desc() if rank is not None else Client.name).limit(limit))
+    results += [
+        result(
+            "client", id_, name, phone, TEXT,
+            max(match_score(name, term), match_score(phone, term), match_score(email, term)),
+        )
+        for id_, name, phone, email in rows
+    ]
+
+    condition, rank = search_clause(db, term, ITEMS_SEARCH)
+    query = select(
+        InventoryItem.id, InventoryItem.sku, InventoryItem.name, InventoryItem.description
+    ).where(condition)
+    rows = await db.execute(query.order_by(rank.desc() if rank is not None else InventoryItem.name).limit(limit))
+    results += [
+        result(
+            "inventory_item", id_, name, sku, TEXT,
+            # Una coincidencia en la descripción pesa menos que en el nombre
+            max(match_score(name, term), match_score(sku, term), match_score(description, term) / 2),
+        )
+        for id_, sku, name, description in rows
+    ]
+    return results
+
+
+SEARCHES = {
+    FOLIO: search_folio,
+    IMEI: search_imei,
+    PHONE: search_phone,
+    SKU: search_sku,
+    TEXT: search_text,
+}
+
+
+async def run_search(session_factory: async_sessionmaker, kind: str, term: str, limit: int) -> list:
+    """Ejecutar una búsqueda en su propia sesión (y conexión del pool)"""
+    async with session_factory() as session:
+        return await SEARCHES[kind](session, term, limit)
+
+
+@router.get("", response_model=SearchResponse)
+async def global_search(
+    q: str = Query(..., min_length=2, max_length=100, description="Teléfono, IMEI, folio, SKU o nombre"),
+    limit: int = Query(20, ge=1, le=100),
+    session_factory: async_sessionmaker = Depends(get_session_factory),
+):
+    """Búsqueda global para recepción
+
+    Detecta el tipo de término y consulta en paralelo solo las tablas que
+    pueden contenerlo. Devuelve una lista única ordenada por relevancia.
+    """
+    term = q.strip()
+    kinds = detect_kinds(term)
+    batches = await asyncio.gather(*(run_search(session_factory, kind, term, limit) for kind in kinds))
+
+    # Un mismo registro puede aparecer por varios caminos: se queda el mejor
+    best = {}
+    for item in (item for batch in batches for item in batch):
+        key = (item["type"], item["id"])
+        if key not in best or item["score"] > best[key]["score"]:
+            best[key] = item
+    results = sorted(best.values(), key=lambda item: (-item["score"], item["title"]))
+    return {"query": term, "kinds": kinds, "results": results[:limit]}
@@ -184,6 +184,16 @@ class PaymentResponse(PaymentBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+# ============= Expanded Order Schemas =============
+class OrderExpandedResponse(OrderResponse):
+    """Orden con las relaciones pedidas en `expand` (las demás se omiten)"""
+    client: Optional[ClientResponse] = None
+    device: Optional[DeviceResponse] = None
+    history: Optional[List[OrderHistoryResponse]] = None
+    payments: Optional[List[PaymentResponse]] = None
+    photos: Optional[List[OrderPhotoResponse]] = None
+
+
 # ============= Inventory Schemas =============
 class InventoryItemBase(BaseModel):
     sku: str = Field(..., max_length=100)
@@ -343,3 +353,19 @@ class AppointmentResponse(AppointmentBase):
     updated_at: datetime
 
     model_config = ConfigDict(from_attributes=True)
+
+
+# ============= Search Schemas =============
+class SearchResult(BaseModel):
+    type: str  # client, device, order, inventory_item
+    id: str
+    title: str
+    subtitle: Optional[str] = None
+    match: str  # tipo de término que lo encontró (phone, imei, folio, sku, text)
+    score: float
+
+
+class SearchResponse(BaseModel):
+    query: str
+    kinds: List[str]
+    results: List[SearchResult]
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark del overhead por petición de PerformanceMiddleware
+Uso: python scripts/bench_middleware.py [--requests 5000] [--chunks 200]
+
+Compara una app sin middleware, la versión anterior basada en
+BaseHTTPMiddleware y el middleware ASGI actual, con un endpoint JSON y un
+StreamingResponse de muchos fragmentos. Las peticiones se hacen en proceso
+(httpx + ASGITransport), así que el resultado es solo el coste del middleware.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# Agregar el directorio backend al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from middleware import PerformanceMiddleware, route_template
+from services.request_metrics import MetricsRegistry
+
+
+class LegacyPerformanceMiddleware(BaseHTTPMiddleware):
+    """Implementación anterior (BaseHTTPMiddleware), solo como referencia"""
+
+    def __init__(self, app, registry: MetricsRegistry):
+        super().__init__(app)
+        self.registry = registry
+
+    async def dispatch(self, request: Request, call_next):
+        start_time = time.perf_counter()
+        response = await call_next(request)
+        response_time = (time.perf_counter() - start_time) * 1000
+        self.registry.record(
+            request.method, route_template(request.scope), response.status_code, response_time
+        )
+        response.headers["X-Response-Time"] = f"{response_time:.2f}ms"
+        return response
+
+
+def build_app(middleware, chunks: int) -> FastAPI:
+    app = FastAPI()
+    if middleware is not None:
+        app.add_middleware(middleware, registry=MetricsRegistry())
+
+    @app.get("/json/{item_id}")
+    async def json_endpoint(item_id: str):
+        return {"item_id": item_id, "status": "ok"}
+
+    @app.get("/stream")
+    async def stream_endpoint():
+        async def body():
+            for i in range(chunks):
+                yield b"x" * 64
+
+        return StreamingResponse(body(), media_type="application/octet-stream")
+
+    return app
+
+
+VARIANTS = {
+    "sin middleware": None,
+    "BaseHTTPMiddleware": LegacyPerformanceMiddleware,
+    "ASGI": PerformanceMiddleware,
+}
+
+
+async def time_requests(app: FastAPI, path: str, requests: int) -> float:
+    """Tiempo medio por petición (µs)"""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(min(200, requests)):
+            await client.get(path)
+        start = time.perf_counter()
+        for _ in range(requests):
+            await client.get(path)
+        return (time.perf_counter() - start) / requests * 1_000_000
+
+
+async def run(requests: int, chunks: int):
+    paths = {"json": "/json/abc", f"stream ({chunks} fragmentos)": "/stream"}
+    for label, path in paths.items():
+        print(f"\n{label}")
+        print(f"{'variante':>20} | {'µs/petición':>12} | {'overhead':>10}")
+        baseline = None
+        for name, middleware in VARIANTS.items():
+            elapsed = await time_requests(build_app(middleware, chunks), path, requests)
+            baseline = elapsed if baseline is None else baseline
+            print(f"{name:>20} | {elapsed:>12.1f} | {elapsed - baseline:>+8.1f}µs")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--chunks", type=int, default=200)
+    args = parser.parse_args()
+
+    asyncio.run(run(args.requests, args.chunks))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
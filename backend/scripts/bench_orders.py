@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Benchmark de creación de órdenes: órdenes creadas por segundo con concurrencia
+Uso: python scripts/bench_orders.py [--requests 2000] [--concurrency 1 8 32] [--database-url URL]
+
+Compara el flujo anterior (SELECT de cliente y equipo, commit, refresh,
+historial y segundo commit) con `create_order` actual (un solo flush con
+RETURNING). Cada creación usa su propia sesión, como `get_db`, así que con
+PostgreSQL cada tarea concurrente ocupa una conexión del pool.
+
+Por defecto usa un archivo SQLite temporal (las escrituras se serializan, así
+que la concurrencia solo es representativa con --database-url apuntando a una
+base PostgreSQL de pruebas; las tablas se crean y se eliminan al terminar).
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+# Agregar el directorio backend al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import HTTPException
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from database import Base
+from models import Client, Device, Order, OrderHistory, OrderStatus
+from routers import orders
+from schemas import OrderCreate
+
+CLIENTS = 200
+
+
+def build_engine(database_url: str, pool_size: int):
+    if database_url.startswith("sqlite"):
+        engine = create_async_engine(database_url, connect_args={"timeout": 30})
+
+        @event.listens_for(engine.sync_engine, "connect")
+        def _enable_foreign_keys(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA foreign_keys=ON")
+            cursor.close()
+
+        return engine
+    return create_async_engine(database_url, pool_size=pool_size, max_overflow=0)
+
+
+async def legacy_create_order(order_data: OrderCreate, db: AsyncSession):
+    """Flujo anterior de create_order, solo como referencia"""
+    client_result = await db.execute(select(Client).where(Client.id == order_data.client_id))
+    if not client_result.scalar_one_or_none():
+        raise HTTPException(status_code=404, detail="Cliente no encontrado")
+    if order_data.device_id:
+        device_result = await db.execute(select(Device).where(Device.id == order_data.device_id))
+        if not device_result.scalar_one_or_none():
+            raise HTTPException(status_code=404, detail="Dispositivo no encontrado")
+
+    new_order = Order(
+        id=str(uuid.uuid4()),
+        folio=orders.generate_folio(),
+        qr_code=orders.generate_qr_code(),
+        **order_data.model_dump(),
+    )
+    db.add(new_order)
+    await db.commit()
+    await db.refresh(new_order)
+
+    db.add(OrderHistory(
+        id=str(uuid.uuid4()),
+        order_id=new_order.id,
+        status=OrderStatus.RECEIVED,
+        notes="Orden creada",
+    ))
+    await db.commit()
+    return new_order
+
+
+async def current_create_order(order_data: OrderCreate, db: AsyncSession):
+    return await orders.create_order(order_data=order_data, db=db)
+
+
+VARIANTS = {
+    "anterior": legacy_create_order,
+    "actual": current_create_order,
+}
+
+
+async def create_with_session(factory, create, order_data: OrderCreate):
+    """Igual que get_db: una sesión por petición y commit al final"""
+    async with factory() as session:
+        await create(order_data, session)
+        await session.commit()
+
+
+async def run_variant(factory, create, total: int, concurrency: int) -> float:
+    """Órdenes por segundo creando `total` órdenes con `concurrency` tareas"""
+    pending = iter(range(total))
+
+    async def worker():
+        for n in pending:
+            n_client = n % CLIENTS
+            order_data = OrderCreate(
+                client_id=f"bench-client-{n_client}",
+                device_id=f"bench-device-{n_client}",
+                problem_description="Orden sintética de benchmark",
+            )
+            await create_with_session(factory, create, order_data)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return total / (time.perf_counter() - start)
+
+
+async def run(total: int, levels, database_url: str):
+    engine = build_engine(database_url, max(levels))
+    factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    try:
+        async with factory() as session:
+            session.add_all([
+                Client(id=f"bench-client-{i}", name=f"Cliente {i}", phone=f"55{i:08d}")
+                for i in range(CLIENTS)
+            ])
+            await session.flush()
+            session.add_all([
+                Device(id=f"bench-device-{i}", client_id=f"bench-client-{i}", brand="Marca", model="Modelo")
+                for i in range(CLIENTS)
+            ])
+            await session.commit()
+
+        # Calentar el pool y las sentencias preparadas
+        for create in VARIANTS.values():
+            await run_variant(factory, create, min(total, 50), 1)
+
+        print(f"{'concurrencia':>12} | " + " | ".join(f"{name:>14}" for name in VARIANTS))
+        for concurrency in levels:
+            rates = [await run_variant(factory, create, total, concurrency) for create in VARIANTS.values()]
+            print(f"{concurrency:>12} | " + " | ".join(f"{rate:>9.0f} op/s" for rate in rates))
+    finally:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+        await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench_orders.db')}"
+        asyncio.run(run(args.requests, args.concurrency, database_url))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Benchmark de los endpoints de reportes: latencia vs. número de órdenes
+Uso: python scripts/bench_reports.py [--sizes 1000 10000 100000] [--database-url URL]
+
+Por defecto usa SQLite en memoria; con --database-url se puede apuntar a una
+base PostgreSQL de pruebas (las tablas se crean y se eliminan al terminar).
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Agregar el directorio backend al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.pool import StaticPool
+
+from database import Base
+from models import Client, Order, OrderStatus, OrderPriority, Payment, PaymentMethod
+from routers import reports
+from services.daily_stats import rebuild_daily_stats
+
+BATCH_SIZE = 5000
+
+
+def build_engine(database_url: str):
+    if database_url.startswith("sqlite"):
+        return create_async_engine(
+            database_url,
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool,
+        )
+    return create_async_engine(database_url)
+
+
+async def seed_orders(session: AsyncSession, start: int, count: int):
+    """Insertar `count` órdenes sintéticas (con 0-2 pagos cada una) a partir de `start`"""
+    now = datetime.utcnow()
+    statuses = list(OrderStatus)
+    methods = list(PaymentMethod)
+    rows = []
+    payment_rows = []
+    for n in range(start, start + count):
+        created = now - timedelta(days=random.randint(0, 720), minutes=random.randint(0, 1440))
+        status = random.choice(statuses)
+        rows.append({
+            "id": f"bench-order-{n}",
+            "folio": f"B-{n:08d}",
+            "qr_code": f"bench-qr-{n}",
+            "client_id": f"bench-client-{n % 500}",
+            "status": status,
+            "priority": OrderPriority.URGENT if n % 7 == 0 else OrderPriority.NORMAL,
+            "problem_description": "Orden sintética de benchmark",
+            "estimated_cost": random.randint(100, 3000),
+            "created_at": created,
+            "updated_at": created,
+            "actual_delivery_date": (
+                created + timedelta(days=random.randint(1, 10))
+                if status == OrderStatus.DELIVERED else None
+            ),
+        })
+        for p in range(random.randint(0, 2)):
+            payment_rows.append({
+                "id": f"bench-payment-{n}-{p}",
+                "order_id": f"bench-order-{n}",
+                "amount": random.randint(50, 1500),
+                "method": random.choice(methods),
+                "created_at": created + timedelta(hours=p),
+            })
+        if len(rows) >= BATCH_SIZE:
+            await session.execute(insert(Order), rows)
+            await session.execute(insert(Payment), payment_rows)
+            rows, payment_rows = [], []
+    if rows:
+        await session.execute(insert(Order), rows)
+    if payment_rows:
+        await session.execute(insert(Payment), payment_rows)
+    await session.commit()
+
+
+async def time_call(factory, fn, repeat: int) -> float:
+    """Mediana de latencia (ms) de `fn(session)` sobre `repeat` ejecuciones"""
+    samples = []
+    for _ in range(repeat):
+        async with factory() as session:
+            start = time.perf_counter()
+            await fn(session)
+            samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+BENCHMARKS = {
+    "operational": lambda db: reports.get_operational_stats(period="all", db=db),
+    "financial": lambda db: reports.get_financial_stats(period="all", db=db),
+    "clients": lambda db: reports.get_client_stats(period="all", db=db),
+}
+
+
+async def run(sizes, database_url: str, repeat: int):
+    engine = build_engine(database_url)
+    factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    try:
+        async with factory() as session:
+            session.add_all([
+                Client(id=f"bench-client-{i}", name=f"Cliente {i}", phone=f"55{i:08d}")
+                for i in range(500)
+            ])
+            await session.commit()
+
+        print(f"{'órdenes':>10} | " + " | ".join(f"{name:>14}" for name in BENCHMARKS))
+        seeded = 0
+        for size in sorted(sizes):
+            async with factory() as session:
+                await seed_orders(session, seeded, size - seeded)
+                # Core bulk inserts bypass the ORM listener; rebuild the rollup
+                await rebuild_daily_stats(session)
+                await session.commit()
+            seeded = size
+
+            timings = [await time_call(factory, fn, repeat) for fn in BENCHMARKS.values()]
+            print(f"{size:>10} | " + " | ".join(f"{t:>11.2f} ms" for t in timings))
+    finally:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+        await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--database-url", default="sqlite+aiosqlite:///:memory:")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    asyncio.run(run(args.sizes, args.database_url, args.repeat))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
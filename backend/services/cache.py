@@ -0,0 +1,265 @@
+"""
+Caché de resultados para los endpoints de reportes y métricas.
+
+Las entradas se identifican por endpoint + parámetros (p. ej. period) y se
+etiquetan con los dominios de datos de los que dependen (orders, payments,
+inventory, clients). Cada dominio tiene un número de versión que forma parte
+de la clave; al escribir en un dominio los routers llaman a `invalidate`, que
+incrementa la versión y deja obsoletas todas las entradas afectadas sin tener
+que enumerarlas. Las entradas además expiran por TTL.
+
+Los fallos de caché pasan por un SingleFlight: peticiones idénticas que llegan
+mientras el resultado se calcula esperan ese mismo cálculo. `cache_status`
+indica a la petición en curso cómo se resolvió su última búsqueda (hit, miss
+o shared si esperó un cálculo ajeno), p. ej. para el header Server-Timing.
+
+Backends:
+- memory: LRU en proceso (por defecto)
+- redis: compartido entre workers de uvicorn usando REDIS_URL
+"""
+import functools
+import inspect
+import json
+import logging
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Sequence
+
+from fastapi import Depends
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from config import settings
+from database import get_session_factory
+from services.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Dominios de invalidación
+ORDERS = "orders"
+PAYMENTS = "payments"
+INVENTORY = "inventory"
+CLIENTS = "clients"
+
+# Resultado de la última búsqueda de la petición en curso: hit, miss o shared
+cache_status: ContextVar[Optional[str]] = ContextVar("report_cache_status", default=None)
+
+
+class MemoryCacheBackend:
+    """LRU en proceso con TTL por entrada"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.versions: Dict[str, int] = {}
+
+    async def get_versions(self, tags: Sequence[str]) -> Dict[str, int]:
+        return {tag: self.versions.get(tag, 0) for tag in tags}
+
+    async def bump(self, tags: Sequence[str]):
+        for tag in tags:
+            self.versions[tag] = self.versions.get(tag, 0) + 1
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires_at, payload = entry
+        if expires_at < time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return payload
+
+    async def set(self, key: str, payload: str, ttl: int):
+        self.entries[key] = (time.monotonic() + ttl, payload)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    async def clear(self):
+        self.entries.clear()
+        self.versions.clear()
+
+
+class RedisCacheBackend:
+    """Caché compartida en Redis; las versiones de dominio son contadores INCR"""
+
+    PREFIX = "salvacell:cache:"
+
+    def __init__(self, url: str):
+        self.url = url
+        self._client = None
+
+    @property
+    def client(self):
+        """Lazy initialization of Redis client"""
+        if self._client is None:
+            import redis.asyncio as redis
+            self._client = redis.from_url(self.url, decode_responses=True)
+        return self._client
+
+    async def get_versions(self, tags: Sequence[str]) -> Dict[str, int]:
+        if not tags:
+            return {}
+        values = await self.client.mget([f"{self.PREFIX}version:{tag}" for tag in tags])
+        return {tag: int(value or 0) for tag, value in zip(tags, values)}
+
+    async def bump(self, tags: Sequence[str]):
+        async with self.client.pipeline(transaction=False) as pipe:
+            for tag in tags:
+                pipe.incr(f"{self.PREFIX}version:{tag}")
+            await pipe.execute()
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self.client.get(self.PREFIX + key)
+
+    async def set(self, key: str, payload: str, ttl: int):
+        await self.client.set(self.PREFIX + key, payload, ex=ttl)
+
+    async def clear(self):
+        keys = [key async for key in self.client.scan_iter(f"{self.PREFIX}*")]
+        if keys:
+            await self.client.delete(*keys)
+
+
+class ReportCache:
+    """Caché de resultados con invalidación por dominio"""
+
+    def __init__(self, backend, ttl: int):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.flights = SingleFlight()
+
+    @classmethod
+    def from_settings(cls) -> "ReportCache":
+        if settings.REPORT_CACHE_BACKEND == "redis":
+            backend = RedisCacheBackend(settings.REDIS_URL)
+        else:
+            backend = MemoryCacheBackend(settings.REPORT_CACHE_MAX_ENTRIES)
+        return cls(backend, settings.REPORT_CACHE_TTL)
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    async def make_key(self, name: str, params: Dict[str, Any], tags: Sequence[str]) -> str:
+        versions = await self.backend.get_versions(tags)
+        query = "&".join(f"{k}={v}" for k, v in sorted(params.items()))
+        generation = ",".join(f"{tag}:{versions[tag]}" for tag in sorted(tags))
+        return f"{name}?{query}#{generation}"
+
+    async def get_or_compute(
+        self,
+        name: str,
+        params: Dict[str, Any],
+        tags: Sequence[str],
+        compute: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """
+        Devolver el resultado en caché o calcularlo y guardarlo
+
+        En un fallo de caché las peticiones idénticas concurrentes comparten un
+        único cálculo (single-flight), también con la caché desactivada.
+        """
+        try:
+            key = await self.make_key(name, params, tags)
+            payload = await self.backend.get(key) if self.enabled else None
+        except Exception as e:
+            logger.warning(f"Caché de reportes no disponible: {e}")
+            cache_status.set("miss")
+            return await compute()
+
+        if payload is not None:
+            self.hits += 1
+            cache_status.set("hit")
+            return json.loads(payload)
+
+        self.misses += 1
+        cache_status.set("shared" if key in self.flights.in_flight else "miss")
+        return await self.flights.run(key, lambda: self._compute_and_store(key, compute))
+
+    async def _compute_and_store(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        value = await compute()
+        if self.enabled:
+            try:
+                await self.backend.set(key, json.dumps(jsonable_encoder(value)), self.ttl)
+            except Exception as e:
+                logger.warning(f"No se pudo guardar en la caché de reportes: {e}")
+        return value
+
+    async def invalidate(self, *tags: str):
+        """Invalidar todas las entradas que dependen de los dominios dados"""
+        try:
+            await self.backend.bump(tags)
+        except Exception as e:
+            logger.warning(f"No se pudo invalidar la caché de reportes: {e}")
+
+    async def clear(self):
+        await self.backend.clear()
+        self.hits = 0
+        self.misses = 0
+        self.flights = SingleFlight()
+
+    def get_stats(self) -> dict:
+        """Aciertos/fallos de la caché y coalescencia de cálculos"""
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "enabled": self.enabled,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "single_flight": self.flights.get_stats(),
+        }
+
+    def cached(self, name: str, tags: Iterable[str], params: Iterable[str] = ("period",)):
+        """Decorador para endpoints: cachea por `name` + parámetros indicados
+
+        Si el endpoint recibe `db`, el cálculo compartido por single-flight usa
+        su propia sesión (del factory `cache_sessions`, inyectado por FastAPI)
+        en lugar de la sesión de la primera petición: si esa petición se cancela
+        o termina, `get_db` cerraría la sesión mientras las demás aún esperan.
+        """
+        tags = tuple(tags)
+        params = tuple(params)
+
+        def decorator(fn):
+            signature = inspect.signature(fn)
+            uses_db = "db" in signature.parameters
+
+            @functools.wraps(fn)
+            async def wrapper(*args, cache_sessions: Optional[async_sessionmaker] = None, **kwargs):
+                bound = signature.bind_partial(*args, **kwargs)
+                key_params = {p: bound.arguments[p] for p in params if p in bound.arguments}
+
+                async def compute():
+                    if not uses_db or cache_sessions is None:
+                        return await fn(*args, **kwargs)
+                    async with cache_sessions() as session:
+                        return await fn(*args, **{**kwargs, "db": session})
+
+                return await self.get_or_compute(name, key_params, tags, compute)
+
+            if uses_db:
+                # FastAPI inyecta el factory en lugar de abrir una sesión por petición
+                parameters = [p for key, p in signature.parameters.items() if key != "db"]
+                parameters.append(inspect.Parameter(
+                    "cache_sessions",
+                    inspect.Parameter.KEYWORD_ONLY,
+                    default=Depends(get_session_factory),
+                    annotation=async_sessionmaker,
+                ))
+                wrapper.__signature__ = signature.replace(parameters=parameters)
+
+            return wrapper
+
+        return decorator
+
+
+# Instancia global
+report_cache = ReportCache.from_settings()
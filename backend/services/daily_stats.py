@@ -0,0 +1,458 @@
+"""
+Rollups diarios (tabla daily_stats) para reportes y métricas.
+
+Cada fila acumula, por día UTC, los contadores de una dimensión:
+- order_status: órdenes por día de creación y estado actual (urgentes, días de reparación)
+- payment_method: pagos e importe por día de pago y método
+- movement_type: movimientos de inventario y cantidad por día y tipo
+
+Las filas se mantienen de forma incremental con un listener `after_flush` de
+SQLAlchemy, de modo que cualquier escritura ORM por instancia (routers,
+cascadas, scripts) actualiza el rollup en la misma transacción. Las sentencias
+Core `update()`/`delete()` y las escrituras masivas (bulk) no pasan por el
+listener: después de usarlas hay que correr `rebuild_daily_stats`, que
+recalcula desde las tablas fuente y sirve como backfill/reparación (tarea
+Celery).
+
+Los periodos móviles (7d, 30d...) empiezan en un instante, no a medianoche:
+las lecturas toman del rollup los días completos y suman el día parcial
+inicial desde las tablas fuente.
+"""
+import logging
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from sqlalchemy import event, inspect, select, delete, text, func, and_, or_, literal
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.base import NO_VALUE
+
+from models import (
+    DailyStat,
+    RollupKind,
+    Order,
+    OrderStatus,
+    OrderPriority,
+    Payment,
+    PaymentMethod,
+    InventoryMovement,
+    MovementType,
+)
+from utils.sql_functions import days_between, utc_date
+
+logger = logging.getLogger(__name__)
+
+METRIC_COLUMNS = ("count", "urgent_count", "repair_days", "repair_count", "amount", "quantity")
+
+RollupKey = Tuple[str, date, str]
+Deltas = Dict[RollupKey, Dict[str, Any]]
+
+
+# ============= Contributions =============
+def to_utc_naive(value: datetime) -> datetime:
+    """Normalizar un datetime (con o sin zona) a UTC naive"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def utc_day(value: datetime) -> date:
+    """Día UTC de un timestamp"""
+    return to_utc_naive(value).date()
+
+
+def order_contribution(values: dict) -> Deltas:
+    status = OrderStatus(values["status"] or OrderStatus.RECEIVED)
+    priority = OrderPriority(values["priority"] or OrderPriority.NORMAL)
+    metrics = {"count": 1, "urgent_count": int(priority == OrderPriority.URGENT)}
+
+    created_at = values["created_at"]
+    delivered_at = values["actual_delivery_date"]
+    if status == OrderStatus.DELIVERED and delivered_at and created_at:
+        elapsed = to_utc_naive(delivered_at) - to_utc_naive(created_at)
+        metrics["repair_days"] = elapsed.total_seconds() / 86400
+        metrics["repair_count"] = 1
+
+    return {(RollupKind.ORDER_STATUS.value, utc_day(created_at), status.value): metrics}
+
+
+def payment_contribution(values: dict) -> Deltas:
+    method = PaymentMethod(values["method"])
+    return {
+        (RollupKind.PAYMENT_METHOD.value, utc_day(values["created_at"]), method.value): {
+            "count": 1,
+            "amount": values["amount"] or 0,
+        }
+    }
+
+
+def movement_contribution(values: dict) -> Deltas:
+    movement_type = MovementType(values["type"])
+    return {
+        (RollupKind.MOVEMENT_TYPE.value, utc_day(values["created_at"]), movement_type.value): {
+            "count": 1,
+            "quantity": values["quantity"] or 0,
+        }
+    }
+
+
+# Modelo -> (atributos que afectan el rollup, función de contribución)
+CONTRIBUTORS = {
+    Order: (("created_at", "status", "priority", "actual_delivery_date"), order_contribution),
+    Payment: (("created_at", "method", "amount"), payment_contribution),
+    InventoryMovement: (("created_at", "type", "quantity"), movement_contribution),
+}
+
+
+# session.info: valores leídos de la base para las instancias sin ellos cargados
+STORED_VALUES = "daily_stats_stored_values"
+
+
+def loaded_value(state, field: str, previous: bool = False):
+    """Valor actual (o previo al flush) en memoria; NO_VALUE si no está cargado"""
+    if previous and field in state.committed_state:
+        return state.committed_state[field]
+    return state.dict.get(field, NO_VALUE)
+
+
+def has_server_default(model, field: str) -> bool:
+    return getattr(model, field).property.columns[0].server_default is not None
+
+
+def load_stored_values(session: Session, objs, stored: dict, previous: bool = False):
+    """Leer de la base los atributos del rollup que las instancias no tienen cargados
+
+    Pasa con atributos expirados, o al modificar una fila cargada sin esas
+    columnas (p. ej. sin el valor anterior de `status`). Sin esto el delta se
+    calcularía con el valor nuevo o en el día equivocado. En una fila recién
+    insertada solo faltan los defaults del servidor que el INSERT no devolvió
+    (lo demás sin asignar es NULL).
+    """
+    pending = {}
+    for obj in objs:
+        state = inspect(obj)
+        fields, _ = CONTRIBUTORS[type(obj)]
+        if any(
+            loaded_value(state, field, previous) is NO_VALUE
+            and (previous or has_server_default(type(obj), field))
+            for field in fields
+        ):
+            key = state.key[1][0] if state.key else state.dict["id"]
+            pending.setdefault(type(obj), {})[key] = state
+
+    for model, states in pending.items():
+        fields, _ = CONTRIBUTORS[model]
+        rows = session.connection().execute(
+            select(model.id, *(getattr(model, field) for field in fields)).where(model.id.in_(states))
+        )
+        for row in rows:
+            stored[states[row[0]]] = dict(zip(fields, row[1:]))
+
+
+def snapshot(obj, fields, previous: bool = False, stored: Optional[dict] = None) -> dict:
+    """Valores actuales (o previos al flush) sin disparar cargas perezosas"""
+    state = inspect(obj)
+    values = {}
+    for field in fields:
+        value = loaded_value(state, field, previous)
+        values[field] = stored.get(state, {}).get(field) if value is NO_VALUE else value
+    return values
+
+
+def merge(deltas: Deltas, contribution: Deltas, sign: int):
+    for key, metrics in contribution.items():
+        bucket = deltas.setdefault(key, {})
+        for column, value in metrics.items():
+            bucket[column] = bucket.get(column, 0) + sign * value
+
+
+def changed(obj, fields) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[field].history.has_changes() for field in fields)
+
+
+def updated_contributors(session: Session) -> list:
+    """Instancias ya persistidas cuyo aporte al rollup cambia en el flush"""
+    objs = [obj for obj in session.deleted if type(obj) in CONTRIBUTORS]
+    objs += [
+        obj for obj in session.dirty
+        if type(obj) in CONTRIBUTORS and changed(obj, CONTRIBUTORS[type(obj)][0])
+    ]
+    return objs
+
+
+def collect_deltas(session: Session, stored: dict) -> Deltas:
+    """Calcular los deltas del rollup para los objetos de un flush"""
+    deltas: Deltas = {}
+
+    for obj in session.new:
+        if type(obj) in CONTRIBUTORS:
+            fields, contribution = CONTRIBUTORS[type(obj)]
+            merge(deltas, contribution(snapshot(obj, fields, stored=stored)), 1)
+
+    for obj in session.deleted:
+        if type(obj) in CONTRIBUTORS:
+            fields, contribution = CONTRIBUTORS[type(obj)]
+            merge(deltas, contribution(snapshot(obj, fields, previous=True, stored=stored)), -1)
+
+    for obj in session.dirty:
+        if type(obj) in CONTRIBUTORS:
+            fields, contribution = CONTRIBUTORS[type(obj)]
+            if not changed(obj, fields):
+                continue
+            merge(deltas, contribution(snapshot(obj, fields, previous=True, stored=stored)), -1)
+            merge(deltas, contribution(snapshot(obj, fields, stored=stored)), 1)
+
+    return deltas
+
+
+def additive_upsert(connection):
+    """INSERT de filas de daily_stats que suma a las existentes en conflicto"""
+    upsert = pg_insert if connection.dialect.name == "postgresql" else sqlite_insert
+    stmt = upsert(DailyStat)
+    return stmt.on_conflict_do_update(
+        index_elements=[DailyStat.kind, DailyStat.day, DailyStat.key],
+        set_={
+            column: getattr(DailyStat, column) + stmt.excluded[column]
+            for column in METRIC_COLUMNS
+        },
+    )
+
+
+def apply_deltas(connection, deltas: Deltas):
+    """Upsert aditivo de los deltas en daily_stats"""
+    rows = []
+    for (kind, day, key), metrics in deltas.items():
+        values = {column: metrics.get(column, 0) for column in METRIC_COLUMNS}
+        if any(values.values()):
+            rows.append({"kind": kind, "day": day, "key": key, **values})
+    if rows:
+        connection.execute(additive_upsert(connection), rows)
+
+
+@event.listens_for(Session, "before_flush")
+def load_previous_values(session: Session, flush_context, instances):
+    """Leer los valores previos que falten antes de que el flush los sobrescriba"""
+    stored = {}
+    load_stored_values(session, updated_contributors(session), stored, previous=True)
+    session.info[STORED_VALUES] = stored
+
+
+@event.listens_for(Session, "after_flush")
+def track_daily_stats(session: Session, flush_context):
+    """Mantener daily_stats en la misma transacción que la escritura"""
+    stored = session.info.pop(STORED_VALUES, {})
+    # Defaults del servidor que el INSERT no devolvió
+    load_stored_values(session, [obj for obj in session.new if type(obj) in CONTRIBUTORS], stored)
+    deltas = collect_deltas(session, stored)
+    if deltas:
+        apply_deltas(session.connection(), deltas)
+
+
+# ============= Source aggregates =============
+# Dimensión -> (timestamp que fija el día, columna que da la key)
+SOURCES = {
+    RollupKind.ORDER_STATUS: (Order.created_at, Order.status),
+    RollupKind.PAYMENT_METHOD: (Payment.created_at, Payment.method),
+    RollupKind.MOVEMENT_TYPE: (InventoryMovement.created_at, InventoryMovement.type),
+}
+
+
+def source_metrics(kind: RollupKind, where=None, prefix: str = "") -> list:
+    """Columnas de daily_stats calculadas desde la tabla fuente de una dimensión
+
+    Con `where` cada agregado se restringe a esas filas (FILTER), para
+    calcular varias ventanas en la misma consulta.
+    """
+    def aggregate(expression, condition=None):
+        conditions = [c for c in (where, condition) if c is not None]
+        return expression.filter(and_(*conditions)) if conditions else expression
+
+    if kind == RollupKind.ORDER_STATUS:
+        is_repaired = and_(
+            Order.status == OrderStatus.DELIVERED,
+            Order.actual_delivery_date.isnot(None),
+        )
+        values = {
+            "count": aggregate(func.count(Order.id)),
+            "urgent_count": aggregate(func.count(Order.id), Order.priority == OrderPriority.URGENT),
+            "repair_days": aggregate(
+                func.sum(days_between(Order.actual_delivery_date, Order.created_at)), is_repaired
+            ),
+            "repair_count": aggregate(func.count(Order.id), is_repaired),
+        }
+    elif kind == RollupKind.PAYMENT_METHOD:
+        values = {
+            "count": aggregate(func.count(Payment.id)),
+            "amount": aggregate(func.sum(Payment.amount)),
+        }
+    else:
+        values = {
+            "count": aggregate(func.count(InventoryMovement.id)),
+            "quantity": aggregate(func.sum(InventoryMovement.quantity)),
+        }
+    return [values.get(column, literal(0)).label(f"{prefix}{column}") for column in METRIC_COLUMNS]
+
+
+# ============= Reads =============
+async def get_totals(
+    db: AsyncSession, kind: RollupKind, start_date: Optional[datetime] = None
+) -> Dict[str, Dict[str, Any]]:
+    """Totales por key de una dimensión desde start_date (None = todo el historial)"""
+    totals = await get_period_totals(db, [kind], {"period": start_date})
+    return totals["period"][kind.value]
+
+
+async def get_period_totals(
+    db: AsyncSession, kinds: Sequence[RollupKind], periods: Dict[str, Optional[datetime]]
+) -> Dict[str, Dict[str, Dict[str, Dict[str, Any]]]]:
+    """
+    Totales por dimensión y key para varios periodos en un solo recorrido
+
+    Cada periodo se calcula con agregados condicionales (FILTER) sobre las
+    mismas filas, de modo que N periodos cuestan una consulta. Los periodos
+    empiezan en el instante exacto de su fecha de inicio: el rollup aporta los
+    días completos posteriores y el día parcial inicial se suma desde las
+    tablas fuente (ver `get_first_day_totals`).
+
+    Args:
+        db: Sesión de base de datos
+        kinds: Dimensiones a leer
+        periods: Etiqueta -> fecha de inicio (None = todo el historial)
+
+    Returns:
+        {periodo: {kind: {key: {columna: total}}}}
+    """
+    labels = list(periods)
+    starts = {label: utc_day(start) for label, start in periods.items() if start}
+
+    columns = []
+    for i, label in enumerate(labels):
+        for column in METRIC_COLUMNS:
+            total = func.sum(getattr(DailyStat, column))
+            if label in starts:
+                total = total.filter(DailyStat.day > starts[label])
+            columns.append(total.label(f"p{i}_{column}"))
+
+    query = (
+        select(DailyStat.kind, DailyStat.key, *columns)
+        .where(DailyStat.kind.in_([kind.value for kind in kinds]))
+        .group_by(DailyStat.kind, DailyStat.key)
+    )
+    if len(starts) == len(labels) and starts:
+        query = query.where(DailyStat.day > min(starts.values()))
+
+    totals = {label: {kind.value: {} for kind in kinds} for label in labels}
+    result = await db.execute(query)
+    for row in result.all():
+        values = row._mapping
+        for i, label in enumerate(labels):
+            totals[label][row.kind][row.key] = {
+                column: values[f"p{i}_{column}"] for column in METRIC_COLUMNS
+            }
+
+    first_days = {label: start for label, start in periods.items() if start}
+    if first_days:
+        partial = await get_first_day_totals(db, kinds, first_days)
+        for label, by_kind in partial.items():
+            for kind, by_key in by_kind.items():
+                for key, metrics in by_key.items():
+                    bucket = totals[label][kind].setdefault(key, dict.fromkeys(METRIC_COLUMNS, 0))
+                    for column, value in metrics.items():
+                        bucket[column] = (bucket[column] or 0) + (value or 0)
+    return totals
+
+
+async def get_first_day_totals(
+    db: AsyncSession, kinds: Sequence[RollupKind], starts: Dict[str, datetime]
+) -> Dict[str, Dict[str, Dict[str, Dict[str, Any]]]]:
+    """Totales desde cada fecha de inicio hasta el final de ese día UTC
+
+    El rollup solo tiene días completos; este tramo se lee de las tablas
+    fuente (una consulta por dimensión, acotada por el índice de created_at).
+    """
+    windows = {}
+    for label, start in starts.items():
+        start = to_utc_naive(start)
+        windows[label] = (start, datetime.combine(start.date() + timedelta(days=1), time.min))
+
+    totals = {label: {kind.value: {} for kind in kinds} for label in starts}
+    for kind in kinds:
+        timestamp, key = SOURCES[kind]
+        conditions = {
+            label: and_(timestamp >= since, timestamp < until)
+            for label, (since, until) in windows.items()
+        }
+        columns = []
+        for i, label in enumerate(windows):
+            columns += source_metrics(kind, conditions[label], prefix=f"p{i}_")
+        result = await db.execute(
+            select(key, *columns).where(or_(*conditions.values())).group_by(key)
+        )
+        for row in result.all():
+            values = row._mapping
+            for i, label in enumerate(windows):
+                if values[f"p{i}_count"]:
+                    totals[label][kind.value][row[0].value] = {
+                        column: values[f"p{i}_{column}"] for column in METRIC_COLUMNS
+                    }
+    return totals
+
+
+# ============= Backfill / repair =============
+async def rebuild_daily_stats(db: AsyncSession, start_day: Optional[date] = None) -> int:
+    """
+    Recalcular daily_stats desde orders, payments e inventory_movements
+
+    Corre junto a las escrituras normales, así que primero bloquea daily_stats
+    contra ellas (en PostgreSQL `SHARE ROW EXCLUSIVE`, que choca con el upsert
+    del listener; en SQLite el DELETE toma el lock de escritura) y recién
+    entonces lee las tablas fuente. Una escritura en curso termina antes de la
+    lectura o espera al commit del recálculo y suma su delta después; ninguna
+    se pierde. Las filas se escriben con el mismo upsert aditivo del listener.
+
+    Args:
+        db: Sesión de base de datos (el caller hace commit)
+        start_day: Primer día a recalcular; None recalcula todo el historial
+
+    Returns:
+        Número de filas de rollup escritas
+    """
+    since = datetime.combine(start_day, time.min) if start_day else None
+
+    def in_range(query, column):
+        return query.where(column >= since) if since else query
+
+    connection = await db.connection()
+    if connection.dialect.name == "postgresql":
+        await db.execute(text("LOCK TABLE daily_stats IN SHARE ROW EXCLUSIVE MODE"))
+
+    clear = delete(DailyStat)
+    if start_day:
+        clear = clear.where(DailyStat.day >= start_day)
+    await db.execute(clear)
+
+    rows = []
+    for kind, (timestamp, key) in SOURCES.items():
+        day = utc_date(timestamp)
+        result = await db.execute(in_range(
+            select(day, key, *source_metrics(kind)).group_by(day, key),
+            timestamp,
+        ))
+        rows += [
+            {
+                "kind": kind.value,
+                "day": row[0],
+                "key": row[1].value,
+                **{column: row._mapping[column] or 0 for column in METRIC_COLUMNS},
+            }
+            for row in result.all()
+        ]
+
+    if rows:
+        await connection.execute(additive_upsert(connection), rows)
+
+    logger.info(f"daily_stats recalculado desde {start_day or 'el inicio'}: {len(rows)} filas")
+    return len(rows)
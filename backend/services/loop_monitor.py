@@ -0,0 +1,214 @@
+"""
+Event-loop lag sampler and blocking-call detector.
+
+A background task sleeps for a fixed interval and measures how late it wakes
+up. Anything beyond the interval is time the loop spent running other
+callbacks without yielding, i.e. how long a new request would wait before
+being served.
+
+A watchdog thread checks that the sampler keeps waking up. When it has been
+late for more than LOOP_STALL_THRESHOLD_MS the loop is stuck in a blocking
+call right now, so the watchdog grabs the loop thread's stack
+(sys._current_frames) and the request of the running task. Once the loop
+recovers, the stall duration is charged to that (route, call site) pair. One
+stack is sampled per stall, so the cost is nil while the loop is healthy.
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Dict, List, Optional
+
+from config import settings
+from services.request_metrics import LatencyHistogram, route_template
+
+logger = logging.getLogger(__name__)
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STACK_DEPTH = 12
+MAX_BLOCKERS = 200
+
+
+def is_app_frame(frame: traceback.FrameSummary) -> bool:
+    return frame.filename.startswith(APP_DIR) and "site-packages" not in frame.filename
+
+
+def call_site(stack: List[traceback.FrameSummary]) -> str:
+    """Innermost frame of our own code in a stack (innermost frame if none)"""
+    frame = next((f for f in reversed(stack) if is_app_frame(f)), stack[-1])
+    return f"{os.path.relpath(frame.filename, APP_DIR)}:{frame.lineno} in {frame.name}"
+
+
+class Blocker:
+    """Stalls observed at one (route, call site)"""
+
+    def __init__(self, route: str, site: str, stack: List[str]):
+        self.route = route
+        self.site = site
+        self.stack = stack
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_seen: Optional[float] = None
+
+    def record(self, duration_ms: float):
+        self.count += 1
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+        self.last_seen = time.time()
+
+    def to_dict(self) -> dict:
+        return {
+            "route": self.route,
+            "site": self.site,
+            "count": self.count,
+            "total_ms": round(self.total_ms, 2),
+            "max_ms": round(self.max_ms, 2),
+            "avg_ms": round(self.total_ms / self.count, 2) if self.count else 0.0,
+            "last_seen": self.last_seen,
+            "stack": self.stack,
+        }
+
+
+class LoopLagMonitor:
+    """Samples event-loop lag every `interval` seconds and detects stalls"""
+
+    def __init__(self, interval: float = 0.5, stall_threshold_ms: float = 100):
+        self.interval = interval
+        self.stall_threshold_ms = stall_threshold_ms
+        self.last_lag_ms = 0.0
+        self.lag = LatencyHistogram()
+        self.stalls = 0
+        self.blockers: Dict[tuple, Blocker] = {}
+        self.requests: Dict[asyncio.Task, dict] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._last_tick = 0.0
+        self._sampled_tick: Optional[float] = None
+        self._pending: Optional[tuple] = None
+        self._lock = threading.Lock()
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            self._last_tick = start
+            await asyncio.sleep(self.interval)
+            lag_ms = max((time.perf_counter() - start - self.interval) * 1000, 0.0)
+            self.last_lag_ms = lag_ms
+            self.lag.observe(lag_ms)
+            if self.stall_threshold_ms and lag_ms >= self.stall_threshold_ms:
+                self._finish_stall(start, lag_ms)
+
+    def _finish_stall(self, tick: float, lag_ms: float):
+        """Charge a finished stall to the blocker sampled while it lasted"""
+        with self._lock:
+            pending, self._pending = self._pending, None
+            self.stalls += 1
+            if pending is None or pending[0] != tick:
+                return
+            blocker = pending[1]
+            blocker.record(lag_ms)
+        logger.warning(
+            f"Event loop blocked for {lag_ms:.0f}ms in {blocker.route} at {blocker.site}"
+        )
+
+    def _watch(self):
+        check_every = max(self.stall_threshold_ms / 2000, 0.005)
+        while not self._stopping.wait(check_every):
+            tick = self._last_tick
+            late_ms = (time.perf_counter() - tick - self.interval) * 1000
+            if late_ms >= self.stall_threshold_ms and self._sampled_tick != tick:
+                self._sampled_tick = tick
+                try:
+                    self._sample(tick)
+                except Exception as e:
+                    logger.debug(f"Could not sample blocked loop: {e}")
+
+    def _sample(self, tick: float):
+        """Stack of the loop thread and route of the running task"""
+        task = asyncio.current_task(self._loop)
+        if task is self._task:
+            # The sampler itself is running: the stall just ended
+            return
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return
+        stack = traceback.extract_stack(frame)
+        scope = self.requests.get(task)
+        route = f"{scope['method']} {route_template(scope)}" if scope else "background"
+        site = call_site(stack)
+
+        with self._lock:
+            blocker = self.blockers.get((route, site))
+            if blocker is None:
+                if len(self.blockers) >= MAX_BLOCKERS:
+                    smallest = min(self.blockers, key=lambda key: self.blockers[key].total_ms)
+                    del self.blockers[smallest]
+                blocker = Blocker(route, site, traceback.format_list(stack[-STACK_DEPTH:]))
+                self.blockers[(route, site)] = blocker
+            self._pending = (tick, blocker)
+
+    def track_request(self, scope: dict) -> Optional[asyncio.Task]:
+        """Remember which request the current task serves (for attribution)"""
+        task = asyncio.current_task()
+        if task is not None:
+            self.requests[task] = scope
+        return task
+
+    def untrack_request(self, task: Optional[asyncio.Task]):
+        if task is not None:
+            self.requests.pop(task, None)
+
+    def top_blockers(self, limit: Optional[int] = 20) -> List[dict]:
+        """Blockers with the most total stalled time first"""
+        with self._lock:
+            blockers = sorted(
+                (b for b in self.blockers.values() if b.count), key=lambda b: b.total_ms, reverse=True
+            )
+            return [blocker.to_dict() for blocker in blockers[:limit]]
+
+    def reset(self):
+        with self._lock:
+            self.lag = LatencyHistogram()
+            self.stalls = 0
+            self.blockers.clear()
+            self._pending = None
+
+    def start(self):
+        """Start sampling on the running loop (idempotent)"""
+        if self._task is None or self._task.done():
+            self._loop = asyncio.get_running_loop()
+            self._loop_thread_id = threading.get_ident()
+            self._last_tick = time.perf_counter()
+            self._task = self._loop.create_task(self._run())
+        if self.stall_threshold_ms and (self._watchdog is None or not self._watchdog.is_alive()):
+            self._stopping.clear()
+            self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._watchdog.start()
+
+    async def stop(self):
+        if self._watchdog is not None:
+            self._stopping.set()
+            self._watchdog.join()
+            self._watchdog = None
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+
+# Global instance
+loop_monitor = LoopLagMonitor(stall_threshold_ms=settings.LOOP_STALL_THRESHOLD_MS)
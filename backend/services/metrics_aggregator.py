@@ -0,0 +1,187 @@
+"""
+Cross-worker aggregation of request metrics.
+
+Each uvicorn worker keeps its own MetricsRegistry and periodically flushes a
+cumulative snapshot to a shared store (Redis at REDIS_URL). The JSON
+/metrics/* endpoints merge the snapshots of all live workers at read time
+(the Prometheus exposition stays per worker), so requests
+pay no extra network hop and any worker can answer with fleet-wide numbers.
+Snapshots expire after a few flush intervals, dropping workers that died.
+
+With METRICS_AGGREGATION=local (the default) only the answering worker's
+registry is used.
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+from typing import List, Optional
+
+from config import settings
+from services.request_metrics import MetricsRegistry, metrics_registry
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryMetricsStore:
+    """In-process store (single worker or tests)"""
+
+    def __init__(self):
+        self.snapshots = {}
+        self.reset_marker = 0.0
+
+    async def put(self, worker_id: str, payload: str, ttl: int):
+        self.snapshots[worker_id] = (time.monotonic() + ttl, payload)
+
+    async def get_all(self) -> List[str]:
+        now = time.monotonic()
+        return [payload for expires_at, payload in self.snapshots.values() if expires_at >= now]
+
+    async def get_reset_marker(self) -> float:
+        return self.reset_marker
+
+    async def reset(self, marker: float):
+        self.reset_marker = marker
+        self.snapshots.clear()
+
+
+class RedisMetricsStore:
+    """Snapshots shared through Redis, one expiring key per worker"""
+
+    PREFIX = "salvacell:metrics:"
+
+    def __init__(self, url: str):
+        self.url = url
+        self._client = None
+
+    @property
+    def client(self):
+        """Lazy initialization of Redis client"""
+        if self._client is None:
+            import redis.asyncio as redis
+            self._client = redis.from_url(self.url, decode_responses=True)
+        return self._client
+
+    async def put(self, worker_id: str, payload: str, ttl: int):
+        await self.client.set(f"{self.PREFIX}worker:{worker_id}", payload, ex=ttl)
+
+    async def get_all(self) -> List[str]:
+        keys = [key async for key in self.client.scan_iter(f"{self.PREFIX}worker:*")]
+        if not keys:
+            return []
+        return [payload for payload in await self.client.mget(keys) if payload]
+
+    async def get_reset_marker(self) -> float:
+        return float(await self.client.get(f"{self.PREFIX}reset") or 0)
+
+    async def reset(self, marker: float):
+        keys = [key async for key in self.client.scan_iter(f"{self.PREFIX}worker:*")]
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.set(f"{self.PREFIX}reset", marker)
+            if keys:
+                pipe.delete(*keys)
+            await pipe.execute()
+
+
+class MetricsAggregator:
+    """Flushes the local registry and merges all workers' snapshots on read"""
+
+    def __init__(
+        self,
+        registry: MetricsRegistry,
+        store=None,
+        interval: float = 10,
+        worker_id: Optional[str] = None,
+    ):
+        self.registry = registry
+        self.store = store
+        self.interval = interval
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.last_reset: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_settings(cls, registry: MetricsRegistry) -> "MetricsAggregator":
+        store = None
+        if settings.METRICS_AGGREGATION == "redis":
+            store = RedisMetricsStore(settings.REDIS_URL)
+        return cls(registry, store, settings.METRICS_FLUSH_INTERVAL)
+
+    @property
+    def enabled(self) -> bool:
+        return self.store is not None
+
+    async def flush(self):
+        """Publish this worker's snapshot, applying any fleet-wide reset first"""
+        marker = await self.store.get_reset_marker()
+        if self.last_reset is None:
+            self.last_reset = marker
+        elif marker > self.last_reset:
+            self.registry.reset()
+            self.last_reset = marker
+
+        payload = json.dumps({"worker": self.worker_id, **self.registry.snapshot()})
+        await self.store.put(self.worker_id, payload, ttl=int(self.interval * 3))
+
+    async def _run(self):
+        while True:
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning(f"Could not flush metrics snapshot: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Start periodic flushing on the running loop (no-op when local)"""
+        if self.enabled and (self._task is None or self._task.done()):
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.warning(f"Could not flush metrics snapshot: {e}")
+
+    async def fleet_registry(self) -> MetricsRegistry:
+        """Registry merged across workers (this worker's live data included)"""
+        if not self.enabled:
+            return self.registry
+
+        try:
+            payloads = await self.store.get_all()
+        except Exception as e:
+            logger.warning(f"Metrics store unavailable, using local metrics: {e}")
+            return self.registry
+
+        snapshots = [self.registry.snapshot()]
+        for payload in payloads:
+            snapshot = json.loads(payload)
+            if snapshot.pop("worker", None) != self.worker_id:
+                snapshots.append(snapshot)
+        return MetricsRegistry.from_snapshots(snapshots)
+
+    async def reset(self):
+        """Reset this worker now and every other worker on its next flush"""
+        self.registry.reset()
+        if not self.enabled:
+            return
+        marker = time.time()
+        try:
+            await self.store.reset(marker)
+            self.last_reset = marker
+        except Exception as e:
+            logger.warning(f"Could not reset fleet metrics: {e}")
+
+
+# Global instance
+metrics_aggregator = MetricsAggregator.from_settings(metrics_registry)
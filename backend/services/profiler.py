@@ -0,0 +1,207 @@
+"""
+On-demand profiling of a live worker.
+
+- SamplingProfiler: a helper thread samples the event-loop thread's stack
+  every few milliseconds and counts collapsed stacks ("a;b;c 42", the input
+  format of flamegraph.pl and speedscope). Samples can be restricted to the
+  requests of one route, using the task -> scope map the loop monitor keeps
+  for PerformanceMiddleware.
+- profile_cpu: deterministic cProfile of the loop thread for N seconds,
+  returned as a marshalled pstats file (pstats.Stats, snakeviz).
+- MemoryTracer: tracemalloc snapshots diffed against the previous one, to
+  find what keeps growing between two calls.
+
+Only one profiling session runs at a time per worker; profiling never needs
+a restart.
+"""
+import asyncio
+import cProfile
+import marshal
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+from services.loop_monitor import loop_monitor
+from services.request_metrics import MetricsRegistry, route_template
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class ProfilerBusy(Exception):
+    """Another profiling session is already running in this worker"""
+
+
+def short_path(filename: str) -> str:
+    """Path relative to the backend for our code, file name otherwise"""
+    if filename.startswith(APP_DIR):
+        return os.path.relpath(filename, APP_DIR)
+    return os.path.basename(filename)
+
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({short_path(code.co_filename)}:{code.co_firstlineno})"
+
+
+_session = threading.Lock()
+
+
+@contextmanager
+def exclusive_session():
+    if not _session.acquire(blocking=False):
+        raise ProfilerBusy()
+    try:
+        yield
+    finally:
+        _session.release()
+
+
+class SamplingProfiler:
+    """Collapsed stacks of the event-loop thread"""
+
+    def __init__(self, interval: float = 0.005, task_filter: Optional[Callable] = None):
+        self.interval = interval
+        self.task_filter = task_filter
+        self.stacks = Counter()
+        self.samples = 0
+        self._loop = asyncio.get_running_loop()
+        self._thread_id = threading.get_ident()
+        self._stopping = threading.Event()
+
+    def sample(self):
+        if self.task_filter is not None and not self.task_filter(asyncio.current_task(self._loop)):
+            return
+        frame = sys._current_frames().get(self._thread_id)
+        labels = []
+        while frame is not None:
+            labels.append(frame_label(frame))
+            frame = frame.f_back
+        if labels:
+            self.stacks[";".join(reversed(labels))] += 1
+            self.samples += 1
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            self.sample()
+
+    async def run(self, timeout: float, done: Optional[Callable[[], bool]] = None):
+        """Sample until `timeout` seconds pass or `done()` returns True"""
+        thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        thread.start()
+        deadline = time.monotonic() + timeout
+        try:
+            while time.monotonic() < deadline and not (done and done()):
+                await asyncio.sleep(min(0.05, self.interval * 10))
+        finally:
+            self._stopping.set()
+            thread.join()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+async def profile_seconds(seconds: float, interval: float = 0.005) -> SamplingProfiler:
+    """Sample everything the loop runs for `seconds`"""
+    with exclusive_session():
+        profiler = SamplingProfiler(interval)
+        await profiler.run(seconds)
+        return profiler
+
+
+async def profile_route(
+    registry: MetricsRegistry,
+    method: str,
+    route: str,
+    requests: int,
+    timeout: float,
+    interval: float = 0.005,
+) -> SamplingProfiler:
+    """Sample only while the loop serves `method route`, until `requests` finish"""
+    def serves_route(task) -> bool:
+        scope = loop_monitor.requests.get(task)
+        return scope is not None and scope["method"] == method and route_template(scope) == route
+
+    baseline = registry.request_count(method, route)
+
+    def finished() -> bool:
+        count = registry.request_count(method, route)
+        # A metrics reset restarts the count
+        return count - (baseline if count >= baseline else 0) >= requests
+
+    with exclusive_session():
+        profiler = SamplingProfiler(interval, task_filter=serves_route)
+        await profiler.run(timeout, finished)
+        return profiler
+
+
+async def profile_cpu(seconds: float) -> bytes:
+    """cProfile of the loop thread for `seconds`, as a pstats file"""
+    with exclusive_session():
+        # Enabled from a coroutine, so it traces the event-loop thread
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.disable()
+        profiler.create_stats()
+        return marshal.dumps(profiler.stats)
+
+
+class MemoryTracer:
+    """tracemalloc snapshots, each one diffed against the previous"""
+
+    def __init__(self):
+        self.baseline: Optional[tracemalloc.Snapshot] = None
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 10):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self.baseline = self.take()
+
+    def take(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ))
+
+    def snapshot(self, key_type: str = "lineno", limit: int = 20) -> dict:
+        """Top allocations and growth since the previous snapshot"""
+        snapshot = self.take()
+        current, peak = tracemalloc.get_traced_memory()
+        growth = snapshot.compare_to(self.baseline, key_type) if self.baseline else []
+        self.baseline = snapshot
+        return {
+            "traced_kb": round(current / 1024, 1),
+            "peak_kb": round(peak / 1024, 1),
+            "top": [stat_dict(stat) for stat in snapshot.statistics(key_type)[:limit]],
+            "growth": [stat_dict(stat) for stat in growth[:limit]],
+        }
+
+    def stop(self):
+        self.baseline = None
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+def stat_dict(stat) -> dict:
+    frames = [f"{short_path(frame.filename)}:{frame.lineno}" for frame in stat.traceback]
+    entry = {"size_kb": round(stat.size / 1024, 1), "count": stat.count, "traceback": frames}
+    if hasattr(stat, "size_diff"):
+        entry["size_diff_kb"] = round(stat.size_diff / 1024, 1)
+        entry["count_diff"] = stat.count_diff
+    return entry
+
+
+# Global instance
+memory_tracer = MemoryTracer()
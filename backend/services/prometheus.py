@@ -0,0 +1,155 @@
+"""
+Prometheus text exposition (format 0.0.4) for GET /metrics.
+
+Publishes the request histograms from the metrics registry per route
+template and status class, time-to-first-byte histograms per route, SQL
+query counts and DB time per route, SQLAlchemy pool gauges and checkout wait
+times, WebSocket connection counts, event-loop lag and time blocked per call
+site. Values are per worker process (the local registry, not the Redis
+fleet merge used by the JSON endpoints), so each worker must be scraped and
+Prometheus aggregates across workers/instances.
+"""
+from typing import Dict, Iterable, List, Optional
+
+from services.request_metrics import LatencyHistogram
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+PREFIX = "salvacell_"
+
+
+def escape_label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def format_labels(labels: Optional[Dict[str, str]]) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(f'{key}="{escape_label(value)}"' for key, value in labels.items())
+    return "{" + pairs + "}"
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Exposition:
+    """Accumulates metric families and renders them as text"""
+
+    def __init__(self):
+        self.lines: List[str] = []
+
+    def header(self, name: str, metric_type: str, help_text: str):
+        self.lines.append(f"# HELP {PREFIX}{name} {help_text}")
+        self.lines.append(f"# TYPE {PREFIX}{name} {metric_type}")
+
+    def sample(self, name: str, value: float, labels: Optional[Dict[str, str]] = None):
+        self.lines.append(f"{PREFIX}{name}{format_labels(labels)} {format_value(value)}")
+
+    def gauge(self, name: str, help_text: str, value: float, labels: Optional[Dict[str, str]] = None):
+        self.header(name, "gauge", help_text)
+        self.sample(name, value, labels)
+
+    def histogram(self, name: str, help_text: str, series: Iterable[tuple]):
+        """Histogram in seconds from (labels, LatencyHistogram in ms) pairs"""
+        self.header(name, "histogram", help_text)
+        for labels, histogram in series:
+            self.histogram_samples(name, labels, histogram)
+
+    def histogram_samples(self, name: str, labels: Dict[str, str], histogram: LatencyHistogram):
+        cumulative = 0
+        for upper_ms, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            self.sample(f"{name}_bucket", cumulative, {**labels, "le": format_value(upper_ms / 1000)})
+        self.sample(f"{name}_bucket", histogram.count, {**labels, "le": "+Inf"})
+        self.sample(f"{name}_sum", histogram.sum_ms / 1000, labels)
+        self.sample(f"{name}_count", histogram.count, labels)
+
+    def render(self) -> str:
+        return "\n".join(self.lines) + "\n"
+
+
+def pool_gauges(exposition: Exposition, pool):
+    """Gauges for a QueuePool; pools without a queue (tests) report what they can"""
+    checked_out = pool.checkedout() if hasattr(pool, "checkedout") else 0
+    size = pool.size() if hasattr(pool, "size") else 0
+    overflow = max(pool.overflow(), 0) if hasattr(pool, "overflow") else 0
+    capacity = size + max(getattr(pool, "_max_overflow", 0), 0)
+
+    exposition.gauge("db_pool_size", "Configured number of persistent pool connections", size)
+    exposition.gauge("db_pool_capacity", "Maximum connections (pool size + max overflow)", capacity)
+    exposition.gauge("db_pool_checked_out", "Connections currently checked out", checked_out)
+    exposition.gauge("db_pool_overflow", "Overflow connections currently open", overflow)
+    exposition.gauge(
+        "db_pool_checked_in",
+        "Idle connections in the pool",
+        pool.checkedin() if hasattr(pool, "checkedin") else 0,
+    )
+
+
+def render_metrics(registry, pool, ws_stats: dict, loop_monitor) -> str:
+    """Render every metric family for a scrape"""
+    exposition = Exposition()
+
+    exposition.histogram(
+        "http_request_duration_seconds",
+        "HTTP request latency by route template and status class",
+        (
+            ({"method": method, "route": route, "status_class": status_class}, histogram)
+            for method, route, status_class, histogram in registry.status_class_histograms()
+        ),
+    )
+    exposition.histogram(
+        "http_time_to_first_byte_seconds",
+        "Time until the response headers were sent, by route template",
+        (
+            ({"method": method, "route": route}, histogram)
+            for method, route, histogram in registry.ttfb_histograms()
+        ),
+    )
+    db_series = registry.db_histograms()
+    exposition.header("http_request_db_queries_total", "counter", "SQL queries issued by requests, by route template")
+    for method, route, query_count, _ in db_series:
+        exposition.sample("http_request_db_queries_total", query_count, {"method": method, "route": route})
+    exposition.histogram(
+        "http_request_db_duration_seconds",
+        "Time spent executing SQL per request, by route template",
+        (({"method": method, "route": route}, histogram) for method, route, _, histogram in db_series),
+    )
+    exposition.gauge("uptime_seconds", "Seconds since the metrics registry was reset", registry.uptime_seconds)
+
+    pool_gauges(exposition, pool)
+    exposition.histogram(
+        "db_pool_checkout_wait_seconds",
+        "Time spent waiting to check out a pooled DB connection",
+        [({}, registry.db_checkout_wait)],
+    )
+
+    exposition.gauge("websocket_connections", "Open WebSocket connections", ws_stats["total_connections"])
+    exposition.gauge("websocket_users", "Users with at least one open WebSocket", ws_stats["unique_users"])
+    # Room names come from clients (join_room), so they are never used as labels
+    exposition.gauge("websocket_rooms", "WebSocket rooms with at least one connection", len(ws_stats["rooms"]))
+    exposition.gauge(
+        "websocket_room_memberships", "Connections summed over all WebSocket rooms", sum(ws_stats["rooms"].values())
+    )
+
+    exposition.gauge("event_loop_lag_seconds", "Most recent event-loop lag sample", loop_monitor.last_lag_ms / 1000)
+    exposition.histogram(
+        "event_loop_lag_distribution_seconds",
+        "Distribution of event-loop lag samples",
+        [({}, loop_monitor.lag)],
+    )
+    exposition.header("event_loop_stalls_total", "counter", "Event-loop lag samples over the stall threshold")
+    exposition.sample("event_loop_stalls_total", loop_monitor.stalls)
+    exposition.header(
+        "event_loop_blocked_seconds_total", "counter", "Time the event loop was blocked, by route and call site"
+    )
+    for blocker in loop_monitor.top_blockers(limit=None):
+        exposition.sample(
+            "event_loop_blocked_seconds_total",
+            blocker["total_ms"] / 1000,
+            {"route": blocker["route"], "site": blocker["site"]},
+        )
+
+    return exposition.render()
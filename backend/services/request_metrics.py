@@ -0,0 +1,324 @@
+"""
+Process-wide HTTP request metrics registry.
+
+PerformanceMiddleware records every request here and the /metrics endpoints
+read from it. Requests are grouped by method + route template (e.g.
+"GET /orders/{order_id}") so memory stays bounded regardless of traffic, and
+latencies (total and time to first byte) go into fixed-bucket histograms from
+which p50/p95/p99 are estimated. SQL query counts and DB time per request come
+from services/sql_instrumentation.py.
+"""
+import bisect
+import copy
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# Histogram bucket upper bounds in milliseconds (last bucket is +Inf)
+LATENCY_BUCKETS_MS = (
+    1, 2.5, 5, 10, 25, 50, 75, 100, 150, 250, 500, 750, 1000, 2500, 5000, 10000,
+)
+
+
+def route_template(scope: dict) -> str:
+    """Route path template of a request, e.g. /orders/{order_id}"""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram with percentile estimation"""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, duration_ms: float):
+        self.counts[bisect.bisect_left(self.buckets, duration_ms)] += 1
+        self.count += 1
+        self.sum_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+
+    def percentile(self, q: float) -> float:
+        """Estimate the q-quantile (0-1) by interpolating inside its bucket"""
+        if self.count == 0:
+            return 0.0
+
+        rank = q * self.count
+        cumulative = 0
+        for i, bucket_count in enumerate(self.counts):
+            if bucket_count and cumulative + bucket_count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max_ms
+                fraction = (rank - cumulative) / bucket_count
+                return min(lower + (upper - lower) * fraction, self.max_ms)
+            cumulative += bucket_count
+        return self.max_ms
+
+    @property
+    def avg_ms(self) -> float:
+        return self.sum_ms / self.count if self.count else 0.0
+
+    def merge(self, other: "LatencyHistogram"):
+        """Add another histogram with the same buckets into this one"""
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum_ms += other.sum_ms
+        self.max_ms = max(self.max_ms, other.max_ms)
+
+    def to_dict(self) -> dict:
+        return {"counts": self.counts, "sum_ms": self.sum_ms, "max_ms": self.max_ms}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LatencyHistogram":
+        histogram = cls()
+        histogram.counts = list(data["counts"])
+        histogram.count = sum(histogram.counts)
+        histogram.sum_ms = data["sum_ms"]
+        histogram.max_ms = data["max_ms"]
+        return histogram
+
+
+class RouteStats:
+    """Counters and latency histogram for one route (or the whole app)"""
+
+    def __init__(self):
+        self.request_count = 0
+        self.error_count = 0
+        self.server_error_count = 0
+        self.latency = LatencyHistogram()
+        self.ttfb = LatencyHistogram()
+        self.by_status_class: Dict[str, LatencyHistogram] = {}
+        self.query_count = 0
+        self.max_queries = 0
+        self.over_budget_count = 0
+        self.db_time = LatencyHistogram()
+
+    def record(
+        self,
+        status_code: int,
+        duration_ms: float,
+        ttfb_ms: Optional[float] = None,
+        query_count: int = 0,
+        db_ms: float = 0.0,
+        over_budget: bool = False,
+    ):
+        self.request_count += 1
+        if status_code >= 400:
+            self.error_count += 1
+        if status_code >= 500:
+            self.server_error_count += 1
+        self.latency.observe(duration_ms)
+
+        status_class = f"{status_code // 100}xx"
+        histogram = self.by_status_class.get(status_class)
+        if histogram is None:
+            histogram = self.by_status_class[status_class] = LatencyHistogram()
+        histogram.observe(duration_ms)
+
+        self.ttfb.observe(duration_ms if ttfb_ms is None else ttfb_ms)
+
+        self.query_count += query_count
+        self.max_queries = max(self.max_queries, query_count)
+        self.over_budget_count += int(over_budget)
+        self.db_time.observe(db_ms)
+
+    def merge_status_class(self, status_class: str, histogram: LatencyHistogram):
+        """Add a status-class histogram (e.g. from another worker)"""
+        code = int(status_class[0])
+        self.request_count += histogram.count
+        if code >= 4:
+            self.error_count += histogram.count
+        if code >= 5:
+            self.server_error_count += histogram.count
+        self.latency.merge(histogram)
+        self.by_status_class.setdefault(status_class, LatencyHistogram()).merge(histogram)
+
+    def merge_queries(self, data: dict):
+        """Add query counters and DB time (e.g. from another worker)"""
+        self.query_count += data["total"]
+        self.max_queries = max(self.max_queries, data["max"])
+        self.over_budget_count += data["over_budget"]
+        self.db_time.merge(LatencyHistogram.from_dict(data["db_time"]))
+
+    def queries_dict(self) -> dict:
+        return {
+            "total": self.query_count,
+            "max": self.max_queries,
+            "over_budget": self.over_budget_count,
+            "db_time": self.db_time.to_dict(),
+        }
+
+    @property
+    def error_rate_percent(self) -> float:
+        if self.request_count == 0:
+            return 0.0
+        return self.error_count / self.request_count * 100
+
+    def summary(self) -> dict:
+        return {
+            "request_count": self.request_count,
+            "error_count": self.error_count,
+            "server_error_count": self.server_error_count,
+            "error_rate_percent": round(self.error_rate_percent, 2),
+            "avg_ms": round(self.latency.avg_ms, 2),
+            "p50_ms": round(self.latency.percentile(0.50), 2),
+            "p95_ms": round(self.latency.percentile(0.95), 2),
+            "p99_ms": round(self.latency.percentile(0.99), 2),
+            "max_ms": round(self.latency.max_ms, 2),
+            "ttfb_p50_ms": round(self.ttfb.percentile(0.50), 2),
+            "ttfb_p95_ms": round(self.ttfb.percentile(0.95), 2),
+            "ttfb_p99_ms": round(self.ttfb.percentile(0.99), 2),
+            "avg_queries": round(self.query_count / self.request_count, 2) if self.request_count else 0.0,
+            "max_queries": self.max_queries,
+            "over_budget_count": self.over_budget_count,
+            "db_avg_ms": round(self.db_time.avg_ms, 2),
+            "db_p95_ms": round(self.db_time.percentile(0.95), 2),
+        }
+
+
+class MetricsRegistry:
+    """Per-route request metrics shared by the middleware and /metrics"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.start_time = datetime.utcnow()
+            self.started_at = time.monotonic()
+            self.total = RouteStats()
+            self.routes: Dict[Tuple[str, str], RouteStats] = {}
+            self.db_checkout_wait = LatencyHistogram()
+
+    def record(
+        self,
+        method: str,
+        route: str,
+        status_code: int,
+        duration_ms: float,
+        ttfb_ms: Optional[float] = None,
+        query_count: int = 0,
+        db_ms: float = 0.0,
+        over_budget: bool = False,
+    ):
+        """Record one finished request (ttfb_ms defaults to the total time)"""
+        args = (status_code, duration_ms, ttfb_ms, query_count, db_ms, over_budget)
+        with self._lock:
+            stats = self.routes.get((method, route))
+            if stats is None:
+                stats = self.routes[(method, route)] = RouteStats()
+            stats.record(*args)
+            self.total.record(*args)
+
+    def request_count(self, method: str, route: str) -> int:
+        with self._lock:
+            stats = self.routes.get((method, route))
+            return stats.request_count if stats else 0
+
+    def record_db_checkout(self, wait_ms: float):
+        """Record how long acquiring a pooled DB connection took"""
+        with self._lock:
+            self.db_checkout_wait.observe(wait_ms)
+
+    def status_class_histograms(self) -> List[Tuple[str, str, str, LatencyHistogram]]:
+        """Copies of the (method, route, status class) histograms for exposition"""
+        with self._lock:
+            return [
+                (method, route, status_class, copy.deepcopy(histogram))
+                for (method, route), stats in self.routes.items()
+                for status_class, histogram in stats.by_status_class.items()
+            ]
+
+    def ttfb_histograms(self) -> List[Tuple[str, str, LatencyHistogram]]:
+        """Copies of the per-route time-to-first-byte histograms"""
+        with self._lock:
+            return [
+                (method, route, copy.deepcopy(stats.ttfb))
+                for (method, route), stats in self.routes.items()
+            ]
+
+    def db_histograms(self) -> List[Tuple[str, str, int, LatencyHistogram]]:
+        """(method, route, total queries, DB time histogram) per route"""
+        with self._lock:
+            return [
+                (method, route, stats.query_count, copy.deepcopy(stats.db_time))
+                for (method, route), stats in self.routes.items()
+            ]
+
+    @property
+    def uptime_seconds(self) -> float:
+        return time.monotonic() - self.started_at
+
+    def snapshot(self) -> dict:
+        """Cumulative, JSON-serializable state for cross-worker aggregation"""
+        with self._lock:
+            return {
+                "start_time": self.start_time.isoformat(),
+                "routes": [
+                    {
+                        "method": method,
+                        "route": route,
+                        "status_classes": {
+                            status_class: histogram.to_dict()
+                            for status_class, histogram in stats.by_status_class.items()
+                        },
+                        "ttfb": stats.ttfb.to_dict(),
+                        "queries": stats.queries_dict(),
+                    }
+                    for (method, route), stats in self.routes.items()
+                ],
+                "db_checkout_wait": self.db_checkout_wait.to_dict(),
+            }
+
+    def merge_snapshot(self, snapshot: dict):
+        """Add another worker's snapshot into this registry"""
+        with self._lock:
+            start_time = datetime.fromisoformat(snapshot["start_time"])
+            if start_time < self.start_time:
+                self.started_at -= (self.start_time - start_time).total_seconds()
+                self.start_time = start_time
+
+            for entry in snapshot["routes"]:
+                key = (entry["method"], entry["route"])
+                stats = self.routes.get(key)
+                if stats is None:
+                    stats = self.routes[key] = RouteStats()
+                for status_class, data in entry["status_classes"].items():
+                    histogram = LatencyHistogram.from_dict(data)
+                    stats.merge_status_class(status_class, histogram)
+                    self.total.merge_status_class(status_class, histogram)
+                ttfb = LatencyHistogram.from_dict(entry["ttfb"])
+                stats.ttfb.merge(ttfb)
+                self.total.ttfb.merge(ttfb)
+                stats.merge_queries(entry["queries"])
+                self.total.merge_queries(entry["queries"])
+
+            self.db_checkout_wait.merge(LatencyHistogram.from_dict(snapshot["db_checkout_wait"]))
+
+    @classmethod
+    def from_snapshots(cls, snapshots: List[dict]) -> "MetricsRegistry":
+        """Merged registry of several workers"""
+        registry = cls()
+        for snapshot in snapshots:
+            registry.merge_snapshot(snapshot)
+        return registry
+
+    def route_summaries(self, limit: Optional[int] = None) -> List[dict]:
+        """Per-route summaries, busiest routes first"""
+        with self._lock:
+            summaries = [
+                {"method": method, "route": route, **stats.summary()}
+                for (method, route), stats in self.routes.items()
+            ]
+        summaries.sort(key=lambda s: s["request_count"], reverse=True)
+        return summaries[:limit] if limit else summaries
+
+
+# Global instance
+metrics_registry = MetricsRegistry()
@@ -0,0 +1,152 @@
+"""
+Active-session tracking.
+
+Every authenticated request touches the token's `sub` in an in-process ring
+of one-minute buckets (a set add, no I/O). A user counts as active while
+seen within ACTIVE_SESSION_WINDOW seconds, so the count needs no scan of the
+users table.
+
+With METRICS_AGGREGATION=redis the last-seen times are also pushed to a Redis
+sorted set (score = last seen) every METRICS_FLUSH_INTERVAL seconds and
+before each read, so every worker reports the same fleet-wide count.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RedisSessionStore:
+    """Last-seen times of every worker's sessions in one sorted set"""
+
+    KEY = "salvacell:sessions"
+
+    def __init__(self, url: str):
+        self.url = url
+        self._client = None
+
+    @property
+    def client(self):
+        """Lazy initialization of Redis client"""
+        if self._client is None:
+            import redis.asyncio as redis
+            self._client = redis.from_url(self.url, decode_responses=True)
+        return self._client
+
+    async def add(self, last_seen: Dict[str, float], since: float):
+        """Record last-seen times and drop sessions idle since before `since`"""
+        async with self.client.pipeline(transaction=False) as pipe:
+            if last_seen:
+                # GT: never move a session back in time (another worker saw it later)
+                pipe.zadd(self.KEY, last_seen, gt=True)
+            pipe.zremrangebyscore(self.KEY, "-inf", f"({since}")
+            await pipe.execute()
+
+    async def count(self, since: float) -> int:
+        return await self.client.zcount(self.KEY, since, "+inf")
+
+
+class SessionTracker:
+    """Distinct token subjects seen within the last `window` seconds"""
+
+    def __init__(self, window: int = 900, bucket_seconds: int = 60, store=None, interval: float = 10):
+        self.window = window
+        self.bucket_seconds = bucket_seconds
+        self.store = store
+        self.interval = interval
+        self.buckets = deque(maxlen=max(window // bucket_seconds, 1) + 1)
+        self.pending: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_settings(cls) -> "SessionTracker":
+        store = None
+        if settings.METRICS_AGGREGATION == "redis":
+            store = RedisSessionStore(settings.REDIS_URL)
+        return cls(settings.ACTIVE_SESSION_WINDOW, store=store, interval=settings.METRICS_FLUSH_INTERVAL)
+
+    def touch(self, sub: str, now: Optional[float] = None):
+        """Mark a session as seen (called on every authenticated request)"""
+        now = time.time() if now is None else now
+        bucket = int(now // self.bucket_seconds)
+        if not self.buckets or self.buckets[-1][0] != bucket:
+            self.buckets.append((bucket, set()))
+        self.buckets[-1][1].add(sub)
+        if self.store is not None:
+            self.pending[sub] = now
+
+    def local_count(self, now: Optional[float] = None) -> int:
+        """Active sessions seen by this worker"""
+        now = time.time() if now is None else now
+        oldest = int((now - self.window) // self.bucket_seconds)
+        active = set()
+        for bucket, subs in self.buckets:
+            if bucket > oldest:
+                active |= subs
+        return len(active)
+
+    async def flush(self, now: Optional[float] = None):
+        """Push pending last-seen times to the shared store"""
+        if self.store is None:
+            return
+        now = time.time() if now is None else now
+        pending, self.pending = self.pending, {}
+        try:
+            await self.store.add(pending, now - self.window)
+        except Exception:
+            # Keep the times for the next flush (newer touches win)
+            self.pending = {**pending, **self.pending}
+            raise
+
+    async def _run(self):
+        while True:
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning(f"Could not flush sessions: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Start periodic flushing on the running loop (no-op when local)"""
+        if self.store is not None and (self._task is None or self._task.done()):
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.warning(f"Could not flush sessions: {e}")
+
+    async def active_count(self) -> int:
+        """Active sessions across workers (this worker only when local)"""
+        if self.store is None:
+            return self.local_count()
+        now = time.time()
+        try:
+            await self.flush(now)
+            return await self.store.count(now - self.window)
+        except Exception as e:
+            logger.warning(f"Session store unavailable, using local sessions: {e}")
+            return self.local_count(now)
+
+    def clear(self):
+        """Forget this worker's sessions (the shared set expires on its own)"""
+        self.buckets.clear()
+        self.pending.clear()
+
+
+# Global instance
+session_tracker = SessionTracker.from_settings()
@@ -0,0 +1,80 @@
+"""
+Single-flight: coalescencia de cálculos idénticos concurrentes.
+
+Si llegan varias peticiones con la misma clave mientras un cálculo está en
+curso, todas esperan ese mismo cálculo y comparten su resultado (o su
+excepción) en lugar de lanzar uno por petición. Se registra cuántas
+peticiones atendió cada cálculo.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class Flight:
+    """Cálculo en curso y número de peticiones que lo esperan"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.served = 1
+        self.started_at = time.perf_counter()
+
+
+class SingleFlight:
+    """Agrupa por clave los cálculos concurrentes (por proceso)"""
+
+    def __init__(self, history_size: int = 50):
+        self.in_flight: Dict[str, Flight] = {}
+        self.computations = 0
+        self.requests_served = 0
+        self.max_served = 0
+        self.recent = deque(maxlen=history_size)
+
+    async def run(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Ejecutar `compute` o unirse al cálculo en curso con la misma clave"""
+        flight = self.in_flight.get(key)
+        if flight is not None:
+            flight.served += 1
+            return await asyncio.shield(flight.task)
+
+        flight = Flight(asyncio.ensure_future(compute()))
+        self.in_flight[key] = flight
+        try:
+            # shield: si el primer solicitante se cancela, los demás siguen esperando
+            return await asyncio.shield(flight.task)
+        finally:
+            if flight.task.done():
+                self._finish(key, flight)
+            else:
+                flight.task.add_done_callback(lambda _: self._finish(key, flight))
+
+    def _finish(self, key: str, flight: Flight):
+        if self.in_flight.get(key) is not flight:
+            return
+        del self.in_flight[key]
+
+        duration_ms = (time.perf_counter() - flight.started_at) * 1000
+        self.computations += 1
+        self.requests_served += flight.served
+        self.max_served = max(self.max_served, flight.served)
+        self.recent.append({
+            "key": key,
+            "served": flight.served,
+            "duration_ms": round(duration_ms, 2),
+        })
+        if flight.served > 1:
+            logger.debug(f"single-flight {key}: {flight.served} peticiones en {duration_ms:.1f}ms")
+
+    def get_stats(self) -> dict:
+        return {
+            "in_flight": len(self.in_flight),
+            "computations": self.computations,
+            "requests_served": self.requests_served,
+            "coalesced_requests": self.requests_served - self.computations,
+            "max_served": self.max_served,
+            "recent": list(self.recent),
+        }
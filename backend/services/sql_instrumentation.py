@@ -0,0 +1,196 @@
+"""
+Per-request SQL instrumentation and slow-query log.
+
+SQLAlchemy engine events attribute every executed statement (count and
+database time) to the QueryStats of the current request, held in a
+ContextVar that PerformanceMiddleware sets. Because the ContextVar is copied
+into tasks and into SQLAlchemy's async greenlets, queries from concurrent
+sections (e.g. the dashboard's asyncio.gather) are attributed too.
+
+Statements slower than SLOW_QUERY_MS (inside or outside a request) go into a
+bounded ring buffer together with the parameter types (never the values),
+the calling route and, for SELECTs, the plan from EXPLAIN (without ANALYZE,
+so the statement is not run again). Plans are captured once per statement
+text and reused afterwards, from an LRU cache bounded like the log itself.
+"""
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from config import settings
+from services.request_metrics import route_template
+
+logger = logging.getLogger(__name__)
+
+MAX_STATEMENT_LENGTH = 4000
+
+
+class QueryStats:
+    """Queries issued while handling one request"""
+
+    def __init__(self, scope: Optional[dict] = None):
+        self.scope = scope
+        self.count = 0
+        self.db_ms = 0.0
+        self.statements = Counter()
+
+    def record(self, statement: str, duration_ms: float):
+        self.count += 1
+        self.db_ms += duration_ms
+        self.statements[statement] += 1
+
+    def most_repeated(self) -> Optional[tuple]:
+        """(statement, times) of the most repeated statement, a typical N+1 sign"""
+        if not self.statements:
+            return None
+        return self.statements.most_common(1)[0]
+
+    @property
+    def route(self) -> Optional[str]:
+        if self.scope is None:
+            return None
+        return f"{self.scope['method']} {route_template(self.scope)}"
+
+
+current_query_stats: ContextVar[Optional[QueryStats]] = ContextVar(
+    "current_query_stats", default=None
+)
+
+
+def parameter_shape(parameters: Any) -> Any:
+    """Types of the bound parameters, without their values"""
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+def is_select(statement: str) -> bool:
+    words = statement.split(None, 1)
+    return bool(words) and words[0].upper() in ("SELECT", "WITH")
+
+
+def explain(conn, statement: str, parameters: Any) -> List[str]:
+    """Plan of a statement on the same connection, bypassing engine events"""
+    if conn.dialect.name == "postgresql":
+        prefix = "EXPLAIN (ANALYZE off) "
+    elif conn.dialect.name == "sqlite":
+        prefix = "EXPLAIN QUERY PLAN "
+    else:
+        prefix = "EXPLAIN "
+
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return [" | ".join(str(column) for column in row) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+class SlowQueryLog:
+    """Bounded ring buffer of slow statements"""
+
+    def __init__(self, size: int):
+        self.entries = deque(maxlen=size)
+        # Statement text -> plan, LRU: texts with inlined literals never repeat
+        self.plans: "OrderedDict[str, List[str]]" = OrderedDict()
+        self.max_plans = size
+        self._lock = threading.Lock()
+
+    def cached_plan(self, statement: str) -> Optional[List[str]]:
+        with self._lock:
+            plan = self.plans.get(statement)
+            if plan is not None:
+                self.plans.move_to_end(statement)
+            return plan
+
+    def store_plan(self, statement: str, plan: List[str]):
+        with self._lock:
+            self.plans[statement] = plan
+            self.plans.move_to_end(statement)
+            while len(self.plans) > self.max_plans:
+                self.plans.popitem(last=False)
+
+    def capture(self, conn, statement: str, parameters: Any, duration_ms: float, executemany: bool):
+        plan = self.cached_plan(statement)
+        plan_error = None
+        if plan is None and settings.SLOW_QUERY_EXPLAIN and not executemany:
+            if is_select(statement):
+                try:
+                    plan = explain(conn, statement, parameters)
+                    self.store_plan(statement, plan)
+                except Exception as e:
+                    plan_error = str(e)
+
+        stats = current_query_stats.get()
+        entry = {
+            "timestamp": datetime.utcnow().isoformat(),
+            "duration_ms": round(duration_ms, 2),
+            "route": stats.route if stats else None,
+            "statement": statement[:MAX_STATEMENT_LENGTH],
+            "parameter_types": parameter_shape(parameters),
+            "executemany": executemany,
+            "plan": plan,
+            "plan_error": plan_error,
+        }
+        with self._lock:
+            self.entries.append(entry)
+        logger.warning(
+            f"Slow query ({duration_ms:.0f}ms) in {entry['route'] or 'background'}: "
+            f"{statement[:200]}"
+        )
+
+    def get_entries(self, limit: Optional[int] = None) -> List[dict]:
+        """Most recent entries first"""
+        with self._lock:
+            entries = list(reversed(self.entries))
+        return entries[:limit] if limit else entries
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.plans.clear()
+
+
+# Global instance
+slow_query_log = SlowQueryLog(settings.SLOW_QUERY_LOG_SIZE)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_times", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def record_query(conn, cursor, statement, parameters, context, executemany):
+    start_times = conn.info.get("query_start_times")
+    if not start_times:
+        return
+    duration_ms = (time.perf_counter() - start_times.pop()) * 1000
+
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.record(statement, duration_ms)
+
+    if settings.SLOW_QUERY_MS and duration_ms >= settings.SLOW_QUERY_MS:
+        try:
+            slow_query_log.capture(conn, statement, parameters, duration_ms, executemany)
+        except Exception as e:
+            logger.warning(f"Could not capture slow query: {e}")
+
+
+@event.listens_for(Engine, "handle_error")
+def discard_query_timer(context):
+    """after_cursor_execute does not run for failed statements"""
+    if context.connection is not None:
+        start_times = context.connection.info.get("query_start_times")
+        if start_times:
+            start_times.pop()
@@ -0,0 +1,262 @@
+"""
+Heartbeat-based uptime tracking.
+
+A background task records a heartbeat every UPTIME_HEARTBEAT_INTERVAL
+seconds. When a heartbeat finds the previous one older than a few intervals
+(the API was stopped, crashed or hung), the gap is stored as an outage.
+Uptime is the share of the last UPTIME_WINDOW_DAYS (or of the time since
+tracking began, if shorter) not covered by outages.
+
+The state outlives the process: with METRICS_AGGREGATION=redis it lives in
+Redis, shared by every worker (the service is up while any worker beats);
+otherwise in the JSON file UPTIME_STATE_FILE, shared by the workers of one
+host under an exclusive flock. An empty UPTIME_STATE_FILE keeps it in memory
+only (tests).
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-worker development only
+    fcntl = None
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+Outage = Tuple[float, float]
+
+
+class MemoryHeartbeatStore:
+    """In-process state (lost on restart)"""
+
+    def __init__(self):
+        self.state = {"tracking_since": None, "last_heartbeat": None, "outages": []}
+
+    def load(self) -> dict:
+        return self.state
+
+    def save(self, state: dict):
+        self.state = state
+
+    def _beat(self, now: float, since: float) -> Optional[float]:
+        state = self.load()
+        previous = state["last_heartbeat"]
+        if state["tracking_since"] is None:
+            state["tracking_since"] = now
+        state["last_heartbeat"] = now
+        state["outages"] = [outage for outage in state["outages"] if outage[1] >= since]
+        self.save(state)
+        return previous
+
+    def _add_outage(self, start: float, end: float):
+        state = self.load()
+        state["outages"].append([start, end])
+        self.save(state)
+
+    def _get_state(self, since: float) -> Tuple[Optional[float], List[Outage]]:
+        state = self.load()
+        outages = [tuple(outage) for outage in state["outages"] if outage[1] >= since]
+        return state["tracking_since"], outages
+
+    async def beat(self, now: float, since: float) -> Optional[float]:
+        """Store the heartbeat and return the previous one (None on first run)"""
+        return self._beat(now, since)
+
+    async def add_outage(self, start: float, end: float):
+        self._add_outage(start, end)
+
+    async def get_state(self, since: float) -> Tuple[Optional[float], List[Outage]]:
+        """(tracking start, outages ending after `since`)"""
+        return self._get_state(since)
+
+
+class FileHeartbeatStore(MemoryHeartbeatStore):
+    """State in a small JSON file, replaced atomically on each write
+
+    Every worker reads, modifies and rewrites the same file, so each
+    read-modify-write holds an exclusive lock on a sibling .lock file (the
+    data file itself is replaced, so it cannot carry the lock).
+    """
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+
+    @contextmanager
+    def _locked(self):
+        if fcntl is None:
+            yield
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(f"{self.path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _beat(self, now: float, since: float) -> Optional[float]:
+        with self._locked():
+            return super()._beat(now, since)
+
+    def _add_outage(self, start: float, end: float):
+        with self._locked():
+            super()._add_outage(start, end)
+
+    def load(self) -> dict:
+        try:
+            with open(self.path) as f:
+                return {**self.state, **json.load(f)}
+        except FileNotFoundError:
+            return dict(self.state)
+        except ValueError as e:
+            logger.warning(f"Ignoring unreadable uptime state {self.path}: {e}")
+            return dict(self.state)
+
+    def save(self, state: dict):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+
+    # File I/O runs off the event loop
+    async def beat(self, now: float, since: float) -> Optional[float]:
+        return await asyncio.to_thread(self._beat, now, since)
+
+    async def add_outage(self, start: float, end: float):
+        await asyncio.to_thread(self._add_outage, start, end)
+
+    async def get_state(self, since: float) -> Tuple[Optional[float], List[Outage]]:
+        return await asyncio.to_thread(self._get_state, since)
+
+
+class RedisHeartbeatStore:
+    """State shared by every worker through Redis"""
+
+    PREFIX = "salvacell:uptime:"
+
+    def __init__(self, url: str):
+        self.url = url
+        self._client = None
+
+    @property
+    def client(self):
+        """Lazy initialization of Redis client"""
+        if self._client is None:
+            import redis.asyncio as redis
+            self._client = redis.from_url(self.url, decode_responses=True)
+        return self._client
+
+    async def beat(self, now: float, since: float) -> Optional[float]:
+        async with self.client.pipeline(transaction=True) as pipe:
+            # GETSET is atomic, so only one worker sees a given gap
+            pipe.getset(f"{self.PREFIX}last_heartbeat", now)
+            pipe.setnx(f"{self.PREFIX}tracking_since", now)
+            pipe.zremrangebyscore(f"{self.PREFIX}outages", "-inf", f"({since}")
+            previous, _, _ = await pipe.execute()
+        return float(previous) if previous is not None else None
+
+    async def add_outage(self, start: float, end: float):
+        await self.client.zadd(f"{self.PREFIX}outages", {f"{start}:{end}": end})
+
+    async def get_state(self, since: float) -> Tuple[Optional[float], List[Outage]]:
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.get(f"{self.PREFIX}tracking_since")
+            pipe.zrangebyscore(f"{self.PREFIX}outages", since, "+inf")
+            tracking_since, members = await pipe.execute()
+        outages = [tuple(float(part) for part in member.split(":")) for member in members]
+        return (float(tracking_since) if tracking_since else None), outages
+
+
+class UptimeRecorder:
+    """Records heartbeats and derives uptime from the gaps between them"""
+
+    def __init__(self, store, interval: float = 30, window_days: int = 30):
+        self.store = store
+        self.interval = interval
+        self.window = window_days * 86400
+        # Gaps longer than this count as downtime
+        self.grace = interval * 3
+        self.last_percent = 100.0
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_settings(cls) -> "UptimeRecorder":
+        if settings.METRICS_AGGREGATION == "redis":
+            store = RedisHeartbeatStore(settings.REDIS_URL)
+        elif settings.UPTIME_STATE_FILE:
+            store = FileHeartbeatStore(settings.UPTIME_STATE_FILE)
+        else:
+            store = MemoryHeartbeatStore()
+        return cls(store, settings.UPTIME_HEARTBEAT_INTERVAL, settings.UPTIME_WINDOW_DAYS)
+
+    async def beat(self, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        previous = await self.store.beat(now, now - self.window)
+        if previous is not None and now - previous > self.grace:
+            await self.store.add_outage(previous, now)
+            logger.warning(f"No heartbeat for {now - previous:.0f}s, recorded as downtime")
+
+    async def _run(self):
+        while True:
+            try:
+                await self.beat()
+            except Exception as e:
+                logger.warning(f"Could not record heartbeat: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Start beating on the running loop (idempotent)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        # A final beat makes the downtime of a clean shutdown start now
+        try:
+            await self.beat()
+        except Exception as e:
+            logger.warning(f"Could not record heartbeat: {e}")
+
+    async def uptime_percent(self, now: Optional[float] = None) -> float:
+        """Share of the window (or of the tracked time) without outages"""
+        now = time.time() if now is None else now
+        since = now - self.window
+        try:
+            tracking_since, outages = await self.store.get_state(since)
+        except Exception as e:
+            logger.warning(f"Uptime store unavailable, using last value: {e}")
+            return self.last_percent
+
+        if tracking_since is None:
+            return 100.0
+        start = max(since, tracking_since)
+        total = now - start
+        if total <= 0:
+            return 100.0
+        downtime = sum(max(min(end, now) - max(begin, start), 0.0) for begin, end in outages)
+        self.last_percent = round(max(100 * (1 - downtime / total), 0.0), 3)
+        return self.last_percent
+
+
+# Global instance
+uptime_recorder = UptimeRecorder.from_settings()
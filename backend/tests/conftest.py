@@ -2,16 +2,28 @@ import pytest
 import pytest_asyncio
 from fastapi.testclient import TestClient
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy import event
 from sqlalchemy.pool import StaticPool
+from contextlib import contextmanager
 import asyncio
+import os
+
+# Keep uptime heartbeats in memory instead of writing a state file
+os.environ.setdefault("UPTIME_STATE_FILE", "")
 
 from main import app
-from database import Base, get_db
+from auth import get_current_user
+from database import Base, get_db, get_session_factory
 from config import settings
+from services.cache import report_cache
+from services.request_metrics import metrics_registry
+from services.session_tracker import session_tracker
+from services.sql_instrumentation import slow_query_log
 # Import all models to ensure they're registered with Base.metadata
 from models import (
     Client, Device, Order, OrderHistory, OrderPhoto,
-    Payment, InventoryItem, InventoryMovement, Appointment, User
+    Payment, InventoryItem, InventoryMovement, Appointment, User,
+    OrderStatus, OrderPriority, UserRole
 )
 
 
@@ -26,6 +38,15 @@ test_engine = create_async_engine(
     poolclass=StaticPool,  # Use StaticPool to maintain a single connection for :memory:
 )
 
+
+@event.listens_for(test_engine.sync_engine, "connect")
+def _enable_foreign_keys(dbapi_connection, connection_record):
+    # SQLite only enforces foreign keys when asked to; PostgreSQL always does
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
 TestAsyncSessionLocal = async_sessionmaker(
     test_engine,
     class_=AsyncSession,
@@ -44,6 +65,10 @@ def setup_test_db():
             await conn.run_sync(Base.metadata.create_all)
     
     asyncio.run(init_db())
+    asyncio.run(report_cache.clear())
+    metrics_registry.reset()
+    slow_query_log.clear()
+    session_tracker.clear()
     
     yield
     
@@ -70,8 +95,64 @@ def client(setup_test_db):
                 await session.close()
     
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_session_factory] = lambda: TestAsyncSessionLocal
     
     with TestClient(app) as test_client:
         yield test_client
     
     app.dependency_overrides.clear()
+
+
+@pytest.fixture(scope="function")
+def admin_client(client):
+    """Test client whose requests are authenticated as an admin"""
+    app.dependency_overrides[get_current_user] = lambda: User(
+        id="admin", username="admin", email="admin@example.com", password_hash="x", role=UserRole.ADMIN
+    )
+    return client
+
+
+def seed(*objects):
+    """Insert ORM objects directly into the test database"""
+    async def _seed():
+        async with TestAsyncSessionLocal() as session:
+            session.add_all(objects)
+            await session.commit()
+
+    asyncio.run(_seed())
+
+
+def make_order(n, client_id, status=OrderStatus.RECEIVED, priority=OrderPriority.NORMAL, **kwargs):
+    return Order(
+        id=f"order-{n}",
+        folio=f"ORD-{n:04d}",
+        qr_code=f"qr-{n}",
+        client_id=client_id,
+        status=status,
+        priority=priority,
+        problem_description="Pantalla rota, no responde al tacto",
+        **kwargs,
+    )
+
+
+@contextmanager
+def assert_max_queries(limit):
+    """Fail if the block issues more than `limit` SQL statements (N+1 guard)
+
+    Counts every statement on the test engine, including those run by
+    requests made with the TestClient inside the block.
+    """
+    statements = []
+
+    def collect(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(test_engine.sync_engine, "after_cursor_execute", collect)
+    try:
+        yield statements
+    finally:
+        event.remove(test_engine.sync_engine, "after_cursor_execute", collect)
+
+    if len(statements) > limit:
+        listing = "\n".join(f"  {i + 1}. {statement}" for i, statement in enumerate(statements))
+        raise AssertionError(f"{len(statements)} queries executed (limit {limit}):\n{listing}")
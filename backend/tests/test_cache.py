@@ -0,0 +1,131 @@
+import asyncio
+
+from tests.conftest import seed, make_order
+from models import Client
+from services.cache import MemoryCacheBackend, ReportCache, ORDERS, PAYMENTS
+
+
+def test_report_is_cached_until_write_invalidates(client):
+    """Test that report results are served from cache until a router write"""
+    seed(Client(id="c1", name="Ana", phone="5550000001"), make_order(1, "c1"))
+    assert client.get('/reports/operational?period=all').json()["total_orders"] == 1
+
+    # Direct inserts bypass the routers, so the cached result is still served
+    seed(make_order(2, "c1"))
+    assert client.get('/reports/operational?period=all').json()["total_orders"] == 1
+
+    # Creating an order through the API invalidates the orders domain
+    response = client.post('/orders/', json={
+        "client_id": "c1",
+        "problem_description": "El equipo no enciende después de mojarse",
+    })
+    assert response.status_code == 201
+    assert client.get('/reports/operational?period=all').json()["total_orders"] == 3
+
+
+def test_invalidation_only_affects_tagged_entries():
+    """Test domain versioning and LRU eviction of the memory backend"""
+    cache = ReportCache(MemoryCacheBackend(max_entries=2), ttl=60)
+    calls = []
+
+    async def compute(name):
+        calls.append(name)
+        return {"name": name}
+
+    async def run():
+        await cache.get_or_compute("a", {}, [ORDERS], lambda: compute("a"))
+        await cache.get_or_compute("b", {}, [PAYMENTS], lambda: compute("b"))
+        await cache.get_or_compute("a", {}, [ORDERS], lambda: compute("a"))
+        await cache.invalidate(PAYMENTS)
+        await cache.get_or_compute("a", {}, [ORDERS], lambda: compute("a"))
+        await cache.get_or_compute("b", {}, [PAYMENTS], lambda: compute("b"))
+        # "a" and the new "b" fill the cache; a third entry evicts "a"
+        await cache.get_or_compute("c", {}, [], lambda: compute("c"))
+        await cache.get_or_compute("a", {}, [ORDERS], lambda: compute("a"))
+
+    asyncio.run(run())
+    assert calls == ["a", "b", "b", "c", "a"]
+
+
+def test_concurrent_misses_share_one_computation():
+    """Test that identical concurrent requests await a single computation"""
+    cache = ReportCache(MemoryCacheBackend(max_entries=8), ttl=0)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"total": len(calls)}
+
+    async def run():
+        results = await asyncio.gather(*[
+            cache.get_or_compute("slow", {"period": "7d"}, [ORDERS], compute)
+            for _ in range(10)
+        ])
+        # Once finished, the next request computes again (cache disabled)
+        await cache.get_or_compute("slow", {"period": "7d"}, [ORDERS], compute)
+        return results
+
+    results = asyncio.run(run())
+    assert len(calls) == 2
+    assert all(result == {"total": 1} for result in results)
+
+    stats = cache.get_stats()["single_flight"]
+    assert stats["computations"] == 2
+    assert stats["requests_served"] == 11
+    assert stats["coalesced_requests"] == 9
+    assert [flight["served"] for flight in stats["recent"]] == [10, 1]
+    assert stats["in_flight"] == 0
+
+
+def test_concurrent_failure_is_shared():
+    """Test that an exception reaches every coalesced request"""
+    cache = ReportCache(MemoryCacheBackend(max_entries=8), ttl=60)
+
+    async def compute():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def run():
+        return await asyncio.gather(
+            *[cache.get_or_compute("bad", {}, [], compute) for _ in range(3)],
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert cache.get_stats()["single_flight"]["max_served"] == 3
+
+
+def test_coalesced_computation_outlives_first_caller():
+    """Test the shared computation runs on its own session, not the first caller's"""
+    cache = ReportCache(MemoryCacheBackend(max_entries=8), ttl=60)
+    sessions = []
+
+    class Session:
+        closed = False
+
+        async def __aenter__(self):
+            sessions.append(self)
+            return self
+
+        async def __aexit__(self, *exc):
+            self.closed = True
+
+    @cache.cached("report", tags=[ORDERS], params=())
+    async def report(db):
+        await asyncio.sleep(0.05)
+        assert not db.closed
+        return {"session": sessions.index(db)}
+
+    async def run():
+        first = asyncio.ensure_future(report(cache_sessions=Session))
+        await asyncio.sleep(0.01)
+        follower = asyncio.ensure_future(report(cache_sessions=Session))
+        await asyncio.sleep(0.01)
+        # The first request goes away while the follower still waits
+        first.cancel()
+        return await follower
+
+    assert asyncio.run(run()) == {"session": 0}
+    assert len(sessions) == 1 and sessions[0].closed
@@ -51,3 +51,32 @@ def test_get_clients_after_creation(client):
     clients = get_response.json()
     assert len(clients) >= 1
     assert any(c["name"] == client_data["name"] for c in clients)
+
+
+def test_search_clients(client):
+    """Test search falls back to ILIKE on SQLite and keeps cursor pagination"""
+    for n, name in enumerate(["Juan Pérez", "María López", "Juana Ruiz"]):
+        client.post('/clients/', json={"name": name, "phone": f"551234500{n}", "email": f"c{n}@example.com"})
+
+    first = client.get('/clients/', params={"search": "juan", "limit": 1})
+    second = client.get('/clients/', params={"search": "juan", "limit": 1, "cursor": first.headers["X-Next-Cursor"]})
+    names = {c["name"] for c in first.json() + second.json()}
+    assert names == {"Juan Pérez", "Juana Ruiz"}
+    assert [c["name"] for c in client.get('/clients/', params={"search": "5001"}).json()] == ["María López"]
+
+
+def test_search_clause_ranks_by_similarity_on_postgres():
+    """Test the PostgreSQL search uses trigram operators and ranks by similarity"""
+    from types import SimpleNamespace
+    from sqlalchemy import select
+    from sqlalchemy.dialects import postgresql
+    from models import Client
+    from routers.clients import CLIENTS_SEARCH
+    from utils.search import search_clause
+
+    dialect = postgresql.asyncpg.dialect()
+    db = SimpleNamespace(get_bind=lambda: SimpleNamespace(dialect=dialect))
+    condition, rank = search_clause(db, "juan", CLIENTS_SEARCH)
+    sql = str(select(Client.id).where(condition).order_by(rank.desc()).compile(dialect=dialect))
+    assert "clients.name ILIKE" in sql and "clients.name %" in sql
+    assert "greatest(similarity(clients.name" in sql
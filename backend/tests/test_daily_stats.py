@@ -0,0 +1,210 @@
+import asyncio
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, load_only
+
+from tests.conftest import TestAsyncSessionLocal, seed, make_order
+from database import Base
+from models import (
+    Client, DailyStat, InventoryItem, InventoryMovement, MovementType,
+    Order, OrderStatus, OrderPriority, Payment, PaymentMethod,
+)
+from services.daily_stats import rebuild_daily_stats
+
+
+def read_rollup():
+    """Return daily_stats rows as comparable tuples"""
+    async def _read():
+        async with TestAsyncSessionLocal() as session:
+            result = await session.execute(
+                select(DailyStat).where(DailyStat.count != 0)
+            )
+            return sorted(
+                (
+                    r.kind, r.day, r.key, r.count, r.urgent_count,
+                    round(r.repair_days, 4), r.repair_count, float(r.amount), r.quantity,
+                )
+                for r in result.scalars().all()
+            )
+
+    return asyncio.run(_read())
+
+
+def rebuild():
+    async def _rebuild():
+        async with TestAsyncSessionLocal() as session:
+            await rebuild_daily_stats(session)
+            await session.commit()
+
+    asyncio.run(_rebuild())
+
+
+def test_status_changes_move_rollup_counts(client):
+    """Test that order status transitions through the API update the rollup"""
+    client_id = client.post('/clients/', json={
+        "name": "Rollup Client", "phone": "3333333333"
+    }).json()["id"]
+    order_id = client.post('/orders/', json={
+        "client_id": client_id,
+        "problem_description": "No carga la batería del equipo",
+        "priority": "urgent",
+    }).json()["id"]
+
+    for status in ["diagnosing", "in_repair", "repaired"]:
+        response = client.put(f'/orders/{order_id}', json={"status": status})
+        assert response.status_code == 200
+    response = client.put(f'/orders/{order_id}', json={
+        "status": "delivered",
+        "actual_delivery_date": (datetime.utcnow() + timedelta(days=2)).isoformat(),
+    })
+    assert response.status_code == 200
+
+    data = client.get('/reports/operational?period=7d').json()
+    assert data["total_orders"] == 1
+    assert data["delivered"] == 1
+    assert data["in_progress"] == 0
+    assert data["urgent"] == 1
+    assert data["avg_repair_days"] == 2.0
+
+    client.delete(f'/orders/{order_id}')
+    data = client.get('/reports/operational?period=7d').json()
+    assert data["total_orders"] == 0
+    assert data["delivered"] == 0
+
+
+def test_payments_update_rollup(client):
+    """Test that creating and deleting payments updates revenue"""
+    seed(
+        Client(id="c1", name="Cliente Uno", phone="5550000001"),
+        make_order(1, "c1", OrderStatus.DELIVERED),
+    )
+    payment_id = client.post('/payments/', json={
+        "order_id": "order-1", "amount": 250, "method": "card"
+    }).json()["id"]
+    client.post('/payments/', json={"order_id": "order-1", "amount": 100, "method": "cash"})
+
+    data = client.get('/reports/financial?period=7d').json()
+    assert data["total_revenue"] == 350.0
+    assert data["by_method"]["card"] == 250.0
+
+    client.delete(f'/payments/{payment_id}')
+    data = client.get('/reports/financial?period=7d').json()
+    assert data["total_revenue"] == 100.0
+    assert data["by_method"]["card"] == 0.0
+
+
+def test_rebuild_matches_incremental_rollup(client):
+    """Test that the backfill produces the same rows as incremental maintenance"""
+    now = datetime.utcnow()
+    seed(
+        Client(id="c1", name="Cliente Uno", phone="5550000001"),
+        make_order(
+            1, "c1", OrderStatus.DELIVERED, OrderPriority.URGENT,
+            created_at=now - timedelta(days=3), actual_delivery_date=now,
+        ),
+        make_order(2, "c1", OrderStatus.IN_REPAIR, created_at=now - timedelta(days=40)),
+        make_order(3, "c1", OrderStatus.CANCELLED),
+        Payment(id="p1", order_id="order-1", amount=120, method=PaymentMethod.CASH, created_at=now),
+        Payment(id="p2", order_id="order-2", amount=80, method=PaymentMethod.CARD,
+                created_at=now - timedelta(days=10)),
+        InventoryItem(id="i1", sku="SKU-1", name="Batería", stock=5),
+        InventoryMovement(id="m1", item_id="i1", type=MovementType.ENTRY, quantity=5, created_at=now),
+    )
+
+    incremental = read_rollup()
+    assert len(incremental) == 6
+
+    rebuild()
+    assert read_rollup() == incremental
+
+
+def test_update_without_loaded_columns_keeps_its_day(client):
+    """Test an update on an order loaded without created_at/status moves the right bucket"""
+    old = datetime.utcnow() - timedelta(days=10)
+    seed(
+        Client(id="c1", name="Cliente Uno", phone="5550000001"),
+        make_order(1, "c1", OrderStatus.RECEIVED, created_at=old),
+    )
+
+    async def update():
+        async with TestAsyncSessionLocal() as session:
+            result = await session.execute(select(Order).options(load_only(Order.id)))
+            order = result.scalar_one()
+            order.status = OrderStatus.DIAGNOSING
+            await session.commit()
+
+    asyncio.run(update())
+
+    rows = [(kind, day, key, count) for kind, day, key, count, *_ in read_rollup()]
+    assert rows == [("order_status", old.date(), "diagnosing", 1)]
+    rebuild()
+    assert [(kind, day, key, count) for kind, day, key, count, *_ in read_rollup()] == rows
+
+
+def test_rebuild_does_not_lose_concurrent_writes(tmp_path):
+    """Test an order committed while the rebuild runs is counted exactly once"""
+    path = tmp_path / "rollup.db"
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}", connect_args={"timeout": 30})
+    sessions = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    writer_engine = create_engine(f"sqlite:///{path}", connect_args={"timeout": 30})
+    writer = threading.Thread(target=lambda: write_order(writer_engine))
+
+    def write_order(bind):
+        with Session(bind) as session:
+            session.add(make_order(2, "c1"))
+            session.commit()
+
+    # Another worker creates an order right after the rebuild read the orders
+    def interleave(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("SELECT") and "FROM orders" in statement and writer.ident is None:
+            writer.start()
+            writer.join(timeout=0.5)
+
+    async def scenario():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with sessions() as session:
+            session.add_all([Client(id="c1", name="Cliente Uno", phone="5550000001"), make_order(1, "c1")])
+            await session.commit()
+
+        event.listen(engine.sync_engine, "after_cursor_execute", interleave)
+        async with sessions() as session:
+            await rebuild_daily_stats(session)
+            await session.commit()
+        event.remove(engine.sync_engine, "after_cursor_execute", interleave)
+        writer.join()
+
+        async with sessions() as session:
+            result = await session.execute(select(DailyStat.key, DailyStat.count))
+            return result.all()
+
+    try:
+        assert asyncio.run(scenario()) == [("received", 2)]
+    finally:
+        asyncio.run(engine.dispose())
+        writer_engine.dispose()
+
+
+def test_period_starts_at_exact_timestamp(client):
+    """Test rolling windows keep the partial first day exact, like total_pending"""
+    start = datetime.utcnow() - timedelta(days=7)
+    # Usually the same UTC day: the rollup alone would count both
+    before, after = start - timedelta(minutes=5), start + timedelta(minutes=5)
+    seed(
+        Client(id="c1", name="Cliente Uno", phone="5550000001"),
+        make_order(1, "c1", created_at=before, estimated_cost=100),
+        make_order(2, "c1", created_at=after, estimated_cost=100),
+        Payment(id="p1", order_id="order-1", amount=40, method=PaymentMethod.CASH, created_at=before),
+        Payment(id="p2", order_id="order-2", amount=30, method=PaymentMethod.CASH, created_at=after),
+    )
+
+    assert client.get('/reports/operational?period=7d').json()["total_orders"] == 1
+    financial = client.get('/reports/financial?period=7d').json()
+    assert financial["total_revenue"] == 30.0
+    assert financial["total_pending"] == 70.0
+    compare = client.get('/reports/compare?periods=7d,all').json()
+    assert compare["7d"]["operational"]["total_orders"] == 1
+    assert compare["all"]["operational"]["total_orders"] == 2
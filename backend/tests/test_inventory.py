@@ -12,6 +12,25 @@ def test_get_inventory_with_pagination(client):
     assert isinstance(response.json(), list)
 
 
+def test_get_inventory_items_with_cursor(client):
+    """Test cursor pagination by name, with repeated names"""
+    for n, name in enumerate(["Pantalla", "Batería", "Pantalla", "Cable", "Pantalla"]):
+        client.post('/inventory/items', json={
+            "sku": f"SKU-{n}", "name": name, "category": "Refacciones",
+            "stock": 5, "min_stock": 1, "cost_price": 10, "sale_price": 20,
+        })
+
+    first = client.get('/inventory/items', params={"limit": 2})
+    second = client.get('/inventory/items', params={"limit": 2, "cursor": first.headers["X-Next-Cursor"]})
+    third = client.get('/inventory/items', params={"limit": 2, "cursor": second.headers["X-Next-Cursor"]})
+    names = [item["name"] for page in (first, second, third) for item in page.json()]
+    assert names == ["Batería", "Cable", "Pantalla", "Pantalla", "Pantalla"]
+    assert "X-Next-Cursor" not in third.headers
+    # A cursor from another listing is rejected
+    orders_cursor = client.get('/orders/', params={"cursor": first.headers["X-Next-Cursor"]})
+    assert orders_cursor.status_code == 400
+
+
 def test_create_inventory_item_missing_data(client):
     """Test creating inventory item with missing required data"""
     response = client.post('/inventory/items', json={})
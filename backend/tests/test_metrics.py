@@ -0,0 +1,372 @@
+import asyncio
+import logging
+import marshal
+import threading
+import time
+from datetime import datetime
+
+import httpx
+import pytest
+
+from tests.conftest import assert_max_queries, seed, make_order
+from auth import create_access_token, get_current_user
+from config import settings
+from main import app
+from models import Client, OrderStatus, Payment, PaymentMethod, User, UserRole
+from services.cache import report_cache
+from services.loop_monitor import LoopLagMonitor
+from services.metrics_aggregator import MemoryMetricsStore, MetricsAggregator
+from services.request_metrics import LatencyHistogram, MetricsRegistry
+from services.session_tracker import SessionTracker
+from services.sql_instrumentation import SlowQueryLog, slow_query_log
+from services.uptime import FileHeartbeatStore, UptimeRecorder
+from websockets.manager import ws_manager
+
+
+def test_middleware_records_per_route_metrics(client, admin_client):
+    """Test that every request updates the registry read by /metrics"""
+    for _ in range(3):
+        assert client.get('/clients/').status_code == 200
+    assert client.get('/clients/missing-client').status_code == 404
+
+    routes = {
+        (r["method"], r["route"]): r
+        for r in admin_client.get('/metrics/routes').json()
+    }
+    assert routes[("GET", "/clients/")]["request_count"] == 3
+    assert routes[("GET", "/clients/")]["error_rate_percent"] == 0.0
+    detail = routes[("GET", "/clients/{client_id}")]
+    assert detail["request_count"] == 1
+    assert detail["error_rate_percent"] == 100.0
+    assert detail["p50_ms"] <= detail["p99_ms"] <= detail["max_ms"]
+
+    data = admin_client.get('/metrics/system-performance').json()
+    # 4 client requests + the /metrics/routes call
+    assert data["total_requests"] == 5
+    assert data["error_rate_percent"] == 20.0
+    assert data["p50_response_time_ms"] <= data["p95_response_time_ms"] <= data["p99_response_time_ms"]
+
+    assert admin_client.post('/metrics/reset-metrics').json() == {"status": "reset"}
+    # Only the reset request itself is counted afterwards
+    assert admin_client.get('/metrics/system-performance').json()["total_requests"] == 1
+
+
+def test_latency_histogram_percentiles():
+    """Test percentile estimation from the fixed buckets"""
+    histogram = LatencyHistogram()
+    assert histogram.percentile(0.5) == 0.0
+
+    for value in range(1, 101):
+        histogram.observe(float(value))
+
+    assert histogram.count == 100
+    assert histogram.avg_ms == 50.5
+    assert 45 <= histogram.percentile(0.50) <= 55
+    assert 90 <= histogram.percentile(0.95) <= 100
+    assert histogram.percentile(0.99) <= histogram.max_ms == 100.0
+
+
+def test_prometheus_exposition(client):
+    """Test the text exposition of route histograms and runtime gauges"""
+    client.get('/clients/')
+    client.get('/clients/missing-client')
+    # Room names come from clients and must not become label values
+    rooms = [("conn-1", "orden-123"), ("conn-2", "orden-123"), ("conn-2", "cualquier-cosa")]
+    for connection_id, room in rooms:
+        ws_manager.join_room(connection_id, room)
+
+    try:
+        response = client.get('/metrics')
+    finally:
+        for connection_id, room in rooms:
+            ws_manager.leave_room(connection_id, room)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = response.text.splitlines()
+
+    assert "# TYPE salvacell_http_request_duration_seconds histogram" in lines
+    labels = 'method="GET",route="/clients/{client_id}",status_class="4xx"'
+    assert f'salvacell_http_request_duration_seconds_count{{{labels}}} 1' in lines
+    assert f'salvacell_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 1' in lines
+    assert 'salvacell_db_pool_capacity 30' in lines
+    assert any(line.startswith("salvacell_db_pool_checked_out ") for line in lines)
+    assert any(line.startswith("salvacell_db_pool_checkout_wait_seconds_count ") for line in lines)
+    assert "salvacell_websocket_connections 0" in lines
+    assert "salvacell_websocket_rooms 2" in lines
+    assert "salvacell_websocket_room_memberships 3" in lines
+    assert "orden-123" not in response.text
+    assert any(line.startswith("salvacell_event_loop_lag_seconds ") for line in lines)
+
+
+def test_metrics_are_merged_across_workers():
+    """Test that snapshots flushed by several workers are merged at read time"""
+    store = MemoryMetricsStore()
+    worker_a = MetricsAggregator(MetricsRegistry(), store, worker_id="a")
+    worker_b = MetricsAggregator(MetricsRegistry(), store, worker_id="b")
+
+    for duration_ms in (10, 20, 30):
+        worker_a.registry.record("GET", "/orders/", 200, duration_ms)
+    worker_b.registry.record("GET", "/orders/", 500, 400)
+    worker_b.registry.record("GET", "/clients/", 404, 5)
+
+    async def run():
+        await worker_a.flush()
+        await worker_b.flush()
+        # Requests after the last flush are included for the reading worker only
+        worker_a.registry.record("GET", "/clients/", 200, 8)
+        return await worker_a.fleet_registry()
+
+    fleet = asyncio.run(run())
+    total = fleet.total.summary()
+    assert total["request_count"] == 6
+    assert total["error_count"] == 2
+    assert total["server_error_count"] == 1
+    assert total["max_ms"] == 400
+
+    routes = {r["route"]: r for r in fleet.route_summaries()}
+    assert routes["/orders/"]["request_count"] == 4
+    assert routes["/orders/"]["error_rate_percent"] == 25.0
+    assert routes["/clients/"]["request_count"] == 2
+
+    # A reset on one worker is applied by the others on their next flush
+    async def reset():
+        await worker_a.reset()
+        await worker_b.flush()
+        return await worker_a.fleet_registry()
+
+    fleet = asyncio.run(reset())
+    assert worker_b.registry.total.request_count == 0
+    assert fleet.total.request_count == 0
+
+
+def test_queries_are_attributed_to_requests(client, admin_client, monkeypatch, caplog):
+    """Test query counts in Server-Timing, the registry and the budget warning"""
+    client_id = client.post('/clients/', json={
+        "name": "Consultas", "phone": "5550000009"
+    }).json()["id"]
+
+    with assert_max_queries(3):
+        response = client.get(f'/clients/{client_id}')
+    assert 'desc="3 queries"' in response.headers["Server-Timing"]
+
+    monkeypatch.setattr(settings, "SQL_QUERY_BUDGET", 2)
+    with caplog.at_level(logging.WARNING, logger="middleware"):
+        client.get(f'/clients/{client_id}')
+    assert "GET /clients/{client_id} issued 3 queries (budget 2)" in caplog.text
+
+    routes = {r["route"]: r for r in admin_client.get('/metrics/routes').json()}
+    detail = routes["/clients/{client_id}"]
+    assert detail["avg_queries"] == 3.0
+    assert detail["max_queries"] == 3
+    assert detail["over_budget_count"] == 1
+
+
+def test_assert_max_queries_reports_statements(client):
+    """Test that the N+1 guard fails and lists the statements over the limit"""
+    with pytest.raises(AssertionError, match="1 queries executed \\(limit 0\\)"):
+        with assert_max_queries(0):
+            client.get('/clients/')
+
+
+def test_slow_query_log_captures_plans(client, monkeypatch):
+    """Test slow statements are logged with route, parameter types and plan"""
+    client.post('/clients/', json={"name": "Lento", "phone": "5550000010"})
+    monkeypatch.setattr(settings, "SLOW_QUERY_MS", 0.0001)
+    client.get('/clients/', params={"search": "Lento"})
+    monkeypatch.setattr(settings, "SLOW_QUERY_MS", 0)
+
+    # Only admins can read the log
+    assert client.get('/metrics/slow-queries').status_code in (401, 403)
+    app.dependency_overrides[get_current_user] = lambda: User(
+        username="admin", email="admin@example.com", password_hash="x", role=UserRole.ADMIN
+    )
+
+    entries = client.get('/metrics/slow-queries').json()["entries"]
+    select = next(e for e in entries if "FROM clients" in e["statement"])
+    assert select["route"] == "GET /clients/"
+    assert "str" in str(select["parameter_types"])
+    assert "Lento" not in str(select)
+    assert select["plan"]
+
+    assert client.delete('/metrics/slow-queries').status_code == 200
+    assert slow_query_log.get_entries() == []
+
+
+def test_slow_query_plan_cache_is_bounded():
+    """Test plans of statements with inlined literals do not accumulate"""
+    log = SlowQueryLog(size=2)
+    for n in range(5):
+        log.store_plan(f"SELECT * FROM orders WHERE id IN ({', '.join(['1'] * (n + 1))})", [f"plan {n}"])
+    assert list(log.plans.values()) == [["plan 3"], ["plan 4"]]
+    # A hit makes the plan the most recently used
+    assert log.cached_plan("SELECT * FROM orders WHERE id IN (1, 1, 1, 1)") == ["plan 3"]
+    log.store_plan("SELECT 1", ["plan 5"])
+    assert list(log.plans.values()) == [["plan 3"], ["plan 5"]]
+
+
+def test_dashboard_metrics_round_trips(admin_client):
+    """Test each dashboard section costs one query and still adds up"""
+    now = datetime.utcnow()
+    seed(
+        User(id="u1", username="recepcion", email="r@example.com", password_hash="x",
+             role=UserRole.RECEPTIONIST, last_login=now),
+        User(id="u2", username="inactivo", email="i@example.com", password_hash="x",
+             role=UserRole.TECHNICIAN, is_active=0),
+        Client(id="c1", name="Ana", phone="5550000011"),
+        make_order(1, "c1"),
+        make_order(2, "c1", status=OrderStatus.DELIVERED, actual_delivery_date=now),
+        Payment(id="p1", order_id="order-2", amount=150, method=PaymentMethod.CASH),
+    )
+
+    # Round trips per call, as a regression benchmark for the dashboard
+    with assert_max_queries(1):
+        operational = admin_client.get('/metrics/operational').json()
+    with assert_max_queries(1):
+        engagement = admin_client.get('/metrics/user-engagement').json()
+    assert operational["total_orders_today"] == 2
+    assert operational["orders_in_progress"] == 1
+    assert operational["orders_completed_today"] == 1
+    assert operational["revenue_today"] == 150.0
+    assert engagement["total_registered_users"] == 1
+    assert engagement["daily_active_users"] == 1
+    assert engagement["new_users_this_month"] == 2
+
+    asyncio.run(report_cache.clear())
+    with assert_max_queries(2):
+        dashboard = admin_client.get('/metrics/dashboard').json()
+    assert dashboard["operational"] == operational
+    assert dashboard["user_engagement"] == engagement
+
+    # Cached sections, live system performance
+    with assert_max_queries(0):
+        again = admin_client.get('/metrics/dashboard').json()
+    assert again["system_performance"]["total_requests"] > dashboard["system_performance"]["total_requests"]
+
+
+def test_active_sessions_from_authenticated_requests(client):
+    """Test the session ring counts distinct subjects inside the window"""
+    tracker = SessionTracker(window=900, bucket_seconds=60)
+    tracker.touch("u1", now=0)
+    tracker.touch("u2", now=600)
+    tracker.touch("u2", now=610)
+    assert tracker.local_count(now=700) == 2
+    assert tracker.local_count(now=1000) == 1
+
+    seed(User(id="u1", username="admin", email="a@example.com", password_hash="x",
+              role=UserRole.ADMIN))
+    token = create_access_token({"sub": "u1", "username": "admin", "role": "admin"})
+    headers = {"Authorization": f"Bearer {token}"}
+    for _ in range(2):
+        assert client.get('/auth/me', headers=headers).status_code == 200
+
+    assert client.get('/metrics/system-performance', headers=headers).json()["active_sessions"] == 1
+    assert client.get('/metrics/system-performance').status_code == 403
+    assert client.get('/metrics/dashboard').status_code == 403
+
+
+def test_uptime_survives_restarts(tmp_path):
+    """Test heartbeat gaps become outages persisted across recorder instances"""
+    path = str(tmp_path / "uptime.json")
+    recorder = UptimeRecorder(FileHeartbeatStore(path), interval=10, window_days=1)
+
+    async def scenario():
+        await recorder.beat(now=1000)
+        await recorder.beat(now=1010)
+        assert await recorder.uptime_percent(now=1020) == 100.0
+
+        # Process restarted 90s later with a fresh recorder
+        restarted = UptimeRecorder(FileHeartbeatStore(path), interval=10, window_days=1)
+        await restarted.beat(now=1100)
+        return await restarted.uptime_percent(now=1200)
+
+    # 90s of downtime out of 200s tracked
+    assert asyncio.run(scenario()) == 55.0
+
+
+def test_uptime_file_shared_by_workers(tmp_path):
+    """Test concurrent workers on the same state file do not lose outages"""
+    path = str(tmp_path / "uptime.json")
+    stores = [FileHeartbeatStore(path) for _ in range(4)]
+
+    def record(store, offset):
+        for n in range(25):
+            start = offset * 1000 + n * 10
+            store._add_outage(start, start + 5)
+
+    threads = [threading.Thread(target=record, args=(store, i)) for i, store in enumerate(stores)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    _, outages = stores[0]._get_state(since=0)
+    assert len(outages) == 100
+
+
+def test_loop_monitor_attributes_blocking_calls():
+    """Test a stall is sampled and charged to the route and blocking call site"""
+    monitor = LoopLagMonitor(interval=0.01, stall_threshold_ms=30)
+
+    class Route:
+        path = "/slow"
+
+    async def blocking_handler():
+        task = monitor.track_request({"type": "http", "method": "GET", "route": Route()})
+        time.sleep(0.2)
+        monitor.untrack_request(task)
+
+    async def scenario():
+        monitor.start()
+        await asyncio.sleep(0.05)
+        await asyncio.create_task(blocking_handler())
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+
+    asyncio.run(scenario())
+    assert monitor.stalls >= 1
+    blocker = monitor.top_blockers()[0]
+    assert blocker["route"] == "GET /slow"
+    assert blocker["site"].startswith("tests/test_metrics.py:")
+    assert blocker["site"].endswith("in blocking_handler")
+    assert blocker["max_ms"] >= 150
+    assert "time.sleep(0.2)" in "".join(blocker["stack"])
+
+
+def test_profile_route_stops_after_requests(admin_client):
+    """Test route profiling ends once the requested number of requests finish"""
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+            profile = asyncio.create_task(c.post(
+                '/metrics/profile', params={"route": "GET /health", "requests": 3, "seconds": 30}
+            ))
+            await asyncio.sleep(0.05)
+            for _ in range(3):
+                await c.get('/health')
+            return await asyncio.wait_for(profile, timeout=5)
+
+    response = asyncio.run(scenario())
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert int(response.headers["X-Profile-Samples"]) >= 0
+
+
+def test_profile_artifacts(admin_client):
+    """Test collapsed stacks, pstats dumps and tracemalloc diffs"""
+    response = admin_client.post('/metrics/profile', params={"seconds": 0.2})
+    assert int(response.headers["X-Profile-Samples"]) > 0
+    stack, count = response.text.splitlines()[0].rsplit(" ", 1)
+    assert ";" in stack and int(count) > 0
+
+    response = admin_client.post('/metrics/profile', params={"seconds": 0.1, "format": "pstats"})
+    assert isinstance(marshal.loads(response.content), dict)
+    assert admin_client.post(
+        '/metrics/profile', params={"route": "GET /health", "format": "pstats"}
+    ).status_code == 400
+
+    assert admin_client.post('/metrics/profile/memory').json()["status"] == "tracing"
+    leak = [bytearray(1024) for _ in range(200)]
+    growth = admin_client.post('/metrics/profile/memory').json()["growth"]
+    assert any("tests/test_metrics.py" in entry["traceback"][0] for entry in growth)
+    assert admin_client.delete('/metrics/profile/memory').json() == {"status": "stopped"}
+    del leak
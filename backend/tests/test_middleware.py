@@ -0,0 +1,65 @@
+import asyncio
+
+from fastapi import FastAPI, Response
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from middleware import PerformanceMiddleware
+from services.request_metrics import MetricsRegistry
+
+
+def build_app(registry: MetricsRegistry) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(PerformanceMiddleware, registry=registry)
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for i in range(3):
+                await asyncio.sleep(0.05)
+                yield f"chunk-{i};".encode()
+
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    @app.get("/timed/{item_id}")
+    async def timed(item_id: str, response: Response):
+        response.headers["Server-Timing"] = "db;dur=1.5"
+        return {"item_id": item_id}
+
+    @app.get("/boom")
+    async def boom():
+        raise RuntimeError("boom")
+
+    return app
+
+
+def test_streaming_response_records_ttfb_and_total():
+    """Test that streamed bodies pass through and TTFB is recorded apart from total"""
+    registry = MetricsRegistry()
+    client = TestClient(build_app(registry))
+
+    response = client.get('/stream')
+    assert response.status_code == 200
+    assert response.text == "chunk-0;chunk-1;chunk-2;"
+    assert response.headers["X-Response-Time"].endswith("ms")
+
+    stats = registry.routes[("GET", "/stream")]
+    assert stats.request_count == 1
+    # Headers go out before the three 50ms chunks are generated
+    assert stats.ttfb.max_ms < 100 <= stats.latency.max_ms
+
+
+def test_server_timing_is_merged_and_errors_counted():
+    """Test Server-Timing merging, route templates and unhandled exceptions"""
+    registry = MetricsRegistry()
+    client = TestClient(build_app(registry), raise_server_exceptions=False)
+
+    response = client.get('/timed/abc')
+    timings = [entry.strip() for entry in response.headers["Server-Timing"].split(",")]
+    assert timings[0] == "db;dur=1.5"
+    assert timings[1].startswith("db;dur=") and timings[1].endswith('desc="0 queries"')
+    assert timings[2].startswith("app;dur=")
+
+    assert client.get('/boom').status_code == 500
+    assert registry.routes[("GET", "/timed/{item_id}")].request_count == 1
+    assert registry.routes[("GET", "/boom")].server_error_count == 1
@@ -1,3 +1,9 @@
+from datetime import datetime, timedelta
+
+from tests.conftest import assert_max_queries, seed, make_order
+from models import Client, Device, OrderHistory, OrderPhoto, OrderStatus, Payment, PaymentMethod
+
+
 def test_get_orders_empty(client):
     """Test getting orders from empty database"""
     response = client.get('/orders/')
@@ -12,6 +18,73 @@ def test_get_orders_with_pagination(client):
     assert isinstance(response.json(), list)
 
 
+def test_get_orders_with_cursor(client):
+    """Test cursor pages cover every order once, in the same order as offset"""
+    base = datetime(2026, 3, 1, 10, 0, 0)
+    seed(
+        Client(id="c1", name="Ana", phone="5550000001"),
+        # Same timestamp on several rows: the id breaks the tie
+        *[make_order(n, "c1", created_at=base) for n in range(1, 5)],
+        *[make_order(n, "c1", created_at=base + timedelta(microseconds=n * 1500)) for n in range(5, 8)],
+        make_order(8, "c1"),
+    )
+    expected = [order["id"] for order in client.get('/orders/').json()]
+    assert len(expected) == 8
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+        response = client.get('/orders/', params=params)
+        seen += [order["id"] for order in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert seen == expected
+    # Offset mode keeps working with the same order
+    offset_page = client.get('/orders/', params={"skip": 3, "limit": 3}).json()
+    assert [order["id"] for order in offset_page] == expected[3:6]
+    assert client.get('/orders/', params={"cursor": "no-es-un-cursor"}).status_code == 400
+
+
+def test_get_order_with_expand(client):
+    """Test expand replaces the follow-up requests with a bounded number of queries"""
+    seed(
+        Client(id="c1", name="Ana", phone="5550000001"),
+        Client(id="c2", name="Luis", phone="5550000002"),
+        Device(id="d1", client_id="c1", brand="Motorola", model="G32", imei="351234567890123"),
+        make_order(1, "c1", device_id="d1"),
+        *[make_order(n, "c2") for n in range(2, 6)],
+        OrderHistory(id="h1", order_id="order-1", status=OrderStatus.RECEIVED, notes="Orden creada"),
+        OrderHistory(id="h2", order_id="order-1", status=OrderStatus.DIAGNOSING),
+        Payment(id="p1", order_id="order-1", amount=150, method=PaymentMethod.CASH),
+        OrderPhoto(id="f1", order_id="order-1", file_path="/uploads/f1.jpg"),
+        *[Payment(id=f"p{n}", order_id=f"order-{n}", amount=100, method=PaymentMethod.CARD) for n in range(2, 6)],
+    )
+
+    with assert_max_queries(4):
+        response = client.get('/orders/order-1', params={"expand": "client,device,history,payments,photos"})
+    assert response.status_code == 200
+    order = response.json()
+    assert order["client"]["name"] == "Ana"
+    assert order["device"]["imei"] == "351234567890123"
+    assert {h["id"] for h in order["history"]} == {"h1", "h2"}
+    assert [p["id"] for p in order["payments"]] == ["p1"]
+    assert [p["id"] for p in order["photos"]] == ["f1"]
+
+    # Without expand the response keeps its previous shape
+    plain = client.get('/orders/order-1').json()
+    assert "client" not in plain and plain["id"] == "order-1"
+
+    # The list pays the same queries for any page size
+    with assert_max_queries(2):
+        orders = client.get('/orders/', params={"expand": "client,payments"}).json()
+    assert len(orders) == 5
+    assert all(o["client"]["id"] == o["client_id"] and len(o["payments"]) == 1 for o in orders)
+    assert "device" not in orders[0]
+
+    assert client.get('/orders/', params={"expand": "client,technician"}).status_code == 400
+
+
 def test_create_order_missing_data(client):
     """Test creating order with missing required data"""
     response = client.post('/orders/', json={})
@@ -45,6 +118,29 @@ def test_create_order_valid_data(client):
     assert "folio" in data
 
 
+def test_create_order_single_transaction(client):
+    """Test creation is one flush and lets the foreign keys reject bad references"""
+    seed(Client(id="c1", name="Ana", phone="5550000001"))
+    order_data = {"client_id": "c1", "problem_description": "No carga, el puerto está flojo"}
+
+    # Order (RETURNING server defaults), initial history and the daily rollup upsert
+    with assert_max_queries(3):
+        response = client.post('/orders/', json=order_data)
+    assert response.status_code == 201
+    order = response.json()
+    assert order["status"] == "received" and order["created_at"]
+    history = client.get(f'/orders/{order["id"]}/history').json()
+    assert [(h["status"], h["notes"]) for h in history] == [("received", "Orden creada")]
+
+    missing_client = client.post('/orders/', json={**order_data, "client_id": "no-existe"})
+    assert missing_client.status_code == 404
+    assert missing_client.json()["detail"] == "Cliente no encontrado"
+    missing_device = client.post('/orders/', json={**order_data, "device_id": "no-existe"})
+    assert missing_device.json()["detail"] == "Dispositivo no encontrado"
+    # The failed attempts left nothing behind
+    assert len(client.get('/orders/').json()) == 1
+
+
 def test_get_order_by_id(client):
     """Test getting specific order by ID"""
     # First create a client and order
@@ -0,0 +1,332 @@
+import asyncio
+import random
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import httpx
+from sqlalchemy import select
+
+from tests.conftest import TestAsyncSessionLocal, seed, make_order
+from config import settings
+from main import app
+from models import (
+    Client, InventoryItem, Order, OrderStatus, OrderPriority, Payment, PaymentMethod,
+)
+
+
+def test_operational_stats_empty(client):
+    """Test operational stats with no orders"""
+    response = client.get('/reports/operational?period=all')
+    assert response.status_code == 200
+    assert response.json() == {
+        "total_orders": 0,
+        "delivered": 0,
+        "in_progress": 0,
+        "cancelled": 0,
+        "urgent": 0,
+        "avg_repair_days": 0.0,
+    }
+
+
+def test_operational_stats_aggregates(client):
+    """Test operational stats counts and average repair days"""
+    now = datetime.utcnow()
+    seed(
+        Client(id="c1", name="Cliente Uno", phone="5550000001"),
+        make_order(
+            1, "c1", OrderStatus.DELIVERED,
+            created_at=now - timedelta(days=4), actual_delivery_date=now,
+        ),
+        make_order(
+            2, "c1", OrderStatus.DELIVERED,
+            created_at=now - timedelta(days=2), actual_delivery_date=now,
+        ),
+        make_order(3, "c1", OrderStatus.CANCELLED),
+        make_order(4, "c1", OrderStatus.IN_REPAIR, OrderPriority.URGENT),
+        make_order(5, "c1", priority=OrderPriority.URGENT, created_at=now - timedelta(days=60)),
+    )
+
+    response = client.get('/reports/operational?period=all')
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total_orders"] == 5
+    assert data["delivered"] == 2
+    assert data["cancelled"] == 1
+    assert data["in_progress"] == 2
+    assert data["urgent"] == 2
+    assert data["avg_repair_days"] == 3.0
+
+    # Period filter excludes the 60-day-old order
+    response = client.get('/reports/operational?period=30d')
+    data = response.json()
+    assert data["total_orders"] == 4
+    assert data["urgent"] == 1
+
+
+def test_financial_stats_aggregates(client):
+    """Test revenue, pending balance and average ticket"""
+    seed(
+        Client(id="c1", name="Cliente Uno", phone="5550000001"),
+        make_order(1, "c1", OrderStatus.DELIVERED, estimated_cost=500),
+        make_order(2, "c1", OrderStatus.IN_REPAIR, estimated_cost=300),
+        make_order(3, "c1", OrderStatus.RECEIVED, estimated_cost=200),
+        make_order(4, "c1", OrderStatus.CANCELLED, estimated_cost=900),
+        make_order(5, "c1", OrderStatus.RECEIVED, estimated_cost=100),
+        Payment(id="p1", order_id="order-1", amount=500, method=PaymentMethod.CASH),
+        Payment(id="p2", order_id="order-2", amount=100, method=PaymentMethod.CARD),
+        Payment(id="p3", order_id="order-2", amount=50, method=PaymentMethod.TRANSFER),
+        # Overpaid order never contributes a negative balance
+        Payment(id="p4", order_id="order-5", amount=150, method=PaymentMethod.CASH),
+    )
+
+    response = client.get('/reports/financial?period=all')
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total_revenue"] == 800.0
+    assert data["total_pending"] == 350.0
+    assert data["avg_ticket"] == 800.0
+    assert data["by_method"] == {"cash": 650.0, "card": 100.0, "transfer": 50.0}
+
+
+def test_client_stats_top_clients(client):
+    """Test recurring/new counts and top clients ordered by spend"""
+    seed(
+        Client(id="c1", name="Ana", phone="5550000001"),
+        Client(id="c2", name="Beto", phone="5550000002"),
+        Client(id="c3", name="Carla", phone="5550000003"),
+        make_order(1, "c1"),
+        make_order(2, "c1"),
+        make_order(3, "c2"),
+        make_order(4, "c3"),
+        Payment(id="p1", order_id="order-1", amount=100, method=PaymentMethod.CASH),
+        Payment(id="p2", order_id="order-2", amount=150, method=PaymentMethod.CASH),
+        Payment(id="p3", order_id="order-3", amount=400, method=PaymentMethod.CARD),
+    )
+
+    response = client.get('/reports/clients?period=all')
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total_clients"] == 3
+    assert data["recurring"] == 1
+    assert data["new_clients"] == 2
+    assert data["top_clients"] == [
+        {"name": "Beto", "orders": 1, "spent": 400.0},
+        {"name": "Ana", "orders": 2, "spent": 250.0},
+        {"name": "Carla", "orders": 1, "spent": 0.0},
+    ]
+
+
+def test_client_stats_empty(client):
+    """Test client stats with no orders"""
+    response = client.get('/reports/clients?period=7d')
+    assert response.status_code == 200
+    assert response.json() == {
+        "total_clients": 0,
+        "recurring": 0,
+        "new_clients": 0,
+        "top_clients": [],
+    }
+
+
+def test_dashboard_summary_sections_and_timing(client):
+    """Test dashboard combines all sections and reports per-section timing"""
+    seed(
+        Client(id="c1", name="Ana", phone="5550000001"),
+        make_order(1, "c1", OrderStatus.DELIVERED, estimated_cost=300),
+        Payment(id="p1", order_id="order-1", amount=300, method=PaymentMethod.CASH),
+    )
+
+    response = client.get('/reports/dashboard?period=30d')
+    assert response.status_code == 200
+    data = response.json()
+    assert data["operational"] == client.get('/reports/operational?period=30d').json()
+    assert data["financial"] == client.get('/reports/financial?period=30d').json()
+    assert data["inventory"] == client.get('/reports/inventory').json()
+    assert data["clients"] == client.get('/reports/clients?period=30d').json()
+
+    timing = response.headers["Server-Timing"]
+    for section in ["operational", "financial", "inventory", "clients"]:
+        assert f"{section};dur=" in timing
+
+
+def test_dashboard_server_timing_on_every_response(client):
+    """Test concurrent (coalesced) requests and cache hits all get Server-Timing"""
+    seed(Client(id="c1", name="Ana", phone="5550000001"), make_order(1, "c1"))
+
+    async def concurrent_requests():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+            return await asyncio.gather(*(c.get('/reports/dashboard?period=7d') for _ in range(2)))
+
+    responses = asyncio.run(concurrent_requests())
+    responses.append(client.get('/reports/dashboard?period=7d'))
+    assert [r.status_code for r in responses] == [200, 200, 200]
+    assert responses[0].json() == responses[1].json() == responses[2].json()
+
+    for response in responses:
+        timing = response.headers["Server-Timing"]
+        for section in ["operational", "financial", "inventory", "clients"]:
+            assert f"{section};dur=" in timing
+    assert "cache;desc=miss" in responses[0].headers["Server-Timing"]
+    assert "cache;desc=shared" in responses[1].headers["Server-Timing"]
+    assert "cache;desc=hit" in responses[2].headers["Server-Timing"]
+
+
+def local_midnight_utc():
+    """Today's local midnight as a naive UTC datetime"""
+    midnight = datetime.now(ZoneInfo(settings.TIMEZONE)).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+    return midnight.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def test_orders_trend_local_days_with_gaps(client):
+    """Test that the trend buckets by local day and zero-fills missing days"""
+    midnight = local_midnight_utc()
+    seed(
+        Client(id="c1", name="Ana", phone="5550000001"),
+        make_order(1, "c1", created_at=midnight + timedelta(minutes=30)),
+        make_order(2, "c1", created_at=midnight - timedelta(minutes=30)),
+        make_order(3, "c1", created_at=midnight - timedelta(minutes=45)),
+    )
+
+    trend = client.get('/reports/orders-trend?period=7d').json()
+    assert len(trend) == 8
+    today = datetime.now(ZoneInfo(settings.TIMEZONE)).date()
+    assert trend[-1] == {"date": today.isoformat(), "orders": 1}
+    assert trend[-2] == {"date": (today - timedelta(days=1)).isoformat(), "orders": 2}
+    assert sum(point["orders"] for point in trend[:-2]) == 0
+
+
+def test_orders_trend_granularity_and_downsampling(client):
+    """Test explicit month buckets and automatic downsampling for period=all"""
+    now = datetime.utcnow()
+    seed(
+        Client(id="c1", name="Ana", phone="5550000001"),
+        make_order(1, "c1", created_at=now - timedelta(days=200)),
+        make_order(2, "c1", created_at=now - timedelta(days=100)),
+        make_order(3, "c1", created_at=now),
+    )
+
+    trend = client.get('/reports/orders-trend?period=all').json()
+    days = [date.fromisoformat(point["date"]) for point in trend]
+    assert 28 <= len(trend) <= 31
+    assert all(day.weekday() == 0 for day in days)
+    assert sum(point["orders"] for point in trend) == 3
+
+    trend = client.get('/reports/orders-trend?period=1y&granularity=month').json()
+    assert len(trend) in (12, 13)
+    assert all(point["date"].endswith("-01") for point in trend)
+    assert sum(point["orders"] for point in trend) == 3
+
+
+def load_all(model):
+    async def _load():
+        async with TestAsyncSessionLocal() as session:
+            return (await session.execute(select(model))).scalars().all()
+
+    return asyncio.run(_load())
+
+
+def python_orders_by_status(orders, start_date):
+    """Previous in-memory implementation of /reports/orders-by-status"""
+    labels = {
+        "received": "Recibido", "diagnosing": "Diagnóstico", "waiting_parts": "Esp. Repuestos",
+        "in_repair": "En Reparación", "repaired": "Reparado", "delivered": "Entregado",
+        "cancelled": "Cancelado",
+    }
+    status_count = {}
+    for order in orders:
+        if order.created_at >= start_date:
+            label = labels[order.status.value]
+            status_count[label] = status_count.get(label, 0) + 1
+    return status_count
+
+
+def python_inventory_stats(items):
+    """Previous in-memory implementation of /reports/inventory"""
+    category_map = {}
+    for item in items:
+        cat = item.category or "Sin categoría"
+        category_map[cat] = category_map.get(cat, 0) + float(item.purchase_price or 0) * item.stock
+    return {
+        "total_value": round(sum(float(i.purchase_price or 0) * i.stock for i in items), 2),
+        "sell_value": round(sum(float(i.sale_price or 0) * i.stock for i in items), 2),
+        "low_stock": sum(1 for i in items if i.stock <= i.min_stock and i.stock > 0),
+        "out_of_stock": sum(1 for i in items if i.stock == 0),
+        "total_items": len(items),
+        "by_category": [
+            {"name": k, "value": round(v, 2)}
+            for k, v in sorted(category_map.items(), key=lambda x: x[1], reverse=True)[:5]
+        ],
+    }
+
+
+def test_grouped_reports_match_python_implementation(client):
+    """Regression test: SQL aggregates equal the previous Python aggregation"""
+    rng = random.Random(9)
+    now = datetime.utcnow()
+    categories = ["Pantallas", "Baterías", "Cargadores", "Cables", "Fundas", "Micas", None]
+    objects = [Client(id="c1", name="Ana", phone="5550000001")]
+    objects += [
+        make_order(
+            n, "c1", rng.choice(list(OrderStatus)),
+            created_at=now - timedelta(days=rng.randint(0, 60), hours=rng.randint(0, 23), minutes=30),
+        )
+        for n in range(1, 80)
+    ]
+    objects += [
+        InventoryItem(
+            id=f"i{n}", sku=f"SKU-{n}", name=f"Artículo {n}",
+            category=categories[n % len(categories)],
+            purchase_price=None if n % 11 == 0 else rng.randint(10, 900) + n / 100,
+            sale_price=rng.randint(50, 1500),
+            stock=0 if n % 6 == 0 else rng.randint(1, 30),
+            min_stock=rng.randint(0, 8),
+        )
+        for n in range(1, 40)
+    ]
+    seed(*objects)
+
+    orders = load_all(Order)
+    for period, days in [("7d", 7), ("30d", 30)]:
+        data = client.get(f'/reports/orders-by-status?period={period}').json()
+        expected = python_orders_by_status(orders, now - timedelta(days=days, minutes=1))
+        assert {entry["name"]: entry["value"] for entry in data} == expected
+
+    data = client.get('/reports/inventory').json()
+    assert data == python_inventory_stats(load_all(InventoryItem))
+
+
+def test_compare_matches_single_period_endpoints(client):
+    """Test that /compare returns the same figures as the per-period endpoints"""
+    now = datetime.utcnow()
+    seed(
+        Client(id="c1", name="Ana", phone="5550000001"),
+        make_order(1, "c1", OrderStatus.DELIVERED, OrderPriority.URGENT, estimated_cost=500,
+                   created_at=now - timedelta(days=2), actual_delivery_date=now),
+        make_order(2, "c1", OrderStatus.IN_REPAIR, estimated_cost=800,
+                   created_at=now - timedelta(days=15)),
+        make_order(3, "c1", OrderStatus.RECEIVED, estimated_cost=300,
+                   created_at=now - timedelta(days=60)),
+        make_order(4, "c1", OrderStatus.CANCELLED, created_at=now - timedelta(days=200)),
+        Payment(id="p1", order_id="order-1", amount=500, method=PaymentMethod.CARD, created_at=now),
+        Payment(id="p2", order_id="order-2", amount=200, method=PaymentMethod.CASH,
+                created_at=now - timedelta(days=10)),
+        Payment(id="p3", order_id="order-3", amount=100, method=PaymentMethod.TRANSFER,
+                created_at=now - timedelta(days=50)),
+    )
+
+    response = client.get('/reports/compare?periods=7d,30d,90d,all')
+    assert response.status_code == 200
+    data = response.json()
+    assert list(data) == ["7d", "30d", "90d", "all"]
+
+    for period, stats in data.items():
+        assert stats["operational"] == client.get(f'/reports/operational?period={period}').json()
+        assert stats["financial"] == client.get(f'/reports/financial?period={period}').json()
+
+    assert data["30d"]["financial"]["total_pending"] == 600.0
+    assert data["90d"]["operational"]["total_orders"] == 3
+
+    assert client.get('/reports/compare?periods=7d,2w').status_code == 422
@@ -0,0 +1,96 @@
+from tests.conftest import seed, make_order
+from models import Client, Device, InventoryItem
+from utils.search import FOLIO, IMEI, PHONE, SKU, TEXT, detect_kinds
+
+
+def seed_reception():
+    seed(
+        Client(id="c1", name="Ana Torres", phone="5512345678", email="ana@example.com"),
+        Client(id="c2", name="Pantallas del Centro", phone="5587654321", alternate_phone="5512340000"),
+        Device(id="d1", client_id="c1", brand="Samsung", model="A54", imei="356789012345678"),
+        make_order(1, "c1", device_id="d1"),
+        make_order(12, "c2"),
+        InventoryItem(id="i1", sku="PAN-A54", name="Pantalla Samsung A54", category="Refacciones",
+                      stock=3, min_stock=1, purchase_price=500, sale_price=900),
+        InventoryItem(id="i2", sku="BAT-A54", name="Batería A54", description="Compatible con pantalla original",
+                      category="Refacciones", stock=2, min_stock=1, purchase_price=200, sale_price=400),
+    )
+
+
+def test_detect_kinds():
+    """Test the term type routes each search to the right tables"""
+    assert detect_kinds("ORD-00AB") == [FOLIO]
+    assert detect_kinds("356789012345678") == [IMEI]
+    assert detect_kinds("+52 (55) 1234-5678") == [PHONE]
+    assert detect_kinds("1234") == [PHONE, IMEI]
+    assert detect_kinds("PAN-A54") == [SKU, TEXT]
+    assert detect_kinds("pantalla") == [TEXT]
+    assert detect_kinds("--") == [TEXT]
+
+
+def test_search_by_phone_imei_and_folio(client):
+    """Test each pattern finds its record"""
+    seed_reception()
+
+    phone = client.get('/search', params={"q": "55-1234-5678"}).json()
+    assert phone["kinds"] == [PHONE]
+    assert [(r["type"], r["id"]) for r in phone["results"]] == [("client", "c1")]
+    assert phone["results"][0]["score"] == 1.0
+
+    imei = client.get('/search', params={"q": "356789012345678"}).json()
+    assert imei["results"][0]["id"] == "d1" and imei["results"][0]["score"] == 1.0
+
+    folio = client.get('/search', params={"q": "ord-0001"}).json()
+    assert [r["id"] for r in folio["results"]] == ["order-1"]
+    assert folio["results"][0]["title"] == "ORD-0001"
+
+
+def test_search_phone_ignores_stored_formatting(client):
+    """Test a phone stored with separators matches the digits typed, and vice versa"""
+    seed(
+        Client(id="c1", name="Ana Torres", phone="(55) 1234-5678"),
+        Client(id="c2", name="Beto Ruiz", phone="5587654321", alternate_phone="+52 55.1111.2222"),
+    )
+
+    for q in ("5512345678", "55 1234 5678"):
+        results = client.get('/search', params={"q": q}).json()["results"]
+        assert [(r["id"], r["subtitle"], r["score"]) for r in results] == [("c1", "(55) 1234-5678", 1.0)]
+
+    results = client.get('/search', params={"q": "5511112222"}).json()["results"]
+    assert [r["id"] for r in results] == ["c2"]
+
+
+def test_search_phone_ignores_country_code(client):
+    """Test a term with the +52 country code finds numbers stored with or without it"""
+    seed(
+        Client(id="c1", name="Ana Torres", phone="55 1234-5678"),
+        Client(id="c2", name="Beto Ruiz", phone="+52 55 8765 4321"),
+    )
+
+    results = client.get('/search', params={"q": "+52 55 1234 5678"}).json()["results"]
+    assert [(r["id"], r["score"]) for r in results] == [("c1", 1.0)]
+    results = client.get('/search', params={"q": "+52 1 55 1234 5678"}).json()["results"]
+    assert [r["id"] for r in results] == ["c1"]
+
+    for q in ("+52 55 8765 4321", "55 8765 4321"):
+        results = client.get('/search', params={"q": q}).json()["results"]
+        assert [(r["id"], r["score"]) for r in results] == [("c2", 1.0)]
+
+
+def test_search_merges_and_ranks(client):
+    """Test results from several tables come back in one ranked, limited list"""
+    seed_reception()
+
+    response = client.get('/search', params={"q": "pantalla"})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [(r["type"], r["id"]) for r in results] == [
+        ("inventory_item", "i1"), ("client", "c2"), ("inventory_item", "i2")
+    ]
+    assert results[0]["score"] >= results[1]["score"] > results[2]["score"]
+
+    # An SKU is looked up by SKU and by name; the exact SKU wins
+    sku = client.get('/search', params={"q": "PAN-A54", "limit": 1}).json()
+    assert sku["results"] == [{**sku["results"][0], "id": "i1", "match": SKU, "score": 1.0}]
+
+    assert client.get('/search', params={"q": "a"}).status_code == 422
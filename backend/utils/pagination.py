@@ -0,0 +1,103 @@
+"""
+Paginación por cursor (keyset) para los listados.
+
+Cada listado se ordena por una clave estable (columna, id). La respuesta
+conserva su forma (una lista) y, si hay más resultados, incluye el cursor de
+la página siguiente en la cabecera X-Next-Cursor. Con `?cursor=` la consulta
+continúa después de la última fila vista (WHERE (columna, id) < (...)) en vez
+de saltar filas con OFFSET, así que la página N cuesta lo mismo que la 1.
+`skip` sigue disponible por compatibilidad.
+
+Las búsquedas ordenadas por relevancia (utils.search) no tienen un orden
+estable que codificar en un cursor: se paginan con `skip` y no publican
+X-Next-Cursor.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Sequence
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy import DateTime, literal, tuple_
+
+from utils.sql_functions import sortable_timestamp
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class Keyset:
+    """Orden estable (columna, id) de un listado"""
+
+    def __init__(self, column, id_column, descending: bool = True):
+        self.column = column
+        self.id_column = id_column
+        self.descending = descending
+        self.is_timestamp = isinstance(column.type, DateTime)
+
+    def _sortable(self, value):
+        return sortable_timestamp(value) if self.is_timestamp else value
+
+    def order_by(self) -> list:
+        columns = [self._sortable(self.column), self.id_column]
+        return [column.desc() if self.descending else column.asc() for column in columns]
+
+    def cursor_for(self, row) -> str:
+        """Cursor opaco que apunta justo después de `row`"""
+        value = getattr(row, self.column.key)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        payload = json.dumps([self.column.key, value, getattr(row, self.id_column.key)])
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    def decode(self, cursor: str) -> tuple:
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            key, value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+            if key != self.column.key:
+                raise ValueError(key)
+            if self.is_timestamp:
+                value = datetime.fromisoformat(value)
+            return value, row_id
+        except (ValueError, TypeError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Cursor de paginación inválido"
+            )
+
+    def after(self, cursor: str):
+        """Condición para las filas posteriores al cursor en este orden"""
+        value, row_id = self.decode(cursor)
+        current = tuple_(self._sortable(self.column), self.id_column)
+        last = tuple_(self._sortable(literal(value, self.column.type)), literal(row_id))
+        return current < last if self.descending else current > last
+
+
+def paginate(query, keyset: Keyset, skip: int, limit: int, cursor: Optional[str] = None, rank=None):
+    """Aplicar el orden estable y la página pedida (el cursor tiene prioridad sobre skip)
+
+    Con `rank` los resultados se ordenan primero por relevancia (el keyset solo
+    desempata) y la página se toma con skip. Se pide una fila extra para saber
+    si hay página siguiente.
+    """
+    if rank is not None:
+        if cursor:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Las búsquedas se paginan con skip, no con cursor"
+            )
+        return query.order_by(rank.desc(), *keyset.order_by()).offset(skip).limit(limit + 1)
+
+    query = query.order_by(*keyset.order_by())
+    if cursor:
+        query = query.where(keyset.after(cursor))
+    elif skip:
+        query = query.offset(skip)
+    return query.limit(limit + 1)
+
+
+def finish_page(response: Response, keyset: Keyset, rows: Sequence, limit: int, ranked: bool = False) -> list:
+    """Descartar la fila extra y publicar el cursor siguiente si hay más resultados"""
+    items = list(rows[:limit])
+    if len(rows) > limit and not ranked:
+        response.headers[NEXT_CURSOR_HEADER] = keyset.cursor_for(items[-1])
+    return items
@@ -0,0 +1,123 @@
+"""
+Búsqueda de texto en los listados (órdenes, clientes, inventario).
+
+En PostgreSQL las columnas buscables tienen índices GIN de pg_trgm (migración
+004), que resuelven `ILIKE '%término%'` sin recorrer la tabla completa. Los
+resultados se ordenan por similitud (`similarity()`), y las columnas difusas
+(nombres) aceptan además coincidencias aproximadas con el operador `%`, de modo
+que "Jaun Peres" encuentra a "Juan Pérez".
+
+En SQLite (tests) no existe pg_trgm: se conserva el ILIKE de siempre y el orden
+propio del listado.
+
+`detect_kinds` clasifica lo que se escribe en la búsqueda global (/search) para
+consultar solo las tablas e índices que pueden contenerlo.
+"""
+import re
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, literal_column, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+class SearchFields:
+    """Columnas en las que busca un listado"""
+
+    def __init__(self, columns: Sequence, fuzzy: Sequence = ()):
+        self.columns = list(columns)
+        # Subconjunto en el que también vale una coincidencia aproximada
+        self.fuzzy = list(fuzzy)
+
+
+def uses_trigrams(db: AsyncSession) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def search_clause(db: AsyncSession, term: str, fields: SearchFields) -> Tuple[object, Optional[object]]:
+    """Condición de búsqueda y expresión de relevancia (None si no se ordena por similitud)"""
+    pattern = f"%{term}%"
+    matches = [column.ilike(pattern) for column in fields.columns]
+    if not uses_trigrams(db):
+        return or_(*matches), None
+
+    matches += [column.op("%")(term) for column in fields.fuzzy]
+    rank = func.greatest(*(func.similarity(column, term) for column in fields.columns))
+    return or_(*matches), rank
+
+
+# Tipos de término de la búsqueda global
+FOLIO = "folio"
+IMEI = "imei"
+PHONE = "phone"
+SKU = "sku"
+TEXT = "text"
+
+FOLIO_RE = re.compile(r"ORD-[0-9A-F]*", re.IGNORECASE)
+NUMBER_RE = re.compile(r"\+?[\d\s().-]+")
+SKU_RE = re.compile(r"(?=.*\d)[A-Z0-9][A-Z0-9._/-]*", re.IGNORECASE)
+IMEI_MIN_DIGITS = 14
+PHONE_MIN_DIGITS = 7
+# Número nacional (México); lo anterior es lada internacional (+52, 521...)
+PHONE_NATIONAL_DIGITS = 10
+
+
+def digits_of(term: str) -> str:
+    return re.sub(r"\D", "", term)
+
+
+def phone_digits(phone: str) -> str:
+    """Dígitos del número nacional, sin lada internacional: "+52 55 1234 5678" -> 5512345678"""
+    return digits_of(phone)[-PHONE_NATIONAL_DIGITS:]
+
+
+# Separadores habituales de un teléfono capturado a mano
+PHONE_SEPARATORS = " -().+/"
+
+
+def digits_column(db: AsyncSession, column):
+    """`column` solo con sus dígitos, igual que `digits_of` sobre el término
+
+    En PostgreSQL es la misma expresión que indexa la migración 005; va con
+    literales (no parámetros) para que el planificador pueda usar ese índice.
+    SQLite no tiene regexp_replace: se quitan los separadores habituales.
+    """
+    if uses_trigrams(db):
+        return func.regexp_replace(
+            column, literal_column(r"'\D'"), literal_column("''"), literal_column("'g'")
+        )
+    for separator in PHONE_SEPARATORS:
+        column = func.replace(column, separator, "")
+    return column
+
+
+def detect_kinds(term: str) -> List[str]:
+    """Tipos de dato que puede ser `term`, del más al menos probable"""
+    term = term.strip()
+    if FOLIO_RE.fullmatch(term):
+        return [FOLIO]
+    digits = len(digits_of(term))
+    if digits and NUMBER_RE.fullmatch(term):
+        if digits >= IMEI_MIN_DIGITS:
+            return [IMEI]
+        if digits >= PHONE_MIN_DIGITS:
+            return [PHONE]
+        # Muy corto para distinguir: parte de un teléfono o de un IMEI
+        return [PHONE, IMEI]
+    if SKU_RE.fullmatch(term):
+        return [SKU, TEXT]
+    return [TEXT]
+
+
+def match_score(value: Optional[str], term: str) -> float:
+    """Relevancia de una coincidencia: exacta > prefijo > contenida > aproximada"""
+    if not value:
+        return 0.0
+    value, term = value.lower(), term.lower()
+    if value == term:
+        return 1.0
+    if value.startswith(term):
+        return 0.8
+    if term in value:
+        return 0.6
+    # Solo llega aquí por similitud trigram (PostgreSQL)
+    return 0.3
@@ -0,0 +1,132 @@
+"""
+Funciones SQL portables entre PostgreSQL (producción) y SQLite (tests).
+
+Cada construcción se compila con la sintaxis nativa de cada dialecto para que
+los reportes puedan agregar en la base de datos sin cargar filas en Python.
+"""
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import Date, Float, literal_column
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+
+class days_between(FunctionElement):
+    """Diferencia en días (fraccional) entre dos columnas de fecha: end - start"""
+    type = Float()
+    inherit_cache = True
+    name = "days_between"
+
+
+@compiles(days_between)
+def _days_between_default(element, compiler, **kw):
+    end, start = list(element.clauses)
+    return "EXTRACT(EPOCH FROM (%s - %s)) / 86400.0" % (
+        compiler.process(end, **kw),
+        compiler.process(start, **kw),
+    )
+
+
+@compiles(days_between, "sqlite")
+def _days_between_sqlite(element, compiler, **kw):
+    end, start = list(element.clauses)
+    return "(julianday(%s) - julianday(%s))" % (
+        compiler.process(end, **kw),
+        compiler.process(start, **kw),
+    )
+
+
+class utc_date(FunctionElement):
+    """Fecha (día calendario UTC) de una columna timestamp"""
+    type = Date()
+    inherit_cache = True
+    name = "utc_date"
+
+
+@compiles(utc_date)
+def _utc_date_default(element, compiler, **kw):
+    (value,) = list(element.clauses)
+    return "CAST((%s AT TIME ZONE 'UTC') AS DATE)" % compiler.process(value, **kw)
+
+
+@compiles(utc_date, "sqlite")
+def _utc_date_sqlite(element, compiler, **kw):
+    (value,) = list(element.clauses)
+    return "date(%s)" % compiler.process(value, **kw)
+
+
+class local_date_trunc(FunctionElement):
+    """
+    Inicio del periodo (day/week/month) de un timestamp en la zona horaria local
+
+    La granularidad y la zona se renderizan como literales para que la misma
+    expresión pueda usarse en SELECT y GROUP BY.
+    """
+    type = Date()
+    inherit_cache = True
+    name = "local_date_trunc"
+
+    GRANULARITIES = ("day", "week", "month")
+
+    def __init__(self, granularity: str, value, tz: str):
+        if granularity not in self.GRANULARITIES:
+            raise ValueError(f"Granularidad no soportada: {granularity}")
+        self.granularity = granularity
+        self.tz = ZoneInfo(tz).key
+        super().__init__(
+            literal_column(f"'{granularity}'"), value, literal_column(f"'{self.tz}'")
+        )
+
+
+@compiles(local_date_trunc)
+def _local_date_trunc_default(element, compiler, **kw):
+    _, value, _ = list(element.clauses)
+    return "CAST(date_trunc('%s', (%s AT TIME ZONE '%s')) AS DATE)" % (
+        element.granularity,
+        compiler.process(value, **kw),
+        element.tz,
+    )
+
+
+@compiles(local_date_trunc, "sqlite")
+def _local_date_trunc_sqlite(element, compiler, **kw):
+    # SQLite no conoce zonas horarias: se aplica el desfase UTC actual de la zona
+    _, value, _ = list(element.clauses)
+    offset = datetime.now(ZoneInfo(element.tz)).utcoffset()
+    local = "datetime(%s, '%+d minutes')" % (
+        compiler.process(value, **kw), offset.total_seconds() // 60
+    )
+    if element.granularity == "week":
+        return "date(%s, '-6 days', 'weekday 1')" % local
+    if element.granularity == "month":
+        return "date(%s, 'start of month')" % local
+    return "date(%s)" % local
+
+
+class sortable_timestamp(FunctionElement):
+    """
+    Timestamp comparable con valores enlazados, para orden y paginación por cursor
+
+    En PostgreSQL es la propia columna (usa su índice). SQLite guarda los
+    timestamps como texto, con o sin microsegundos según quién insertó la
+    fila, así que ambos lados se normalizan al mismo formato.
+    """
+    inherit_cache = True
+    name = "sortable_timestamp"
+
+    def __init__(self, value):
+        super().__init__(value)
+        self.type = value.type
+
+
+@compiles(sortable_timestamp)
+def _sortable_timestamp_default(element, compiler, **kw):
+    (value,) = list(element.clauses)
+    return compiler.process(value, **kw)
+
+
+@compiles(sortable_timestamp, "sqlite")
+def _sortable_timestamp_sqlite(element, compiler, **kw):
+    (value,) = list(element.clauses)
+    return "strftime('%%Y-%%m-%%d %%H:%%M:%%f', %s)" % compiler.process(value, **kw)
@@ -12,12 +12,29 @@ export interface UserEngagementMetrics {
 
 export interface SystemPerformanceMetrics {
   avg_response_time_ms: number
+  p50_response_time_ms: number
+  p95_response_time_ms: number
+  p99_response_time_ms: number
   system_uptime_percent: number
   total_requests: number
   error_rate_percent: number
   active_sessions: number
 }
 
+export interface RouteMetrics {
+  method: string
+  route: string
+  request_count: number
+  error_count: number
+  server_error_count: number
+  error_rate_percent: number
+  avg_ms: number
+  p50_ms: number
+  p95_ms: number
+  p99_ms: number
+  max_ms: number
+}
+
 export interface OperationalMetrics {
   total_orders_today: number
   orders_in_progress: number
@@ -49,6 +66,13 @@ export const metricsAPI = {
     return api.get('/metrics/system-performance')
   },
 
+  /**
+   * Get per-route request counts, error rates and latency percentiles
+   */
+  getRoutes: async (limit?: number): Promise<RouteMetrics[]> => {
+    return api.get(`/metrics/routes${limit ? `?limit=${limit}` : ''}`)
+  },
+
   /**
    * Get operational metrics for today
    */
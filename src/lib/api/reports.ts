@@ -43,6 +43,11 @@ export interface DashboardSummary {
   clients: ClientStats
 }
 
+export interface PeriodStats {
+  operational: OperationalStats
+  financial: FinancialStats
+}
+
 export interface OrderTrend {
   date: string
   orders: number
@@ -55,6 +60,8 @@ export interface StatusDistribution {
 
 export type ReportPeriod = '7d' | '30d' | '90d' | '1y' | 'all'
 
+export type TrendGranularity = 'day' | 'week' | 'month'
+
 export const reportsAPI = {
   // Get operational stats
   getOperational: (period: ReportPeriod = '30d') =>
@@ -73,8 +80,10 @@ export const reportsAPI = {
     api.get<ClientStats>(`/reports/clients?period=${period}`),
 
   // Get orders trend
-  getOrdersTrend: (period: ReportPeriod = '30d') =>
-    api.get<OrderTrend[]>(`/reports/orders-trend?period=${period}`),
+  getOrdersTrend: (period: ReportPeriod = '30d', granularity?: TrendGranularity) =>
+    api.get<OrderTrend[]>(
+      `/reports/orders-trend?period=${period}${granularity ? `&granularity=${granularity}` : ''}`
+    ),
 
   // Get orders by status
   getOrdersByStatus: (period: ReportPeriod = '30d') =>
@@ -83,4 +92,8 @@ export const reportsAPI = {
   // Get complete dashboard summary
   getDashboard: (period: ReportPeriod = '30d') =>
     api.get<DashboardSummary>(`/reports/dashboard?period=${period}`),
+
+  // Compare operational/financial stats across periods in one request
+  comparePeriods: (periods: ReportPeriod[] = ['7d', '30d', '90d']) =>
+    api.get<Record<ReportPeriod, PeriodStats>>(`/reports/compare?periods=${periods.join(',')}`),
 }